@@ -1,11 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 import logging
 
 from app.core.security import verify_admin_token, get_current_user
-from app.services.auth_service import AuthService
-from app.models.token import TokenCreate, TokenResponse, TokenInfo
+from app.core.token_cache import token_cache
+from app.core.rate_limit import rate_limiter
+from app.core.database import db_instance
+from app.core.metrics import mongo_pool_metrics
+from app.core.pool_tuner import pool_tuner
+from app.services.result_cache import result_cache
+from app.services.perceptual_hash import near_duplicate_index, hash_blocklist
+from app.services.usage_writer import usage_writer
+from app.services.usage_rollups import get_usage_stats, get_token_usage_stats
+from app.services.usage_archive import usage_archiver
+from app.services.latency_tracker import latency_tracker
+from app.services.moderation_service import inference_executor, batch_scheduler
+from app.services.job_queue import job_queue
+from app.services.auth_service import AuthService, to_utc_naive
+from app.models.token import (
+    TokenCreate, TokenResponse, TokenInfo, TokenUpdate,
+    TokenBulkCreate, TokenBulkCreateItem, TokenBulkCreateResult,
+    TokenBulkRevoke, TokenBulkRevokeItem, TokenBulkRevokeResult
+)
+from app.models.usage import UsageStats
+from app.config import settings
 from app.core.exceptions import CustomException
 
 logger = logging.getLogger(__name__)
@@ -25,30 +46,30 @@ async def create_token(
     """
     Create a new bearer token (Admin only).
     
-    - **isAdmin**: Whether the token has admin privileges
+    - **is_admin**: Whether the token has admin privileges
+    - **expires_at**: Optional expiration time, after which the token is rejected and removed
     - **description**: Optional description for the token
     """
     try:
         # Verify admin privileges
         current_user = await verify_admin_token(credentials.credentials)
+        _check_expiry(token_data.expires_at)
         
         # Create new token
         new_token = await auth_service.create_token(
-            is_admin=token_data.isAdmin,
-            description=token_data.description
+            is_admin=token_data.is_admin,
+            description=token_data.description,
+            expires_at=token_data.expires_at
         )
         
         logger.info(f"Admin {current_user['token'][:8]}... created new token")
         
-        return TokenResponse(
-            token=new_token["token"],
-            isAdmin=new_token["isAdmin"],
-            createdAt=new_token["createdAt"],
-            description=new_token.get("description")
-        )
+        return _token_response(new_token)
         
     except CustomException:
         raise
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating token: {str(e)}")
         raise HTTPException(
@@ -56,39 +77,209 @@ async def create_token(
             detail="Failed to create token"
         )
 
+@router.post("/tokens/bulk", response_model=TokenBulkCreateResult, status_code=status.HTTP_201_CREATED)
+async def create_tokens_bulk(
+    bulk_data: TokenBulkCreate,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Create many bearer tokens in one request (Admin only).
+    
+    - **count**: Number of tokens to generate
+    - **is_admin**: Whether the tokens have admin privileges
+    - **expires_at**: Optional expiration time shared by every token
+    - **description**: Optional description shared by every token
+    
+    All tokens are written with a single insert; the outcome of each is
+    reported separately.
+    """
+    try:
+        # Verify admin privileges
+        current_user = await verify_admin_token(credentials.credentials)
+        
+        if bulk_data.count > settings.TOKEN_BULK_MAX_ITEMS:
+            raise CustomException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.TOKEN_BULK_MAX_ITEMS} tokens per request",
+                error_type="TOO_MANY_ITEMS"
+            )
+        _check_expiry(bulk_data.expires_at)
+        
+        token_docs, errors = await auth_service.create_tokens(
+            count=bulk_data.count,
+            is_admin=bulk_data.is_admin,
+            description=bulk_data.description,
+            expires_at=bulk_data.expires_at
+        )
+        
+        items = [
+            TokenBulkCreateItem(index=index, status="failed", error=errors[index])
+            if index in errors else
+            TokenBulkCreateItem(index=index, status="created", token=_token_response(token_doc))
+            for index, token_doc in enumerate(token_docs)
+        ]
+        
+        logger.info(f"Admin {current_user['token'][:8]}... created {len(token_docs) - len(errors)} tokens in bulk")
+        
+        return TokenBulkCreateResult(
+            created=len(token_docs) - len(errors),
+            failed=len(errors),
+            items=items
+        )
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating tokens in bulk: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create tokens"
+        )
+
+@router.post("/tokens/bulk/revoke", response_model=TokenBulkRevokeResult)
+async def revoke_tokens_bulk(
+    bulk_data: TokenBulkRevoke,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Revoke many bearer tokens in one request (Admin only).
+    
+    - **tokens**: The tokens to revoke
+    
+    All tokens are deleted with a single delete; the caller's own token is
+    skipped.
+    """
+    try:
+        # Verify admin privileges
+        current_user = await verify_admin_token(credentials.credentials)
+        
+        if len(bulk_data.tokens) > settings.TOKEN_BULK_MAX_ITEMS:
+            raise CustomException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.TOKEN_BULK_MAX_ITEMS} tokens per request",
+                error_type="TOO_MANY_ITEMS"
+            )
+        
+        targets = list(dict.fromkeys(token for token in bulk_data.tokens if token != current_user["token"]))
+        revoked = await auth_service.revoke_tokens(targets) if targets else set()
+        
+        items = []
+        for token in bulk_data.tokens:
+            if token == current_user["token"]:
+                items.append(TokenBulkRevokeItem(token=token, status="skipped", error="Cannot revoke your own token"))
+            elif token in revoked:
+                items.append(TokenBulkRevokeItem(token=token, status="revoked"))
+            else:
+                items.append(TokenBulkRevokeItem(token=token, status="not_found"))
+        
+        logger.info(f"Admin {current_user['token'][:8]}... revoked {len(revoked)} tokens in bulk")
+        
+        return TokenBulkRevokeResult(
+            revoked=sum(item.status == "revoked" for item in items),
+            not_found=sum(item.status == "not_found" for item in items),
+            skipped=sum(item.status == "skipped" for item in items),
+            items=items
+        )
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error revoking tokens in bulk: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to revoke tokens"
+        )
+
+def _check_expiry(expires_at: Optional[datetime]):
+    if expires_at is not None and to_utc_naive(expires_at) <= datetime.utcnow():
+        raise CustomException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="expires_at must be in the future",
+            error_type="INVALID_EXPIRY"
+        )
+
+def _token_response(token: dict) -> TokenResponse:
+    return TokenResponse(
+        id=str(token["_id"]),
+        token=token["token"],
+        is_admin=token["isAdmin"],
+        created_at=token["createdAt"],
+        expires_at=token.get("expiresAt"),
+        is_active=token.get("isActive", True),
+        description=token.get("description")
+    )
+
+def _token_info(token: dict) -> TokenInfo:
+    return TokenInfo(
+        token_id=str(token["_id"]),
+        isAdmin=token["isAdmin"],
+        createdAt=token["createdAt"],
+        description=token.get("description"),
+        lastUsed=token.get("lastUsed"),
+        usageCount=token.get("usageCount", 0),
+        isActive=token.get("isActive", True),
+        expiresAt=token.get("expiresAt")
+    )
+
+def token_filter(
+    is_admin: Optional[bool] = Query(None, alias="isAdmin", description="Only admin or only regular tokens"),
+    is_active: Optional[bool] = Query(None, alias="isActive", description="Only active or only deactivated tokens"),
+    last_used_after: Optional[datetime] = Query(None, description="Last used at or after this time"),
+    last_used_before: Optional[datetime] = Query(None, description="Last used before this time"),
+    description_prefix: Optional[str] = Query(None, max_length=200, description="Description starts with"),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> dict:
+    return auth_service.build_token_filter(
+        is_admin=is_admin,
+        is_active=is_active,
+        last_used_after=last_used_after,
+        last_used_before=last_used_before,
+        description_prefix=description_prefix
+    )
+
 @router.get("/tokens", response_model=List[TokenInfo])
 async def get_all_tokens(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.TOKEN_PAGE_DEFAULT_LIMIT, ge=1, le=settings.TOKEN_PAGE_MAX_LIMIT),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    query: dict = Depends(token_filter),
     credentials: HTTPAuthorizationCredentials = Depends(security),
     auth_service: AuthService = Depends(get_auth_service)
 ):
     """
-    Get all issued tokens (Admin only).
+    List issued tokens page by page (Admin only).
     
-    Returns a list of all tokens with their metadata (excluding the actual token values).
+    Returns a list of token metadata (excluding the actual token values)
+    ordered by creation time. When more tokens follow, the response carries
+    their cursor in the X-Next-Cursor header and a `Link: <...>; rel="next"`
+    header; pass the cursor as `after` until the headers are absent.
     """
     try:
         # Verify admin privileges
         current_user = await verify_admin_token(credentials.credentials)
         
-        # Get all tokens
-        tokens = await auth_service.get_all_tokens()
+        tokens, next_cursor = await auth_service.list_tokens(query, limit=limit, after=after)
+        
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+            next_url = request.url.include_query_params(after=next_cursor)
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
         
         logger.info(f"Admin {current_user['token'][:8]}... retrieved token list")
         
-        return [
-            TokenInfo(
-                token_id=token["_id"],
-                isAdmin=token["isAdmin"],
-                createdAt=token["createdAt"],
-                description=token.get("description"),
-                lastUsed=token.get("lastUsed"),
-                usageCount=token.get("usageCount", 0)
-            )
-            for token in tokens
-        ]
+        return [_token_info(token) for token in tokens]
         
     except CustomException:
         raise
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving tokens: {str(e)}")
         raise HTTPException(
@@ -96,6 +287,95 @@ async def get_all_tokens(
             detail="Failed to retrieve tokens"
         )
 
+@router.get("/tokens/export")
+async def export_tokens(
+    query: dict = Depends(token_filter),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Export all matching tokens as NDJSON (Admin only).
+    
+    Streams one TokenInfo object per line straight from the database cursor,
+    so full dumps do not build the whole list in memory.
+    """
+    try:
+        # Verify admin privileges
+        current_user = await verify_admin_token(credentials.credentials)
+        
+        logger.info(f"Admin {current_user['token'][:8]}... exported token list")
+        
+        async def lines():
+            async for token in auth_service.iter_tokens(query, batch_size=settings.TOKEN_EXPORT_BATCH_SIZE):
+                yield _token_info(token).model_dump_json() + "\n"
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting tokens: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to export tokens"
+        )
+
+@router.patch("/tokens/{token}", response_model=TokenInfo)
+async def update_token(
+    token: str,
+    token_update: TokenUpdate,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Update a token (Admin only).
+    
+    - **is_active**: Deactivate or reactivate the token
+    - **expires_at**: New expiration time; null removes the expiry
+    - **description**: New description
+    
+    Takes effect on this worker immediately and on the others within
+    TOKEN_CACHE_TTL seconds.
+    """
+    try:
+        # Verify admin privileges
+        current_user = await verify_admin_token(credentials.credentials)
+        
+        changes = token_update.model_dump(exclude_unset=True)
+        if token == current_user["token"] and changes.get("is_active") is False:
+            raise CustomException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot deactivate your own token",
+                error_type="SELF_TOKEN_DEACTIVATE"
+            )
+        _check_expiry(changes.get("expires_at"))
+        
+        updated = await auth_service.update_token(token, changes)
+        
+        if not updated:
+            raise CustomException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Token not found",
+                error_type="TOKEN_NOT_FOUND"
+            )
+        
+        logger.info(f"Admin {current_user['token'][:8]}... updated token {token[:8]}...")
+        
+        return _token_info(updated)
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating token: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update token"
+        )
+
 @router.delete("/tokens/{token}")
 async def delete_token(
     token: str,
@@ -135,9 +415,252 @@ async def delete_token(
         
     except CustomException:
         raise
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting token: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete token"
-        )
\ No newline at end of file
+        )
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get in-process cache statistics (Admin only).
+    
+    Returns size and hit/miss counters for this worker's caches.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return {
+            "token_cache": token_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "near_duplicate_index": near_duplicate_index.stats(),
+            "hash_blocklist": hash_blocklist.index.stats()
+        }
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving cache stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve cache stats"
+        )
+
+
+@router.get("/usage/stats", response_model=UsageStats)
+async def get_usage_statistics(
+    days: int = Query(30, ge=1, le=settings.USAGE_STATS_MAX_DAYS, description="Days to cover, including today"),
+    hours: Optional[int] = Query(None, ge=1, le=168, description="Cover the last N hours instead of days"),
+    token: Optional[str] = Query(None, description="Only report this token"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get API usage statistics (Admin only).
+    
+    Served from the hourly/daily rollups kept by the usage writer; unique
+    tokens are a HyperLogLog estimate. With `token`, the usage records are
+    aggregated instead, reading the usage archive for days that have been
+    moved out of MongoDB.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        if token is not None:
+            return await get_token_usage_stats(token, days=days, hours=hours)
+        return await get_usage_stats(days=days, hours=hours)
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving usage stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve usage stats"
+        )
+
+
+@router.get("/usage/archive")
+async def get_usage_archive_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get usage archive statistics (Admin only).
+    
+    Returns the archived day range and this worker's archiving counters.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return usage_archiver.stats()
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving usage archive stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve usage archive stats"
+        )
+
+
+@router.get("/latency")
+async def get_latency_percentiles(
+    cluster: bool = Query(True, description="Merge snapshots from all workers"),
+    token: Optional[str] = Query(None, description="Only report this token"),
+    top_tokens: int = Query(20, ge=0, le=1000, description="Busiest tokens to report"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get latency percentiles per route/status class and per token (Admin only).
+    
+    Returns count, mean, p50/p95/p99 and max in milliseconds since each
+    worker started. Tokens are identified by a short hash of their value.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return await latency_tracker.report(cluster=cluster, token=token, top_tokens=top_tokens)
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving latency percentiles: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve latency percentiles"
+        )
+
+
+@router.get("/usage/writer")
+async def get_usage_writer_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get background usage writer statistics (Admin only).
+    
+    Returns queue depth and enqueued/dropped/written counters for this worker.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return usage_writer.stats()
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving usage writer stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve usage writer stats"
+        )
+
+
+@router.get("/rate-limit/stats")
+async def get_rate_limit_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get rate limiter statistics (Admin only).
+    
+    Returns the configured limit and allowed/rejected counters for this worker.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return rate_limiter.stats()
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving rate limit stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve rate limit stats"
+        )
+
+
+@router.get("/database/stats")
+async def get_database_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get MongoDB connection pool statistics (Admin only).
+    
+    Returns the client options in use, open and in-use connections, check-out
+    wait percentiles and adaptive sizing decisions for this worker.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return {
+            "client": db_instance.options,
+            "pool": mongo_pool_metrics.stats(),
+            "adaptive": pool_tuner.stats()
+        }
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving database stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve database stats"
+        )
+
+
+@router.get("/inference/stats")
+async def get_inference_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get inference executor statistics (Admin only).
+    
+    Returns queue depth, worker utilisation, the batch size histogram and moderation job counters for this worker.
+    """
+    try:
+        # Verify admin privileges
+        await verify_admin_token(credentials.credentials)
+        
+        return {
+            "executor": inference_executor.stats(),
+            "batching": batch_scheduler.stats(),
+            "jobs": job_queue.stats()
+        }
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving inference stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve inference stats"
+        )
@@ -1,83 +1,128 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
+from app.core.metrics import http_requests, http_request_seconds
+from app.core.rate_limit import RateLimiter
+from app.core.security import get_token_document, hash_token, request_state
 from app.services.usage_services import UsageService
-from app.core.database import get_database
+from app.services.latency_tracker import latency_tracker
 
 logger = logging.getLogger(__name__)
 
-class UsageTrackingMiddleware(BaseHTTPMiddleware):
+# Allowance for multipart boundaries and part headers around an upload
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UsageTrackingMiddleware:
     """
     Middleware to track API usage per token.
-    Records each API call with timestamp and endpoint information.
+    Records each API call with timestamp and endpoint information, feeds
+    the latency histograms and request metrics, and sets the
+    X-Process-Time response header.
+
+    Implemented as a raw ASGI middleware so the request body is streamed
+    straight through to the endpoint and the status code is read from the
+    `http.response.start` message without wrapping the response.
     """
-    
-    def __init__(self, app):
-        super().__init__(app)
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.usage_service = UsageService()
-    
-    async def dispatch(self, request: Request, call_next):
-        
-        start_time = time.time()
-        
-        # Extract token from Authorization header
-        token = self._extract_token(request)
-        
-        # Process request
-        response = await call_next(request)
-        
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
+
+        # Process request; authentication records the token in the state
+        state = scope.setdefault("state", {})
+        state_token = request_state.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_state.reset(state_token)
+
         # Calculate processing time
-        process_time = time.time() - start_time
-        
+        process_time = time.perf_counter() - start_time
+
+        # Extract token from Authorization header
+        headers = Headers(scope=scope)
+        token = self._extract_token(headers)
+        route = self._route_template(scope)
+
+        # Only requests whose token passed authentication get a token
+        # histogram, so made-up bearer values cannot evict real tokens
+        latency_tracker.record(route or "unmatched", status_code, state.get("authenticated_token"), process_time)
+        http_requests.inc(scope["method"], route or "unmatched", str(status_code))
+        http_request_seconds.observe(process_time, scope["method"], route or "unmatched")
+
         # Track usage if token is present and request was successful
-        if token and response.status_code < 400:
+        if token and status_code < 400:
             try:
-                await self._track_usage(
+                self._track_usage(
                     token=token,
-                    endpoint=str(request.url.path),
-                    method=request.method,
-                    status_code=response.status_code,
+                    endpoint=scope["path"],
+                    method=scope["method"],
+                    status_code=status_code,
                     process_time=process_time,
-                    user_agent=request.headers.get("user-agent"),
-                    ip_address=self._get_client_ip(request)
+                    user_agent=headers.get("user-agent"),
+                    ip_address=self._get_client_ip(scope, headers),
+                    metadata=state.get("usage_metadata"),
+                    route=route
                 )
             except Exception as e:
                 # Don't let usage tracking errors affect the main response
                 logger.error(f"Error tracking usage: {str(e)}")
-        
-        return response
-    
-    def _extract_token(self, request: Request) -> Optional[str]:
+
+    def _extract_token(self, headers: Headers) -> Optional[str]:
         """Extract bearer token from Authorization header."""
         try:
-            auth_header = request.headers.get("authorization")
+            auth_header = headers.get("authorization")
             if auth_header and auth_header.startswith("Bearer "):
                 return auth_header.split(" ")[1]
         except Exception:
             pass
         return None
-    
-    def _get_client_ip(self, request: Request) -> str:
+
+    def _route_template(self, scope: Scope) -> Optional[str]:
+        """Path template of the matched route, e.g. /auth/tokens/{token}."""
+        route = scope.get("route")
+        return getattr(route, "path", None)
+
+    def _get_client_ip(self, scope: Scope, headers: Headers) -> str:
         """Get client IP address from request."""
         # Check for forwarded headers first (for proxy/load balancer scenarios)
-        forwarded_for = request.headers.get("x-forwarded-for")
+        forwarded_for = headers.get("x-forwarded-for")
         if forwarded_for:
             return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("x-real-ip")
+
+        real_ip = headers.get("x-real-ip")
         if real_ip:
             return real_ip
-        
+
         # Fallback to direct client IP
-        if hasattr(request, "client") and request.client:
-            return request.client.host
-        
+        client = scope.get("client")
+        if client:
+            return client[0]
+
         return "unknown"
-    
-    async def _track_usage(
+
+    def _track_usage(
         self,
         token: str,
         endpoint: str,
@@ -85,23 +130,131 @@ class UsageTrackingMiddleware(BaseHTTPMiddleware):
         status_code: int,
         process_time: float,
         user_agent: Optional[str] = None,
-        ip_address: str = "unknown"
+        ip_address: str = "unknown",
+        metadata: Optional[Dict[str, Any]] = None,
+        route: Optional[str] = None
     ):
-        """Record usage information in the database."""
-        try:
-            await self.usage_service.record_usage(
-                token=token,
-                endpoint=endpoint,
-                method=method,
-                status_code=status_code,
-                process_time=process_time,
-                user_agent=user_agent,
-                ip_address=ip_address
+        """Queue usage information for the background usage writer."""
+        queued = self.usage_service.record_usage(
+            token=token,
+            endpoint=endpoint,
+            method=method,
+            status_code=status_code,
+            process_time=process_time,
+            user_agent=user_agent,
+            ip_address=ip_address,
+            metadata=metadata,
+            route=route
+        )
+
+        if not queued:
+            logger.debug(f"Usage queue full, dropped record for token {token[:8]}...")
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject oversized request bodies before they are buffered.
+
+    Requests whose Content-Length exceeds the limit for their path get a 413
+    straight away; otherwise the received bytes are counted as the body
+    streams in and reading stops with a 413 as soon as the limit is passed.
+    """
+
+    def __init__(self, app: ASGIApp, default_limit: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.default_limit = default_limit
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.default_limit)
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                {"detail": "Request body too large"},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
             )
-            
-            # Update token's last used timestamp
-            await self.usage_service.update_token_last_used(token)
-            
-        except Exception as e:
-            logger.error(f"Failed to track usage for token {token[:8]}...: {str(e)}")
-            raise
\ No newline at end of file
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Request body too large"
+                    )
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+
+
+class RateLimitMiddleware:
+    """
+    Enforce the per-token rate limit before the request reaches a route.
+
+    Known tokens are counted under `hash_token` of their value; requests
+    with a bearer token that does not exist share one counter per client
+    address, so made-up tokens neither escape the limit nor create a
+    counter each. The token lookup goes through the token cache and is the
+    same one the route makes next.
+
+    Every response to a request with a bearer token carries RateLimit-Limit,
+    RateLimit-Remaining and RateLimit-Reset headers; requests over the
+    limit get a 429 with Retry-After.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        auth_header = Headers(scope=scope).get("authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            await self.app(scope, receive, send)
+            return
+
+        token_doc = await get_token_document(auth_header[7:])
+        if token_doc is not None:
+            key = hash_token(token_doc["token"])
+        else:
+            client = scope.get("client")
+            key = f"ip:{client[0] if client else 'unknown'}"
+
+        allowed, remaining, reset = self.limiter.hit(key)
+        rate_limit_headers = {
+            "RateLimit-Limit": str(self.limiter.limit),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(reset),
+        }
+
+        if not allowed:
+            response = JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={**rate_limit_headers, "Retry-After": str(reset)}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in rate_limit_headers.items():
+                    headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,20 +1,65 @@
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import List, Optional, Tuple
 import logging
 
-from app.core.security import get_current_user
-from app.services.moderation_service import ModerationService
-from app.models.moderation import ModerationResult
-from app.utils.file_handler import validate_file
+from app.config import settings
+
+from app.core.database import get_hash_blocklist_collection
+from app.core.security import get_current_user, hash_token, verify_admin_token
+from app.services.moderation_service import ModerationService, moderation_service as shared_moderation_service
+from app.services.inference_executor import ImageDecodeError
+from app.models.moderation import ModerationResult, BatchModerationResult, BlocklistEntry, ModerationJob
+from app.services.perceptual_hash import hash_blocklist, parse_hash
+from app.services.job_queue import job_queue, job_response, check_callback_url
+from app.utils.file_handler import validate_file, is_archive, extract_archive, MAX_FILE_SIZE, MAX_FILE_SIZE_MB
 from app.core.exceptions import CustomException
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 security = HTTPBearer()
 
-# Dependency to get moderation service
+# Dependency to get moderation service (shared, so the model is not reloaded per request)
 def get_moderation_service() -> ModerationService:
-    return ModerationService()
+    return shared_moderation_service
+
+async def _expand_uploads(files: List[UploadFile]) -> List[Tuple[str, Optional[bytes]]]:
+    """
+    Expand uploads and zip/tar archives into (filename, content) items.
+    Files over the size limit get None content instead of being buffered.
+    """
+    items: List[Tuple[str, Optional[bytes]]] = []
+    total_bytes = 0
+    for file in files:
+        if is_archive(file.filename):
+            members = extract_archive(
+                await file.read(), file.filename,
+                max_items=settings.BATCH_MAX_ITEMS - len(items) + 1,
+                max_bytes=settings.BATCH_MAX_TOTAL_BYTES - total_bytes
+            )
+            items.extend(members)
+            total_bytes += sum(len(content) for _, content in members if content is not None)
+        elif file.size is not None and file.size > MAX_FILE_SIZE:
+            # Too large, don't buffer it
+            items.append((file.filename, None))
+        else:
+            content = await file.read()
+            items.append((file.filename, content))
+            total_bytes += len(content)
+        
+        if len(items) > settings.BATCH_MAX_ITEMS:
+            raise CustomException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Batch exceeds maximum of {settings.BATCH_MAX_ITEMS} images",
+                error_type="BATCH_TOO_LARGE"
+            )
+        if total_bytes > settings.BATCH_MAX_TOTAL_BYTES:
+            raise CustomException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Batch exceeds maximum of {settings.BATCH_MAX_TOTAL_BYTES // (1024 * 1024)}MB of images",
+                error_type="BATCH_TOO_LARGE"
+            )
+    return items
 
 @router.post("/moderate", response_model=ModerationResult)
 async def moderate_image(
@@ -31,16 +76,10 @@ async def moderate_image(
     """
     try:
         # Verify valid token (any authenticated user can access)
-        current_user = await get_current_user(credentials.credentials)
-        
-        # Validate uploaded file
-        await validate_file(file)
+        current_user = await get_current_user(credentials)
         
-        # Read file content
-        file_content = await file.read()
-        
-        # Reset file position for potential reuse
-        await file.seek(0)
+        # Validate uploaded file and read its content once
+        file_content = await validate_file(file)
         
         # Perform moderation analysis
         result = await moderation_service.analyze_image(
@@ -56,8 +95,17 @@ async def moderate_image(
         
         return result
         
+    except ImageDecodeError:
+        # Header bytes looked valid but the image data is corrupt
+        raise CustomException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image could not be decoded",
+            error_type="INVALID_IMAGE"
+        )
     except CustomException:
         raise
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during image moderation: {str(e)}")
         raise HTTPException(
@@ -65,6 +113,137 @@ async def moderate_image(
             detail="Failed to process image"
         )
 
+@router.post("/moderate/batch", response_model=BatchModerationResult)
+async def moderate_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    moderation_service: ModerationService = Depends(get_moderation_service)
+):
+    """
+    Moderate many images in one request.
+    
+    - **files**: Image files (jpg, jpeg, png, gif, webp) and/or zip/tar archives of images
+    
+    Images are analyzed concurrently. Returns one result per image, in upload
+    order; images that fail validation are reported with an error instead of
+    failing the whole batch.
+    """
+    try:
+        # Authenticate once for the whole batch
+        current_user = await get_current_user(credentials)
+        
+        # Expand uploads and archives into (filename, content) items
+        items = await _expand_uploads(files)
+        
+        batch_result = await moderation_service.analyze_batch(items, concurrency=settings.BATCH_CONCURRENCY)
+        
+        # Usage is logged as one record carrying the item count
+        request.state.usage_metadata = {"item_count": batch_result.total}
+        
+        logger.info(
+            f"Batch moderation completed for user {current_user['token'][:8]}... "
+            f"Items: {batch_result.total}, Succeeded: {batch_result.succeeded}"
+        )
+        
+        return batch_result
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during batch moderation: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process batch"
+        )
+
+@router.post("/moderate/jobs", response_model=ModerationJob, status_code=status.HTTP_202_ACCEPTED)
+async def submit_moderation_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    callback_url: Optional[str] = Form(None),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Queue images for moderation and return immediately.
+    
+    - **files**: Image files (jpg, jpeg, png, gif, webp) and/or zip/tar archives of images
+    - **callback_url**: Optional http(s) URL the finished job is POSTed to; its
+      host must resolve to a public address unless listed in JOB_WEBHOOK_ALLOWED_HOSTS
+    
+    Poll `GET /moderate/jobs/{job_id}` for the result. Webhook bodies are
+    signed in the X-Signature header (HMAC-SHA256 of the body) and are
+    retried with backoff until the receiver answers with a 2xx.
+    """
+    try:
+        current_user = await get_current_user(credentials)
+        
+        if callback_url is not None:
+            await check_callback_url(callback_url)
+        
+        items = await _expand_uploads(files)
+        job_doc = await job_queue.submit(current_user["token"], items, callback_url=callback_url)
+        
+        request.state.usage_metadata = {"item_count": len(items), "job_id": job_doc["_id"]}
+        
+        logger.info(
+            f"Moderation job {job_doc['_id']} queued for user {current_user['token'][:8]}... "
+            f"Items: {len(items)}"
+        )
+        
+        return job_response(job_doc)
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queueing moderation job: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to queue job"
+        )
+
+@router.get("/moderate/jobs/{job_id}", response_model=ModerationJob)
+async def get_moderation_job(
+    job_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get the status, and once completed the result, of a moderation job.
+    
+    - **job_id**: ID returned when the job was submitted
+    
+    Jobs are visible to the token that submitted them and to admins, and
+    are kept for JOB_RESULT_TTL seconds after submission.
+    """
+    try:
+        current_user = await get_current_user(credentials)
+        
+        job_doc = await job_queue.get(job_id)
+        is_owner = job_doc is not None and job_doc["token"] == hash_token(current_user["token"])
+        if job_doc is None or (not is_owner and not current_user.get("isAdmin")):
+            raise CustomException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found",
+                error_type="JOB_NOT_FOUND"
+            )
+        
+        return job_response(job_doc)
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving moderation job: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve job"
+        )
+
 @router.get("/moderate/categories")
 async def get_moderation_categories(
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -76,7 +255,7 @@ async def get_moderation_categories(
     """
     try:
         # Verify valid token
-        await get_current_user(credentials.credentials)
+        await get_current_user(credentials)
         
         categories = {
             "explicit_nudity": {
@@ -110,14 +289,120 @@ async def get_moderation_categories(
             "categories": categories,
             "confidence_threshold": 0.7,
             "supported_formats": ["jpg", "jpeg", "png", "gif", "webp"],
-            "max_file_size": "10MB"
+            "max_file_size": f"{MAX_FILE_SIZE_MB}MB"
         }
         
     except CustomException:
         raise
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving categories: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve categories"
-        )
\ No newline at end of file
+        )
+
+@router.post("/moderate/blocklist")
+async def add_blocklist_entries(
+    entries: List[BlocklistEntry],
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Add known-bad perceptual image hashes to the blocklist (Admin only).
+    
+    - **hash**: 64-bit perceptual hash as 16 hex digits
+    - **category**: Moderation category reported for matching images
+    
+    Images within the configured Hamming distance of a blocklisted hash are
+    rejected without scoring. Other workers pick up changes on their next
+    blocklist refresh.
+    """
+    try:
+        # Verify admin privileges
+        current_user = await verify_admin_token(credentials.credentials)
+        
+        for entry in entries:
+            try:
+                parse_hash(entry.hash)
+            except ValueError:
+                raise CustomException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid hash: {entry.hash}",
+                    error_type="INVALID_HASH"
+                )
+            if entry.category not in ModerationService.CATEGORIES:
+                raise CustomException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown category: {entry.category}",
+                    error_type="INVALID_CATEGORY"
+                )
+        
+        collection = get_hash_blocklist_collection()
+        for entry in entries:
+            await collection.update_one(
+                {"hash": entry.hash.lower()},
+                {"$set": {
+                    "hash": entry.hash.lower(),
+                    "category": entry.category,
+                    "description": entry.description,
+                    "createdBy": current_user["token"][:8],
+                }},
+                upsert=True
+            )
+        
+        await hash_blocklist.load()
+        
+        logger.info(f"Admin {current_user['token'][:8]}... added {len(entries)} blocklist hashes")
+        
+        return {"message": "Blocklist updated", "entries": len(hash_blocklist.index)}
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating blocklist: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update blocklist"
+        )
+
+@router.delete("/moderate/blocklist/{image_hash}")
+async def delete_blocklist_entry(
+    image_hash: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Remove a hash from the blocklist (Admin only).
+    
+    - **image_hash**: The 16 hex digit hash to remove
+    """
+    try:
+        # Verify admin privileges
+        current_user = await verify_admin_token(credentials.credentials)
+        
+        result = await get_hash_blocklist_collection().delete_one({"hash": image_hash.lower()})
+        if result.deleted_count == 0:
+            raise CustomException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Hash not found",
+                error_type="HASH_NOT_FOUND"
+            )
+        
+        await hash_blocklist.load()
+        
+        logger.info(f"Admin {current_user['token'][:8]}... removed blocklist hash {image_hash}")
+        
+        return {"message": "Hash removed from blocklist"}
+        
+    except CustomException:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating blocklist: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update blocklist"
+        )
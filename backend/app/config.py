@@ -33,9 +33,144 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "7000"))
+
+    # Multi-Worker Server Configuration (python -m app.server)
+    SERVER_WORKERS: int = 1  # worker processes sharing the listening socket
+    SERVER_PRELOAD: bool = True  # import the app and load a thread executor's model before forking
+    SERVER_BACKLOG: int = 2048  # listen() backlog of the shared socket
+    SERVER_SHUTDOWN_TIMEOUT: float = 30.0  # seconds a worker gets to drain after SIGTERM before it is killed
+    SERVER_RESTART_DELAY: float = 1.0  # seconds before a crashed worker is replaced
+
+    # MongoDB Client Configuration
+    MONGO_POOL_BUDGET: int = 10  # MongoDB connections for the whole host, split across SERVER_WORKERS
+    MONGO_MIN_POOL_SIZE: int = 5  # connections each worker keeps open, capped at its share of the budget
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None  # close pooled connections idle this long, None keeps them
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None  # fail check-outs waiting longer than this, None waits
+    MONGO_MAX_CONNECTING: int = 2  # connections a pool establishes at the same time
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = None  # None never times out a socket read
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_COMPRESSORS: Optional[str] = None  # e.g. "zstd,snappy,zlib"; zstd needs zstandard, snappy python-snappy
+    MONGO_ZLIB_COMPRESSION_LEVEL: int = -1
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_READ_CONCERN: Optional[str] = None  # "local", "majority", ...; None uses the server default
+    MONGO_WRITE_CONCERN: Optional[str] = None  # "majority" or a node count; None uses the server default
+    MONGO_WRITE_JOURNAL: Optional[bool] = None
+
+    # Per-Collection Read/Write Tiers
+    MONGO_USAGE_WRITE_CONCERN: Optional[str] = "1"  # usage records, rollups and token counters; "0" is fire-and-forget
+    MONGO_TOKENS_WRITE_CONCERN: Optional[str] = "majority"  # token creation, updates and revocation
+    MONGO_TOKENS_READ_PREFERENCE: str = "primary"  # token lookups on the request path, e.g. "secondaryPreferred"
+    MONGO_STATS_READ_PREFERENCE: str = "primary"  # usage and latency stats queries, e.g. "nearest"
+    MONGO_MAX_STALENESS_SECONDS: Optional[int] = 90  # bound on secondary lag for the tiers above, at least 90
+
+    # Adaptive MongoDB Pool Sizing
+    MONGO_POOL_ADAPTIVE: bool = False  # resize this worker's pool from observed check-out waits
+    MONGO_POOL_ADAPTIVE_INTERVAL: float = 30.0  # seconds between sizing decisions
+    MONGO_POOL_ADAPTIVE_MAX_SIZE: Optional[int] = None  # largest pool, None caps at the worker's budget share
+    MONGO_POOL_ADAPTIVE_MIN_CHECKOUTS: int = 100  # check-outs needed in an interval before resizing
+    MONGO_POOL_GROW_WAIT_MS: float = 5.0  # p95 check-out wait that grows the pool
+    MONGO_POOL_SHRINK_WAIT_MS: float = 0.5  # p95 wait below which an underused pool shrinks
+    MONGO_POOL_CLIENT_CLOSE_DELAY: float = 60.0  # seconds a replaced client stays open for in-flight operations
+
+    # Token Cache Configuration
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_TTL: float = 60.0  # seconds a token document stays cached, bounds how stale deactivation can be
+    TOKEN_CACHE_NEGATIVE_TTL: float = 5.0  # seconds an unknown token stays cached
+
+    # Token Listing Configuration
+    TOKEN_PAGE_DEFAULT_LIMIT: int = 100
+    TOKEN_PAGE_MAX_LIMIT: int = 1000
+    TOKEN_EXPORT_BATCH_SIZE: int = 1000  # documents per MongoDB round trip when exporting
+    TOKEN_BULK_MAX_ITEMS: int = 1000  # tokens per bulk create/revoke request
+
+    # Usage Writer Configuration
+    USAGE_QUEUE_MAX_SIZE: int = 10000  # records buffered before new ones are dropped
+    USAGE_FLUSH_BATCH_SIZE: int = 500
+    USAGE_FLUSH_INTERVAL: float = 1.0  # seconds
+    USAGE_SHUTDOWN_TIMEOUT: float = 10.0  # seconds allowed to drain on shutdown
+
+    # Usage Record Storage
+    USAGE_TIMESERIES: bool = True  # create usages as a time-series collection (MongoDB 5.0+)
+    USAGE_TIMESERIES_GRANULARITY: str = "seconds"  # "seconds", "minutes" or "hours"
+    USAGE_RETENTION_SECONDS: Optional[int] = None  # usage records are deleted after this, None keeps them
+
+    # Usage Archive Configuration (needs pyarrow)
+    USAGE_ARCHIVE_ENABLED: bool = False
+    USAGE_ARCHIVE_DIR: str = "archive/usages"  # local disk, or a mounted S3-compatible bucket
+    USAGE_ARCHIVE_AFTER_DAYS: int = 30  # whole days older than this move from usages to the archive
+    USAGE_ARCHIVE_INTERVAL: float = 3600.0  # seconds between archiver runs
+    USAGE_ARCHIVE_BATCH_SIZE: int = 10000  # records per Arrow record batch
+    USAGE_ARCHIVE_COMPRESSION: Optional[str] = "zstd"  # "zstd", "lz4" or None for zero-copy reads
+
+    # Usage Rollup Configuration
+    USAGE_HLL_PRECISION: int = 10  # 2^p registers per unique-token sketch
+    USAGE_HOURLY_ROLLUP_TTL: int = 7 * 24 * 3600  # hourly rollups are kept 7 days, daily ones forever
+    USAGE_STATS_MAX_DAYS: int = 366
+
+    # Latency Tracking Configuration
+    LATENCY_TRACKING_ENABLED: bool = True
+    LATENCY_MAX_TOKENS: int = 1000  # tokens with their own histogram, least recently seen evicted
+    LATENCY_SNAPSHOT_INTERVAL: float = 10.0  # seconds between per-worker snapshots
+    LATENCY_SNAPSHOT_TTL: int = 3600  # seconds before a silent worker's snapshot expires
+
+    # Metrics Configuration
+    METRICS_ENABLED: bool = True  # serve /metrics
+    METRICS_TOKEN: Optional[str] = None  # bearer token that lets scrapers from other addresses read /metrics
+    METRICS_ALLOWED_NETWORKS: List[str] = ["127.0.0.1/32", "::1/128"]  # client networks that read /metrics without it
+    METRICS_DIR: Optional[str] = None  # shared directory for multi-worker aggregation
+    METRICS_FLUSH_INTERVAL: float = 5.0  # seconds between writes to METRICS_DIR
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5  # seconds between event loop lag probes
+
+    # Batch Moderation Configuration
+    BATCH_MAX_ITEMS: int = 100  # images per /moderate/batch request, archives expanded
+    BATCH_MAX_TOTAL_BYTES: int = 200 * 1024 * 1024  # image bytes per /moderate/batch or /moderate/jobs request, archives expanded
+    BATCH_CONCURRENCY: int = 8  # images analysed at the same time per request
+
+    # Moderation Job Configuration
+    JOB_QUEUE_MAX_SIZE: int = 100  # jobs waiting per worker before submissions get a 503
+    JOB_QUEUE_MAX_BYTES: int = 512 * 1024 * 1024  # upload bytes held by queued and running jobs per worker
+    JOB_WORKERS: int = 2  # jobs processed at once per worker
+    JOB_LEASE_SECONDS: float = 120.0  # jobs of a worker silent this long are failed
+    JOB_SWEEP_INTERVAL: float = 10.0  # seconds between lease renewals and webhook retries
+    JOB_RESULT_TTL: int = 24 * 3600  # seconds a job and its result are kept
+    JOB_WEBHOOK_TIMEOUT: float = 10.0  # seconds per webhook attempt
+    JOB_WEBHOOK_MAX_ATTEMPTS: int = 8
+    JOB_WEBHOOK_CONCURRENCY: int = 8  # webhook retries in flight per worker
+    JOB_WEBHOOK_ALLOWED_HOSTS: List[str] = []  # callback hosts allowed to resolve to private addresses
+    JOB_WEBHOOK_BACKOFF_BASE: float = 2.0  # seconds before the first retry, doubled each time
+    JOB_WEBHOOK_BACKOFF_MAX: float = 600.0
+
+    # Moderation Result Cache Configuration
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # in-process LRU budget
+    RESULT_CACHE_TTL: int = 7 * 24 * 3600  # seconds a verdict is kept in MongoDB
+
+    # Perceptual Hash Configuration
+    PHASH_ENABLED: bool = True
+    PHASH_ALGORITHM: str = "phash"  # "phash" or "dhash"
+    PHASH_MAX_DISTANCE: int = 4  # Hamming distance treated as a near-duplicate
+    PHASH_INDEX_MAX_ENTRIES: int = 100000
+    BLOCKLIST_MAX_DISTANCE: int = 6
+    BLOCKLIST_REFRESH_INTERVAL: float = 60.0  # seconds, 0 disables reloading
+
+    # Moderation Model Configuration
+    MODERATION_BACKEND: str = "mock"  # "mock", "numpy" or "onnx"
+    MODEL_PATH: Optional[str] = None  # .npz weights (numpy) or .onnx file (onnx)
+    MAX_ANIMATION_FRAMES: int = 3  # frames of an animated GIF/WebP that are scored
+
+    # Inference Executor Configuration
+    INFERENCE_EXECUTOR: str = "process"  # "process" or "thread"
+    INFERENCE_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)  # for the whole host, split across SERVER_WORKERS
+    INFERENCE_QUEUE_SIZE: int = 16  # batches waiting for a worker before callers block
+    INFERENCE_MAX_BATCH_SIZE: int = 16  # images scored per model call, 1 disables batching
+    INFERENCE_MAX_BATCH_LATENCY_MS: float = 5.0  # longest an image waits for its batch to fill
+
     # File Upload Configuration
-    """
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_REQUEST_BODY_SIZE: int = 1024 * 1024  # default limit for non-upload routes
+    MAX_BATCH_REQUEST_SIZE: int = 100 * 1024 * 1024  # /moderate/batch and /moderate/jobs request body
+    """
     ALLOWED_EXTENSIONS: List[str] = ["jpg", "jpeg", "png", "gif", "webp"]
     UPLOAD_DIRECTORY: str = "uploads"
     """
@@ -46,10 +181,11 @@ class Settings(BaseSettings):
     """
 
     # Rate Limiting
-    """
+    RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 3600  # 1 hour in seconds
-    """
+    RATE_LIMIT_STORE: str = "mongo"  # "mongo" shares counts across workers, "memory" is per process
+    RATE_LIMIT_SYNC_INTERVAL: float = 1.0  # seconds between counter syncs with the store
 
     # Moderation Configuration
     """
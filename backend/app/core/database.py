@@ -1,26 +1,77 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pymongo import ReadPreference, WriteConcern
+from pymongo.errors import CollectionInvalid, ConnectionFailure, OperationFailure
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from typing import Any, Dict, Optional, Set, Tuple, Union
+import asyncio
 import logging
 from app.config import settings
+from app.core.metrics import mongo_command_metrics, mongo_pool_metrics
 
 logger = logging.getLogger(__name__)
 
 class Database:
     client: AsyncIOMotorClient = None
     database = None
+    options: Dict[str, Any] = {}
+    # Collection handles with per-collection concerns, valid for `database`
+    collections: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+    collections_database = None
+    # Clients replaced by resize_pool, closed once their operations finish
+    retired_clients: Set[AsyncIOMotorClient] = set()
 
 # Global database instance
 db_instance = Database()
 
+def worker_pool_size() -> Tuple[int, int]:
+    """(maxPoolSize, minPoolSize) for this process, its share of MONGO_POOL_BUDGET."""
+    max_pool_size = max(1, settings.MONGO_POOL_BUDGET // max(1, settings.SERVER_WORKERS))
+    return max_pool_size, min(settings.MONGO_MIN_POOL_SIZE, max_pool_size)
+
+def write_concern_value(value: str) -> Union[int, str]:
+    """`w` for a write concern setting: a node count or a mode such as "majority"."""
+    return int(value) if value.isdigit() else value
+
+def client_options(max_pool_size: int, min_pool_size: int) -> Dict[str, Any]:
+    """AsyncIOMotorClient options from the MONGO_* settings, unset ones left to the driver."""
+    options = {
+        "maxPoolSize": max_pool_size,
+        "minPoolSize": min_pool_size,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": settings.MONGO_READ_PREFERENCE,
+    }
+    if settings.MONGO_COMPRESSORS:
+        # PyMongo warns about and skips compressors whose library is missing
+        options["compressors"] = settings.MONGO_COMPRESSORS
+        options["zlibCompressionLevel"] = settings.MONGO_ZLIB_COMPRESSION_LEVEL
+    if settings.MONGO_READ_CONCERN:
+        options["readConcernLevel"] = settings.MONGO_READ_CONCERN
+    if settings.MONGO_WRITE_CONCERN:
+        options["w"] = write_concern_value(settings.MONGO_WRITE_CONCERN)
+    if settings.MONGO_WRITE_JOURNAL is not None:
+        options["journal"] = settings.MONGO_WRITE_JOURNAL
+    return options
+
+def create_client(max_pool_size: int, min_pool_size: int) -> AsyncIOMotorClient:
+    options = client_options(max_pool_size, min_pool_size)
+    client = AsyncIOMotorClient(
+        settings.mongodb_url,
+        event_listeners=[mongo_command_metrics, mongo_pool_metrics],
+        **options
+    )
+    db_instance.options = options
+    return client
+
 async def connect_to_mongo():
     """Create database connection"""
     try:
-        db_instance.client = AsyncIOMotorClient(
-            settings.mongodb_url,
-            maxPoolSize=10,
-            minPoolSize=5,
-            serverSelectionTimeoutMS=5000,
-        )
+        max_pool_size, min_pool_size = worker_pool_size()
+        db_instance.client = create_client(max_pool_size, min_pool_size)
         
         # Test the connection
         await db_instance.client.admin.command('ping')
@@ -30,7 +81,7 @@ async def connect_to_mongo():
         # Create indexes for better performance
         await create_indexes()
         
-        logger.info("Connected to MongoDB Atlas successfully")
+        logger.info(f"Connected to MongoDB Atlas successfully (pool size {min_pool_size}-{max_pool_size})")
         
     except ConnectionFailure as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
@@ -39,35 +90,242 @@ async def connect_to_mongo():
         logger.error(f"Unexpected error connecting to MongoDB: {e}")
         raise
 
+async def resize_pool(max_pool_size: int, close_delay: float):
+    """
+    Switch to a client with a different maxPoolSize. PyMongo cannot resize a
+    live pool, so a new client is connected and swapped in; operations that
+    already started finish on the old one, which is closed after `close_delay`
+    seconds.
+    """
+    min_pool_size = min(settings.MONGO_MIN_POOL_SIZE, max_pool_size)
+    client = create_client(max_pool_size, min_pool_size)
+    await client.admin.command('ping')
+    
+    old_client = db_instance.client
+    db_instance.client = client
+    db_instance.database = client[settings.database_name]
+    
+    if old_client:
+        db_instance.retired_clients.add(old_client)
+        asyncio.get_running_loop().call_later(close_delay, _close_retired_client, old_client)
+
+def _close_retired_client(client: AsyncIOMotorClient):
+    if client in db_instance.retired_clients:
+        db_instance.retired_clients.discard(client)
+        client.close()
+
 async def close_mongo_connection():
     """Close database connection"""
+    for client in list(db_instance.retired_clients):
+        _close_retired_client(client)
     if db_instance.client:
         db_instance.client.close()
         logger.info("Disconnected from MongoDB")
 
+def usages_timeseries_options() -> Dict[str, Any]:
+    """create_collection options for the time-series usages collection."""
+    options = {
+        "timeseries": {
+            "timeField": "timestamp",
+            # One metaField only; token keeps documents in the UsageModel layout
+            # and buckets each token's records together
+            "metaField": "token",
+            "granularity": settings.USAGE_TIMESERIES_GRANULARITY,
+        }
+    }
+    if settings.USAGE_RETENTION_SECONDS:
+        options["expireAfterSeconds"] = settings.USAGE_RETENTION_SECONDS
+    return options
+
+async def ensure_usages_collection(database) -> bool:
+    """
+    Create usages as a time-series collection when it does not exist yet,
+    and keep the retention of an existing one in line with
+    USAGE_RETENTION_SECONDS. A plain usages collection is left alone until it
+    is converted with `python -m scripts.migrate_usages_timeseries`.
+    Returns whether usages is time-series.
+    """
+    cursor = await database.list_collections(filter={"name": "usages"})
+    infos = await cursor.to_list(length=None)
+    
+    if not infos:
+        if not settings.USAGE_TIMESERIES:
+            return False
+        try:
+            await database.create_collection("usages", **usages_timeseries_options())
+            logger.info("Created time-series usages collection")
+            return True
+        except CollectionInvalid:
+            # Another worker created it first
+            return await ensure_usages_collection(database)
+        except OperationFailure as e:
+            if e.code == 48:  # NamespaceExists, same race on the server side
+                return await ensure_usages_collection(database)
+            logger.warning(f"Could not create time-series usages collection, using a plain one: {e}")
+            return False
+    
+    info = infos[0]
+    if info.get("type") != "timeseries":
+        if settings.USAGE_TIMESERIES:
+            logger.warning(
+                "usages is a plain collection, run `python -m scripts.migrate_usages_timeseries` to convert it"
+            )
+        return False
+    
+    retention = settings.USAGE_RETENTION_SECONDS
+    if info.get("options", {}).get("expireAfterSeconds") != retention:
+        await database.command("collMod", "usages", expireAfterSeconds=retention or "off")
+        logger.info(f"Set usages retention to {retention or 'off'}")
+    return True
+
+async def _create_index(collection, keys, **options) -> bool:
+    """
+    Create one index, logging a failure instead of raising so the indexes
+    after it, TTLs in particular, are still created.
+    """
+    try:
+        await collection.create_index(keys, **options)
+        return True
+    except Exception as e:
+        logger.error(f"Error creating index {keys!r} on {collection.name}: {e}")
+        return False
+
 async def create_indexes():
     """Create database indexes for performance optimization"""
+    database = db_instance.database
+    
+    # Index for tokens collection
+    await _create_index(database.tokens, "token", unique=True)
+    
+    # TTL index removing tokens once they expire
+    await _create_index(database.tokens, "expiresAt", expireAfterSeconds=0)
+    
+    # Indexes for keyset-paginated token listing and its filters
+    await _create_index(database.tokens, [("createdAt", 1), ("_id", 1)])
+    await _create_index(database.tokens, [("isAdmin", 1), ("createdAt", 1), ("_id", 1)])
+    await _create_index(database.tokens, "lastUsed")
+    await _create_index(database.tokens, "description")
+    
+    # Usages: time-series with built-in retention, or a plain collection with a TTL index
     try:
-        # Index for tokens collection
-        await db_instance.database.tokens.create_index("token", unique=True)
-        await db_instance.database.tokens.create_index("createdAt")
-        
-        # Index for usages collection
-        await db_instance.database.usages.create_index([("token", 1), ("timestamp", -1)])
-        await db_instance.database.usages.create_index("endpoint")
-        
-        logger.info("Database indexes created successfully")
-        
+        usages_timeseries = await ensure_usages_collection(database)
     except Exception as e:
-        logger.error(f"Error creating indexes: {e}")
+        logger.error(f"Error preparing usages collection: {e}")
+        usages_timeseries = False
+    await _create_index(database.usages, [("token", 1), ("timestamp", -1)])
+    # Secondary indexes on time-series measurement fields need MongoDB 6.0
+    await _create_index(database.usages, "endpoint")
+    if not usages_timeseries and settings.USAGE_RETENTION_SECONDS:
+        await _create_index(database.usages, "timestamp", expireAfterSeconds=settings.USAGE_RETENTION_SECONDS)
+    
+    # Index for usage rollups, hourly ones expire
+    await _create_index(database.usage_rollups, [("granularity", 1), ("period", 1)])
+    await _create_index(database.usage_rollups, "expiresAt", expireAfterSeconds=0)
+    
+    # Indexes for moderation jobs: expiry, lease sweeps and webhook retries
+    await _create_index(database.moderation_jobs, "expiresAt", expireAfterSeconds=0)
+    await _create_index(database.moderation_jobs, [("status", 1), ("leaseUntil", 1)])
+    await _create_index(
+        database.moderation_jobs, [("webhook.status", 1), ("webhook.nextAttemptAt", 1)], sparse=True
+    )
+    
+    # TTL index expiring cached moderation verdicts
+    await _create_index(database.moderation_results, "createdAt", expireAfterSeconds=settings.RESULT_CACHE_TTL)
+    
+    # TTL index dropping snapshots of workers that stopped reporting
+    await _create_index(database.latency_snapshots, "updatedAt", expireAfterSeconds=settings.LATENCY_SNAPSHOT_TTL)
+    
+    # TTL index expiring shared rate limit counters
+    await _create_index(database.rate_limits, "expiresAt", expireAfterSeconds=0)
+    
+    # Index for perceptual hash blocklist
+    await _create_index(database.hash_blocklist, "hash", unique=True)
+    
+    logger.info("Database indexes created")
 
 def get_database():
     """Get database instance"""
     return db_instance.database
 
+def _read_preference(name: str):
+    mode = read_pref_mode_from_name(name)
+    if mode == ReadPreference.PRIMARY.mode:
+        return ReadPreference.PRIMARY
+    # maxStalenessSeconds keeps lagging secondaries out of selection
+    return make_read_preference(mode, None, settings.MONGO_MAX_STALENESS_SECONDS or -1)
+
+def _collection(name: str, write_concern: Optional[str] = None, read_preference: Optional[str] = None):
+    """
+    Collection handle with a per-collection write concern and read
+    preference. Handles are built once per database, since the getters
+    below run for every query.
+    """
+    database = db_instance.database
+    if db_instance.collections_database is not database:
+        db_instance.collections = {}
+        db_instance.collections_database = database
+    
+    key = (name, write_concern, read_preference)
+    collection = db_instance.collections.get(key)
+    if collection is None:
+        options = {}
+        if write_concern:
+            options["write_concern"] = WriteConcern(w=write_concern_value(write_concern))
+        if read_preference:
+            options["read_preference"] = _read_preference(read_preference)
+        collection = database.get_collection(name, **options)
+        db_instance.collections[key] = collection
+    return collection
+
 # Collections shortcuts
-def get_tokens_collection():
-    return db_instance.database.tokens
+def get_tokens_collection(secondary_ok: bool = False):
+    """Tokens, majority-acknowledged. `secondary_ok` reads use MONGO_TOKENS_READ_PREFERENCE."""
+    return _collection(
+        "tokens",
+        settings.MONGO_TOKENS_WRITE_CONCERN,
+        settings.MONGO_TOKENS_READ_PREFERENCE if secondary_ok else None
+    )
+
+def get_token_counters_collection():
+    """Tokens, for the lastUsed/usageCount updates written with the usage tier."""
+    return _collection("tokens", settings.MONGO_USAGE_WRITE_CONCERN)
+
+def get_usages_collection(secondary_ok: bool = False):
+    return _collection(
+        "usages",
+        settings.MONGO_USAGE_WRITE_CONCERN,
+        settings.MONGO_STATS_READ_PREFERENCE if secondary_ok else None
+    )
+
+def get_usages_archive_collection():
+    """Usages for the archiver, whose deletes are acknowledged even when the usage tier is "0"."""
+    write_concern = settings.MONGO_USAGE_WRITE_CONCERN
+    return _collection("usages", "1" if write_concern == "0" else write_concern)
+
+def get_usage_rollups_collection(secondary_ok: bool = False):
+    return _collection(
+        "usage_rollups",
+        settings.MONGO_USAGE_WRITE_CONCERN,
+        settings.MONGO_STATS_READ_PREFERENCE if secondary_ok else None
+    )
+
+def get_moderation_results_collection():
+    return db_instance.database.moderation_results
+
+def get_moderation_jobs_collection():
+    return db_instance.database.moderation_jobs
+
+def get_hash_blocklist_collection():
+    return db_instance.database.hash_blocklist
+
+def get_rate_limits_collection():
+    return db_instance.database.rate_limits
+
+def get_locks_collection():
+    return db_instance.database.locks
 
-def get_usages_collection():
-    return db_instance.database.usages
\ No newline at end of file
+def get_latency_snapshots_collection(secondary_ok: bool = False):
+    return _collection(
+        "latency_snapshots",
+        read_preference=settings.MONGO_STATS_READ_PREFERENCE if secondary_ok else None
+    )
@@ -1,9 +1,17 @@
 # backend/app/core/exceptions.py
 
 class CustomException(Exception):
-    def __init__(self, message: str, status_code: int = 400):
-        self.message = message
+    def __init__(
+        self,
+        message: str = None,
+        status_code: int = 400,
+        detail: str = None,
+        error_type: str = None
+    ):
+        self.message = message or detail
+        self.detail = detail or message
         self.status_code = status_code
+        self.error_type = error_type
 
     def __str__(self):
         return self.message
@@ -0,0 +1,524 @@
+# backend/app/core/metrics.py
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.config import settings
+from app.utils.histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond cache hits up to slow batch requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Starlette appends the charset to text/* media types
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """
+    Base for metrics kept as plain dicts keyed by label values.
+
+    Updates happen on the event loop thread only, so they need no locks;
+    code running on other threads (the MongoDB listeners) hands its
+    observations over through a deque that is drained before export.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, Any] = {}
+
+    def dump(self) -> List[List[Any]]:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    @staticmethod
+    def merge(values: Dict[Labels, Any], labels: Labels, value: float):
+        values[labels] = values.get(labels, 0.0) + value
+
+    def render(self, values: Dict[Labels, Any], openmetrics: bool) -> List[str]:
+        # OpenMetrics names the family without the suffix, the text format names the sample
+        name = self.name if openmetrics else f"{self.name}_total"
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} counter"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    Gauges of workers that have exited are dropped when merging; the live
+    ones are summed, or with mode="max" the largest is kept.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def merge(self, values: Dict[Labels, Any], labels: Labels, value: float):
+        if self.mode == "max":
+            values[labels] = max(values.get(labels, value), value)
+        else:
+            values[labels] = values.get(labels, 0.0) + value
+
+    def render(self, values: Dict[Labels, Any], openmetrics: bool) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Histogram(Metric):
+    """Per label set: one count per bucket (non-cumulative, +Inf last) and the sum."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, *labels: str) -> _Timer:
+        return _Timer(self, labels)
+
+    @staticmethod
+    def merge(values: Dict[Labels, Any], labels: Labels, value: List[float]):
+        state = values.get(labels)
+        if state is None:
+            values[labels] = list(value)
+        else:
+            for i, amount in enumerate(value):
+                state[i] += amount
+
+    def render(self, values: Dict[Labels, Any], openmetrics: bool) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text} {_format_value(state[-1])}")
+        return lines
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Holds this process's metrics and renders them in the Prometheus text or
+    OpenMetrics format.
+
+    With `directory` set, every worker writes its values to
+    `<directory>/<pid>.json` every `flush_interval` seconds and a scrape of
+    any worker merges all files: counters and histograms are summed across
+    every worker that ever wrote (so they survive restarts of single
+    workers), gauges only across workers that are still running.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 5.0, lag_interval: float = 0.5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lag_interval = lag_interval
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def pid(self) -> int:
+        # Looked up each time so workers forked after import get their own file
+        return os.getpid()
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), mode: str = "sum") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a callback that brings metrics up to date before export."""
+        self._collectors.append(collector)
+
+    def collect(self):
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+
+    def dump(self) -> Dict[str, List[List[Any]]]:
+        self.collect()
+        return {name: metric.dump() for name, metric in self._metrics.items()}
+
+    def write(self):
+        """Write this worker's values to its file."""
+        if self.directory:
+            self._write_file(self.dump())
+
+    def reset_directory(self):
+        """
+        Remove files left by a previous run, so restarted counters do not
+        add to the old ones. Called by the supervisor before workers start.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json") or filename.endswith(".json.tmp"):
+                os.remove(os.path.join(self.directory, filename))
+
+    def _write_file(self, values: Dict[str, List[List[Any]]]):
+        path = os.path.join(self.directory, f"{self.pid}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(values, f)
+        # Atomic, so a concurrent scrape never reads a partial file
+        os.replace(temp_path, path)
+
+    def _worker_dumps(self) -> List[Tuple[bool, Dict[str, List[List[Any]]]]]:
+        """(alive, values) for this worker and every other worker's last file."""
+        dumps = [(True, self.dump())]
+        if not self.directory:
+            return dumps
+
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                pid = int(filename[:-5])
+            except ValueError:
+                continue
+            if pid == self.pid:
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    dumps.append((_pid_alive(pid), json.load(f)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics file {filename}: {e}")
+        return dumps
+
+    def render(self, openmetrics: bool = False) -> str:
+        merged: Dict[str, Dict[Labels, Any]] = {name: {} for name in self._metrics}
+        for alive, values in self._worker_dumps():
+            for name, entries in values.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                for labels, value in entries:
+                    metric.merge(merged[name], tuple(labels), value)
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.extend(metric.render(merged[name], openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    async def start(self):
+        if self._tasks:
+            return
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+        self._tasks.append(asyncio.create_task(self._lag_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        try:
+            self.write()
+        except Exception as e:
+            logger.error(f"Failed to write final metrics: {e}")
+
+    async def _flush_loop(self):
+        """Drain the listener queues and, with a directory, publish this worker's values."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                values = self.dump()
+                if self.directory:
+                    # File I/O off the event loop
+                    await asyncio.to_thread(self._write_file, values)
+            except Exception as e:
+                logger.error(f"Failed to write metrics: {e}")
+
+    async def _lag_loop(self):
+        """Measure how late the event loop wakes up from a fixed sleep."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, loop.time() - start - self.lag_interval)
+            event_loop_lag.set(lag)
+            event_loop_lag_seconds.observe(lag)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Times every MongoDB command by name and collection.
+
+    PyMongo calls listeners on the thread that ran the command, so events
+    are queued on a deque (thread-safe without locks) and folded into the
+    histogram on the event loop when metrics are exported.
+    """
+
+    def __init__(self):
+        self._collections: Dict[Tuple[Any, int], str] = {}
+        self._events: deque = deque()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self._events.append((event.command_name, collection, event.duration_micros / 1e6, "ok"))
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self._events.append((event.command_name, collection, event.duration_micros / 1e6, "error"))
+
+    def drain(self):
+        while True:
+            try:
+                command, collection, duration, outcome = self._events.popleft()
+            except IndexError:
+                return
+            mongodb_command_seconds.observe(duration, command, collection)
+            if outcome == "error":
+                mongodb_command_errors.inc(command, collection)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool gauges and check-out wait times, queued like
+    MongoCommandMetrics. Besides feeding the exported metrics it keeps
+    current counts and wait histograms for the pool stats endpoint and for
+    adaptive pool sizing, which reads them one interval at a time.
+    """
+
+    def __init__(self):
+        self._checkout_started = threading.local()
+        self._events: deque = deque()
+
+        self.open = 0
+        self.in_use = 0
+        self.failures = 0
+        self.waits = LatencyHistogram()
+        self._window_waits = LatencyHistogram()
+        self._window_failures = 0
+        self._window_peak_in_use = 0
+
+    def connection_created(self, event):
+        self._events.append(("open", 1))
+
+    def connection_closed(self, event):
+        self._events.append(("open", -1))
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.value = time.perf_counter()
+
+    def _checkout_wait(self) -> float:
+        started = getattr(self._checkout_started, "value", None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_checked_out(self, event):
+        self._events.append(("in_use", 1))
+        self._events.append(("wait", self._checkout_wait()))
+
+    def connection_check_out_failed(self, event):
+        self._events.append(("failed", 1))
+        self._events.append(("wait", self._checkout_wait()))
+
+    def connection_checked_in(self, event):
+        self._events.append(("in_use", -1))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def drain(self):
+        while True:
+            try:
+                kind, value = self._events.popleft()
+            except IndexError:
+                return
+            if kind == "open":
+                self.open += value
+                mongodb_pool_connections.inc("open", amount=value)
+            elif kind == "in_use":
+                self.in_use += value
+                self._window_peak_in_use = max(self._window_peak_in_use, self.in_use)
+                mongodb_pool_connections.inc("in_use", amount=value)
+            elif kind == "wait":
+                self.waits.record(value)
+                self._window_waits.record(value)
+                mongodb_pool_checkout_wait_seconds.observe(value)
+            else:
+                self.failures += 1
+                self._window_failures += 1
+                mongodb_pool_checkout_failures.inc()
+
+    def take_window(self) -> Tuple[LatencyHistogram, int, int]:
+        """Check-out waits, failed check-outs and peak connections in use since the last call."""
+        self.drain()
+        window = (self._window_waits, self._window_failures, self._window_peak_in_use)
+        self._window_waits = LatencyHistogram()
+        self._window_failures = 0
+        self._window_peak_in_use = self.in_use
+        return window
+
+    def stats(self) -> Dict[str, Any]:
+        self.drain()
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "checkouts": self.waits.count,
+            "checkout_failures": self.failures,
+            "checkout_wait": self.waits.summary(),
+        }
+
+
+# Global metrics registry
+metrics_registry = MetricsRegistry(
+    directory=settings.METRICS_DIR,
+    flush_interval=settings.METRICS_FLUSH_INTERVAL,
+    lag_interval=settings.EVENT_LOOP_LAG_INTERVAL,
+)
+
+http_requests = metrics_registry.counter(
+    "http_requests", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request duration", ("method", "route")
+)
+moderation_stage_seconds = metrics_registry.histogram(
+    "moderation_stage_duration_seconds", "Time spent in each image moderation stage", ("stage",)
+)
+mongodb_command_seconds = metrics_registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command duration", ("command", "collection")
+)
+mongodb_command_errors = metrics_registry.counter(
+    "mongodb_command_errors", "MongoDB commands that failed", ("command", "collection")
+)
+mongodb_pool_connections = metrics_registry.gauge(
+    "mongodb_pool_connections", "MongoDB pool connections by state", ("state",)
+)
+mongodb_pool_checkout_wait_seconds = metrics_registry.histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection"
+)
+mongodb_pool_checkout_failures = metrics_registry.counter(
+    "mongodb_pool_checkout_failures", "MongoDB connection check-outs that failed"
+)
+event_loop_lag = metrics_registry.gauge(
+    "event_loop_lag_seconds", "Most recent event loop wake-up delay", mode="max"
+)
+event_loop_lag_seconds = metrics_registry.histogram(
+    "event_loop_lag_duration_seconds", "Event loop wake-up delay"
+)
+
+# Listeners passed to the MongoDB client
+mongo_command_metrics = MongoCommandMetrics()
+mongo_pool_metrics = MongoPoolMetrics()
+metrics_registry.add_collector(mongo_command_metrics.drain)
+metrics_registry.add_collector(mongo_pool_metrics.drain)
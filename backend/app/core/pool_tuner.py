@@ -0,0 +1,134 @@
+# backend/app/core/pool_tuner.py
+
+import asyncio
+import logging
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.core.database import db_instance, resize_pool, worker_pool_size
+from app.core.metrics import mongo_pool_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MongoPoolTuner:
+    """
+    Adaptive maxPoolSize for this worker's MongoDB client.
+
+    Every `interval` seconds the check-out waits seen by the pool listener
+    decide the next pool size: a p95 wait above `grow_wait_ms`, or any
+    failed check-out, grows the pool by half; a p95 below `shrink_wait_ms`
+    with at most half the pool in use shrinks it by a quarter. Intervals
+    with fewer than `min_checkouts` check-outs are too quiet to judge and
+    only failures act on them. The size stays between `min_size` and
+    `max_size`, which default to this worker's share of MONGO_POOL_BUDGET.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        grow_wait_ms: float,
+        shrink_wait_ms: float,
+        min_checkouts: int,
+        close_delay: float,
+        max_size: Optional[int] = None,
+        enabled: bool = False,
+    ):
+        self.interval = interval
+        self.grow_wait_ms = grow_wait_ms
+        self.shrink_wait_ms = shrink_wait_ms
+        self.min_checkouts = min_checkouts
+        self.close_delay = close_delay
+        self.max_size = max_size
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+        self.resizes: List[Dict[str, Any]] = []
+        self.last_decision: Optional[Dict[str, Any]] = None
+
+    @property
+    def limits(self) -> tuple:
+        share, min_size = worker_pool_size()
+        return max(1, min_size), max(1, self.max_size or share)
+
+    def decide(self, size: int, p95_wait_ms: Optional[float], checkouts: int, failures: int, peak_in_use: int) -> int:
+        """Pool size for the next interval."""
+        min_size, max_size = self.limits
+        if failures or (
+            checkouts >= self.min_checkouts and p95_wait_ms is not None and p95_wait_ms >= self.grow_wait_ms
+        ):
+            size = max(size + 1, math.ceil(size * 1.5))
+        elif (
+            checkouts >= self.min_checkouts and p95_wait_ms is not None
+            and p95_wait_ms < self.shrink_wait_ms and peak_in_use <= size // 2
+        ):
+            size = size - max(1, size // 4)
+        return min(max_size, max(min_size, size))
+
+    async def tune(self):
+        waits, failures, peak_in_use = mongo_pool_metrics.take_window()
+        size = db_instance.options.get("maxPoolSize")
+        if size is None:
+            return
+
+        p95 = waits.quantiles((0.95,))[0.95]
+        p95_wait_ms = None if p95 is None else p95 / 1000
+        target = self.decide(size, p95_wait_ms, waits.count, failures, peak_in_use)
+        self.last_decision = {
+            "at": datetime.utcnow(),
+            "size": size,
+            "target": target,
+            "checkouts": waits.count,
+            "p95_wait_ms": p95_wait_ms,
+            "failures": failures,
+            "peak_in_use": peak_in_use,
+        }
+
+        if target != size:
+            logger.info(
+                f"Resizing MongoDB pool {size} -> {target} "
+                f"(p95 wait {p95_wait_ms} ms, {failures} failed check-outs, peak in use {peak_in_use})"
+            )
+            await resize_pool(target, self.close_delay)
+            self.resizes = (self.resizes + [{"at": datetime.utcnow(), "from": size, "to": target}])[-20:]
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._tune_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _tune_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tune()
+            except Exception as e:
+                logger.error(f"MongoDB pool tuning failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        min_size, max_size = self.limits
+        return {
+            "enabled": self.enabled,
+            "min_size": min_size,
+            "max_size": max_size,
+            "last_decision": self.last_decision,
+            "resizes": self.resizes,
+        }
+
+
+# Global pool tuner instance
+pool_tuner = MongoPoolTuner(
+    interval=settings.MONGO_POOL_ADAPTIVE_INTERVAL,
+    grow_wait_ms=settings.MONGO_POOL_GROW_WAIT_MS,
+    shrink_wait_ms=settings.MONGO_POOL_SHRINK_WAIT_MS,
+    min_checkouts=settings.MONGO_POOL_ADAPTIVE_MIN_CHECKOUTS,
+    close_delay=settings.MONGO_POOL_CLIENT_CLOSE_DELAY,
+    max_size=settings.MONGO_POOL_ADAPTIVE_MAX_SIZE,
+    enabled=settings.MONGO_POOL_ADAPTIVE,
+)
@@ -0,0 +1,227 @@
+# backend/app/core/rate_limit.py
+
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.core.database import get_rate_limits_collection
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRateLimitStore:
+    """
+    In-process stand-in for a Redis-style counter store (INCRBY + EXPIRE).
+    Only shares counts between limiters of the same process, which is
+    enough for a single worker and for development.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, Tuple[int, float]] = {}
+
+    async def incrby(self, deltas: Dict[str, int], ttl: int) -> Dict[str, int]:
+        """Add each delta to its key and return the new totals."""
+        now = time.time()
+        totals = {}
+        for key, delta in deltas.items():
+            count, expires_at = self._counts.get(key, (0, 0.0))
+            if expires_at <= now:
+                count = 0
+            count += delta
+            self._counts[key] = (count, now + ttl)
+            totals[key] = count
+
+        # Drop expired keys so the store does not grow without bound
+        for key in [key for key, (_, expires_at) in self._counts.items() if expires_at <= now]:
+            del self._counts[key]
+
+        return totals
+
+
+class MongoRateLimitStore:
+    """
+    Shares counts between workers through the `rate_limits` collection:
+    one `$inc` upsert per key per sync, with a TTL index cleaning up old
+    windows.
+    """
+
+    async def incrby(self, deltas: Dict[str, int], ttl: int) -> Dict[str, int]:
+        collection = get_rate_limits_collection()
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+
+        await collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": key},
+                    {"$inc": {"count": delta}, "$set": {"expiresAt": expires_at}},
+                    upsert=True
+                )
+                for key, delta in deltas.items()
+            ],
+            ordered=False
+        )
+
+        totals = {}
+        async for doc in collection.find({"_id": {"$in": list(deltas)}}, {"count": 1}):
+            totals[doc["_id"]] = doc["count"]
+        return totals
+
+
+class _Counter:
+    __slots__ = ("window", "count", "previous")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self.previous = 0
+
+
+class RateLimiter:
+    """
+    Per-token sliding-window rate limiter.
+
+    Each key has a counter for the current fixed window and the count of
+    the previous one; the sliding-window estimate weights the previous
+    window by how much of it still overlaps the last `window` seconds.
+    Keys end up in the shared store, so callers pass a hash of the token
+    rather than its value.
+    Checks are O(1) and only touch process memory. Every `sync_interval`
+    seconds the local increments are pushed to the shared store and the
+    counters are refreshed with the totals of all workers, so the limit is
+    enforced cluster-wide within that staleness.
+    """
+
+    def __init__(self, limit: int, window: int, store, sync_interval: float, enabled: bool = True):
+        self.limit = limit
+        self.window = window
+        self.store = store
+        self.sync_interval = sync_interval
+        self.enabled = enabled
+        self._counters: Dict[str, _Counter] = {}
+        self._unsynced: Dict[Tuple[str, int], int] = defaultdict(int)
+        self._task: Optional[asyncio.Task] = None
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, token: str, now: float = None) -> Tuple[bool, int, int]:
+        """
+        Count one request for a token key.
+        Returns (allowed, remaining, reset) where reset is seconds until the
+        current window ends.
+        """
+        now = time.time() if now is None else now
+        window = int(now // self.window)
+        elapsed = now - window * self.window
+        reset = math.ceil(self.window - elapsed)
+
+        counter = self._counters.get(token)
+        if counter is None:
+            counter = self._counters[token] = _Counter(window)
+        elif counter.window != window:
+            counter.previous = counter.count if counter.window == window - 1 else 0
+            counter.window = window
+            counter.count = 0
+
+        estimate = counter.previous * (1 - elapsed / self.window) + counter.count
+        if estimate >= self.limit:
+            self.rejected += 1
+            return False, 0, reset
+
+        counter.count += 1
+        self._unsynced[(token, window)] += 1
+        self.allowed += 1
+        return True, max(0, int(self.limit - estimate - 1)), reset
+
+    async def sync(self):
+        """Push local increments to the shared store and pull back global totals."""
+        if not self._unsynced:
+            self._prune()
+            return
+
+        deltas, self._unsynced = self._unsynced, defaultdict(int)
+        try:
+            totals = await self.store.incrby(
+                {f"{token}:{window}": delta for (token, window), delta in deltas.items()},
+                ttl=2 * self.window
+            )
+        except Exception:
+            # Pushed again with the next sync instead of being lost
+            for key, delta in deltas.items():
+                self._unsynced[key] += delta
+            raise
+
+        for (token, window) in deltas:
+            total = totals.get(f"{token}:{window}")
+            counter = self._counters.get(token)
+            if total is None or counter is None:
+                continue
+            if counter.window == window:
+                # Hits counted here since the swap are not in the store yet
+                counter.count = max(counter.count, total + self._unsynced.get((token, window), 0))
+            elif counter.window == window + 1:
+                counter.previous = max(counter.previous, total)
+
+        self._prune()
+
+    def _prune(self):
+        current = int(time.time() // self.window)
+        for token in [token for token, counter in self._counters.items() if counter.window < current - 1]:
+            del self._counters[token]
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Failed to flush rate limit counters: {e}")
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Failed to sync rate limit counters: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "limit": self.limit,
+            "window": self.window,
+            "tracked_tokens": len(self._counters),
+            "unsynced_keys": len(self._unsynced),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+def create_rate_limit_store(name: str):
+    if name == "memory":
+        return MemoryRateLimitStore()
+    if name == "mongo":
+        return MongoRateLimitStore()
+    raise ValueError(f"Unknown RATE_LIMIT_STORE: {name}")
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(
+    limit=settings.RATE_LIMIT_REQUESTS,
+    window=settings.RATE_LIMIT_WINDOW,
+    store=create_rate_limit_store(settings.RATE_LIMIT_STORE),
+    sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
@@ -1,23 +1,90 @@
 # backend/app/core/security.py
 
-from fastapi import Depends, HTTPException, status
+import hashlib
+import hmac
+import ipaddress
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from app.config import settings
 from app.core.database import get_tokens_collection
 from app.core.exceptions import CustomException
+from app.core.token_cache import token_cache
 
 security = HTTPBearer()
 
+# State dict of the request being handled, set by UsageTrackingMiddleware.
+# Authentication records the token that passed in it; the dict is shared,
+# so this also works from routes running in a copied context.
+request_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_state", default=None)
+
+
+def hash_token(token: str) -> str:
+    """
+    Short, non-reversible id for a bearer token, used wherever tokens key
+    in-memory counters or get stored and reported outside the tokens
+    collection, so the secret itself never leaves it.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+async def get_token_document(token: str):
+    """
+    Resolve a bearer token to its document, going through the in-process
+    token cache before MongoDB. Returns None for unknown tokens.
+
+    Lookups may be served by a secondary (MONGO_TOKENS_READ_PREFERENCE), so a
+    deactivation can take up to MONGO_MAX_STALENESS_SECONDS plus the cache
+    TTL to apply.
+    """
+    found, token_doc = token_cache.get(token)
+    if found:
+        return token_doc
+
+    token_doc = await get_tokens_collection(secondary_ok=True).find_one({"token": token})
+    if token_doc is None and settings.MONGO_TOKENS_READ_PREFERENCE != "primary":
+        # A token created moments ago may not have replicated yet; confirm
+        # on the primary before caching it as unknown
+        token_doc = await get_tokens_collection().find_one({"token": token})
+    token_cache.set(token, token_doc)
+    return token_doc
+
+
+def check_token_usable(token_doc):
+    """
+    Reject unknown, deactivated and expired tokens. Runs against the cached
+    document, so it costs no query; the TTL index on expiresAt removes
+    expired tokens from MongoDB later on.
+    """
+    if not token_doc:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if token_doc.get("isActive") is False:
+        raise HTTPException(status_code=401, detail="Token is inactive")
+
+    expires_at = token_doc.get("expiresAt")
+    if expires_at is not None and expires_at <= datetime.utcnow():
+        raise HTTPException(status_code=401, detail="Token has expired")
+
+
+def _mark_authenticated(token_doc):
+    state = request_state.get()
+    if state is not None:
+        state["authenticated_token"] = hash_token(token_doc["token"])
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     token = credentials.credentials
-    tokens_collection = get_tokens_collection()
 
-    token_doc = await tokens_collection.find_one({"token": token})
-    if not token_doc:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    token_doc = await get_token_document(token)
+    check_token_usable(token_doc)
+    _mark_authenticated(token_doc)
 
     return token_doc
 
@@ -25,13 +92,37 @@ async def get_current_user(
 async def verify_admin_token(
     token_str: str
 ):
-    tokens_collection = get_tokens_collection()
-
-    token_doc = await tokens_collection.find_one({"token": token_str})
-    if not token_doc:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    token_doc = await get_token_document(token_str)
+    check_token_usable(token_doc)
 
     if not token_doc.get("isAdmin"):
         raise HTTPException(status_code=403, detail="Admin privileges required")
+    _mark_authenticated(token_doc)
 
     return token_doc
+
+
+def verify_metrics_access(request: Request):
+    """
+    Let a /metrics scrape through if it comes from METRICS_ALLOWED_NETWORKS
+    or carries METRICS_TOKEN as its bearer token. The client address is the
+    one of the connection, not X-Forwarded-For, which the caller controls.
+    """
+    client = request.client
+    if client is not None:
+        try:
+            address = ipaddress.ip_address(client.host)
+        except ValueError:
+            address = None
+        if address is not None and any(
+            address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_NETWORKS
+        ):
+            return
+
+    auth_header = request.headers.get("authorization", "")
+    if settings.METRICS_TOKEN and auth_header.startswith("Bearer ") and hmac.compare_digest(
+        auth_header[7:].encode(), settings.METRICS_TOKEN.encode()
+    ):
+        return
+
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metrics access denied")
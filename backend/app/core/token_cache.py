@@ -0,0 +1,105 @@
+# backend/app/core/token_cache.py
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+
+# Sentinel stored for tokens that are known not to exist
+_MISSING = object()
+
+
+class TokenCache:
+    """
+    Bounded in-process LRU cache of token documents with per-entry TTL.
+    Unknown tokens are cached as negative entries with a shorter TTL so
+    repeated bad credentials do not hit MongoDB either.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up a token.
+        Returns (found, token_doc); token_doc is None for negative entries.
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(token)
+        if value is _MISSING:
+            self.negative_hits += 1
+            return True, None
+
+        self.hits += 1
+        return True, value
+
+    def set(self, token: str, token_doc: Optional[Dict[str, Any]]):
+        """Cache a token document, or a negative entry when token_doc is None."""
+        if self.max_size <= 0:
+            return
+
+        if token_doc is None:
+            entry = (time.monotonic() + self.negative_ttl, _MISSING)
+        else:
+            entry = (time.monotonic() + self.ttl, token_doc)
+
+        self._entries[token] = entry
+        self._entries.move_to_end(token)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, token: str):
+        """Drop a token from the cache so the next lookup goes to MongoDB."""
+        if self._entries.pop(token, None) is not None:
+            self.invalidations += 1
+
+    def invalidate_many(self, tokens: Iterable[str]):
+        """Drop several tokens in one pass, e.g. after a bulk create or revoke."""
+        for token in tokens:
+            if self._entries.pop(token, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global token cache instance
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+    negative_ttl=settings.TOKEN_CACHE_NEGATIVE_TTL,
+)
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import time
 import logging
 
@@ -8,7 +8,19 @@ from app.config import settings
 from app.core.database import connect_to_mongo, close_mongo_connection
 from app.core.exceptions import CustomException
 from app.api import auth, moderation
-from app.api.middleware import UsageTrackingMiddleware
+from app.api.middleware import (
+    UsageTrackingMiddleware, RequestSizeLimitMiddleware, RateLimitMiddleware, MULTIPART_OVERHEAD
+)
+from app.core.rate_limit import rate_limiter
+from app.core.security import verify_metrics_access
+from app.core.pool_tuner import pool_tuner
+from app.core.metrics import metrics_registry, OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE
+from app.services.usage_writer import usage_writer
+from app.services.latency_tracker import latency_tracker
+from app.services.perceptual_hash import hash_blocklist
+from app.services.moderation_service import inference_executor
+from app.services.job_queue import job_queue
+from app.services.usage_archive import usage_archiver
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +35,23 @@ app = FastAPI(
     redoc_url="/redoc" if settings.ENVIRONMENT == "development" else None,
 )
 
+# Reject oversized uploads before they are parsed
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    default_limit=settings.MAX_REQUEST_BODY_SIZE,
+    path_limits={
+        "/moderate": settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/moderate/batch": settings.MAX_BATCH_REQUEST_SIZE,
+        "/moderate/jobs": settings.MAX_BATCH_REQUEST_SIZE,
+    },
+)
+
+# Add custom usage tracking middleware (also sets X-Process-Time)
+app.add_middleware(UsageTrackingMiddleware)
+
+# Enforce per-token rate limits ahead of everything but CORS, so 429s carry CORS headers
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,20 +59,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"],
 )
 
-# Add custom usage tracking middleware
-app.add_middleware(UsageTrackingMiddleware)
-
-# Add timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
 # Custom exception handler
 @app.exception_handler(CustomException)
 async def custom_exception_handler(request: Request, exc: CustomException):
@@ -58,10 +76,28 @@ async def startup_event():
     logger.info("Starting up Image Moderation API...")
     await connect_to_mongo()
     logger.info("Connected to MongoDB")
+    await pool_tuner.start()
+    await usage_writer.start()
+    await rate_limiter.start()
+    await metrics_registry.start()
+    await latency_tracker.start()
+    await hash_blocklist.start()
+    await inference_executor.start()
+    await job_queue.start()
+    await usage_archiver.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Image Moderation API...")
+    await usage_archiver.stop()
+    await job_queue.stop()
+    await inference_executor.stop()
+    await hash_blocklist.stop()
+    await metrics_registry.stop()
+    await latency_tracker.stop()
+    await rate_limiter.stop()
+    await usage_writer.stop(timeout=settings.USAGE_SHUTDOWN_TIMEOUT)
+    await pool_tuner.stop()
     await close_mongo_connection()
     logger.info("Disconnected from MongoDB")
 
@@ -83,6 +119,16 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_metrics_access)])
+    async def metrics(request: Request):
+        # Prometheus asks for OpenMetrics in its Accept header when it supports it
+        openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+        return Response(
+            content=metrics_registry.render(openmetrics=openmetrics),
+            media_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+        )
+
 # Include routers
 app.include_router(
     auth.router,
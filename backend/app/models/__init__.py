@@ -1,10 +1,16 @@
-from .token import TokenModel, TokenCreate, TokenResponse, TokenUpdate, PyObjectId, TokenInfo
+from .token import (
+    TokenModel, TokenCreate, TokenResponse, TokenUpdate, PyObjectId, TokenInfo,
+    TokenBulkCreate, TokenBulkCreateItem, TokenBulkCreateResult,
+    TokenBulkRevoke, TokenBulkRevokeItem, TokenBulkRevokeResult
+)
 from .usage import UsageModel, UsageCreate, UsageResponse, UsageStats
-from .moderation import ModerationResult, CategoryScore
+from .moderation import ModerationResult, CategoryScore, BatchItemResult, BatchModerationResult, BlocklistEntry, ModerationJob
 
 
 __all__ = [
     "TokenModel", "TokenCreate", "TokenResponse", "TokenUpdate", "TokenInfo", "PyObjectId",
+    "TokenBulkCreate", "TokenBulkCreateItem", "TokenBulkCreateResult",
+    "TokenBulkRevoke", "TokenBulkRevokeItem", "TokenBulkRevokeResult",
     "UsageModel", "UsageCreate", "UsageResponse", "UsageStats",
-    "ModerationResult", "CategoryScore"
+    "ModerationResult", "CategoryScore", "BatchItemResult", "BatchModerationResult", "BlocklistEntry", "ModerationJob"
 ]
\ No newline at end of file
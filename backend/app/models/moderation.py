@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -15,3 +15,41 @@ class ModerationResult(BaseModel):
     scores: List[CategoryScore] = Field(..., description="List of category scores")
     filename: str = Field(..., description="Original filename of the uploaded image")
     content_type: str = Field(..., description="MIME type of the uploaded image")
+    cached: bool = Field(default=False, description="Whether the scores were served from the result cache")
+    blocklisted: bool = Field(default=False, description="Whether the image matched a blocklisted image hash")
+
+
+class BatchItemResult(BaseModel):
+    """Outcome for one image of a batch moderation request"""
+    filename: str = Field(..., description="Filename, or archive member name, of the image")
+    result: Optional[ModerationResult] = Field(None, description="Moderation result if the image was analyzed")
+    error: Optional[str] = Field(None, description="Reason the image could not be analyzed")
+
+
+class BatchModerationResult(BaseModel):
+    """Batch moderation response"""
+    total: int = Field(..., description="Number of images in the batch")
+    succeeded: int = Field(..., description="Number of images analyzed successfully")
+    failed: int = Field(..., description="Number of images that could not be analyzed")
+    items: List[BatchItemResult] = Field(..., description="Per-image results in upload order")
+
+
+class BlocklistEntry(BaseModel):
+    """Known-bad perceptual image hash"""
+    hash: str = Field(..., min_length=16, max_length=16, description="64-bit perceptual hash as 16 hex digits")
+    category: str = Field(..., description="Moderation category reported for matching images")
+    description: Optional[str] = Field(None, description="Why the hash was blocklisted")
+
+
+class ModerationJob(BaseModel):
+    """State of an asynchronous moderation job"""
+    job_id: str = Field(..., description="Job ID to poll")
+    status: str = Field(..., description="queued, processing, completed or failed")
+    item_count: int = Field(..., description="Number of images in the job")
+    created_at: datetime = Field(..., description="When the job was submitted")
+    updated_at: datetime = Field(..., description="Last status change")
+    result: Optional[BatchModerationResult] = Field(None, description="Per-image results once completed")
+    error: Optional[str] = Field(None, description="Why the job failed")
+    callback_url: Optional[str] = Field(None, description="Webhook the result is posted to")
+    webhook_status: Optional[str] = Field(None, description="pending, delivered or failed")
+    webhook_attempts: int = Field(0, description="Webhook delivery attempts so far")
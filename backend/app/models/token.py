@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, List
 
 from bson import ObjectId
 from pydantic import BaseModel, Field
@@ -68,6 +68,8 @@ class TokenInfo(BaseModel):
     description: Optional[str] = Field(None, description="Token description")
     lastUsed: Optional[datetime] = Field(None, description="Last time this token was used")
     usageCount: int = Field(default=0, description="Total usage count")
+    isActive: bool = Field(default=True, description="Token active status")
+    expiresAt: Optional[datetime] = Field(None, description="Token expiration timestamp")
 
 class TokenResponse(BaseModel):
     """Token response model"""
@@ -85,3 +87,46 @@ class TokenUpdate(BaseModel):
     is_active: Optional[bool] = Field(None, description="Token active status")
     description: Optional[str] = Field(None, description="Token description or purpose")
     expires_at: Optional[datetime] = Field(None, description="Token expiration timestamp")
+
+
+class TokenBulkCreate(BaseModel):
+    """Bulk token creation request model"""
+    count: int = Field(..., ge=1, description="Number of tokens to generate")
+    is_admin: bool = Field(default=False, description="Admin privileges flag for every token")
+    expires_at: Optional[datetime] = Field(None, description="Expiration timestamp for every token")
+    description: Optional[str] = Field(None, description="Description shared by every token")
+
+
+class TokenBulkCreateItem(BaseModel):
+    """Outcome of one token in a bulk create"""
+    index: int = Field(..., description="Position in the generated batch")
+    status: str = Field(..., description="created or failed")
+    token: Optional[TokenResponse] = Field(None, description="The new token when created")
+    error: Optional[str] = Field(None, description="Why the token was not created")
+
+
+class TokenBulkCreateResult(BaseModel):
+    """Bulk token creation response model"""
+    created: int = Field(..., description="Tokens created")
+    failed: int = Field(..., description="Tokens that could not be written")
+    items: List[TokenBulkCreateItem] = Field(..., description="Per-token outcomes")
+
+
+class TokenBulkRevoke(BaseModel):
+    """Bulk token revocation request model"""
+    tokens: List[str] = Field(..., min_length=1, description="Bearer tokens to revoke")
+
+
+class TokenBulkRevokeItem(BaseModel):
+    """Outcome of one token in a bulk revoke"""
+    token: str = Field(..., description="The token as sent")
+    status: str = Field(..., description="revoked, not_found or skipped")
+    error: Optional[str] = Field(None, description="Why the token was not revoked")
+
+
+class TokenBulkRevokeResult(BaseModel):
+    """Bulk token revocation response model"""
+    revoked: int = Field(..., description="Tokens revoked")
+    not_found: int = Field(..., description="Tokens that did not exist")
+    skipped: int = Field(..., description="Tokens left untouched")
+    items: List[TokenBulkRevokeItem] = Field(..., description="Per-token outcomes, in request order")
@@ -11,6 +11,7 @@ class UsageModel(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     token: str = Field(..., description="Bearer token used for the request")
     endpoint: str = Field(..., description="API endpoint accessed")
+    route: Optional[str] = Field(None, description="Matched route template")
     method: str = Field(..., description="HTTP method used")
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="Request timestamp")
     ip_address: Optional[str] = Field(None, description="Client IP address")
@@ -0,0 +1,171 @@
+# backend/app/server.py
+
+"""
+Production launcher running SERVER_WORKERS uvicorn workers behind one
+listening socket.
+
+The supervisor binds the socket, imports the app (and, with the thread
+inference executor, loads the model) and then forks the workers, so the
+preloaded code and weights are shared copy-on-write instead of being loaded
+once per worker. Each worker connects to MongoDB with its share of
+MONGO_POOL_BUDGET and its share of INFERENCE_WORKERS. Workers that crash
+are replaced. On SIGTERM or SIGINT every worker is asked to stop: it stops
+accepting connections, finishes in-flight requests and runs the app's
+shutdown (flushing usage records and metrics) within
+SERVER_SHUTDOWN_TIMEOUT, after which it is killed.
+
+Usage (from backend/):
+    SERVER_WORKERS=4 MONGO_POOL_BUDGET=40 python -m app.server
+"""
+
+import gc
+import logging
+import multiprocessing
+import signal
+import socket
+import time
+from typing import Any, Dict
+
+import uvicorn
+
+from app.config import settings
+from app.core.metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload() -> Any:
+    """Import the app and load shareable state in the supervisor, before forking."""
+    from app.main import app
+    from app.services.backends import FORK_SAFE_BACKENDS
+    from app.services.moderation_service import inference_executor
+
+    if settings.INFERENCE_EXECUTOR == "thread":
+        if settings.MODERATION_BACKEND in FORK_SAFE_BACKENDS:
+            inference_executor.preload()
+            logger.info(f"Preloaded {settings.MODERATION_BACKEND} model before forking")
+        else:
+            logger.info(f"{settings.MODERATION_BACKEND} model is not fork-safe, workers load their own")
+
+    # Move everything loaded so far out of the collector's generations, so
+    # collections in the workers do not touch, and copy, the shared pages
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def serve(app: Any, sock: socket.socket):
+    """Worker process entry point."""
+    # Drop the supervisor's handlers until uvicorn installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        timeout_graceful_shutdown=int(settings.SERVER_SHUTDOWN_TIMEOUT),
+        proxy_headers=True,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers, replaces crashed ones and drains them on shutdown."""
+
+    def __init__(self, app: Any, sock: socket.socket, workers: int, shutdown_timeout: float, restart_delay: float):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_delay = restart_delay
+        self._context = multiprocessing.get_context("fork")
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._stopping = False
+
+    def _spawn(self, slot: int):
+        process = self._context.Process(
+            target=serve, args=(self.app, self.sock), name=f"worker-{slot}", daemon=False
+        )
+        process.start()
+        self._processes[slot] = process
+        logger.info(f"Started worker {slot} (pid {process.pid})")
+
+    def _handle_signal(self, signum, frame):
+        if not self._stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, draining workers")
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self._stopping:
+            time.sleep(0.5)
+            for slot, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+                logger.error(f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode}, restarting")
+                time.sleep(self.restart_delay)
+                if not self._stopping:
+                    self._spawn(slot)
+
+        self.stop()
+
+    def stop(self):
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for slot, process in self._processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker {slot} (pid {process.pid}) did not drain in time, killing it")
+                process.kill()
+                process.join()
+
+        self.sock.close()
+        logger.info("All workers stopped")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    if settings.SERVER_WORKERS > 1:
+        if settings.METRICS_ENABLED and not settings.METRICS_DIR:
+            logger.warning("METRICS_DIR is not set, /metrics will only show the worker that serves the scrape")
+        if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_STORE == "memory":
+            logger.warning("RATE_LIMIT_STORE=memory counts per worker, clients get SERVER_WORKERS times the limit")
+    metrics_registry.reset_directory()
+
+    sock = bind_socket(settings.API_HOST, settings.API_PORT, settings.SERVER_BACKLOG)
+    app = preload() if settings.SERVER_PRELOAD else "app.main:app"
+    logger.info(
+        f"Serving on {settings.API_HOST}:{settings.API_PORT} with {settings.SERVER_WORKERS} workers"
+    )
+
+    Supervisor(
+        app,
+        sock,
+        workers=settings.SERVER_WORKERS,
+        # Past the workers' own graceful timeout, leaving time for the app's shutdown
+        shutdown_timeout=settings.SERVER_SHUTDOWN_TIMEOUT + settings.USAGE_SHUTDOWN_TIMEOUT + 5,
+        restart_delay=settings.SERVER_RESTART_DELAY,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
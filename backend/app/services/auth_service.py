@@ -1,30 +1,213 @@
 # backend/app/services/auth_service.py
 
+import base64
+import json
+import re
 import secrets
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
 from app.core.database import get_tokens_collection
+from app.core.exceptions import CustomException
+from app.core.token_cache import token_cache
+
+# Fields needed for TokenInfo; token values are never read back
+TOKEN_INFO_PROJECTION = {
+    "isAdmin": 1, "createdAt": 1, "description": 1, "lastUsed": 1, "usageCount": 1, "isActive": 1, "expiresAt": 1
+}
+
+# Listing order, matched by the (createdAt, _id) indexes
+TOKEN_SORT = [("createdAt", 1), ("_id", 1)]
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert to naive UTC, the form MongoDB returns and utcnow() compares against."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(token_doc: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past a token in listing order."""
+    position = {"c": token_doc["createdAt"].isoformat(), "i": str(token_doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
 
-class AuthService:
-    async def create_token(self, is_admin: bool, description: str = None):
-        token_value = secrets.token_urlsafe(32)
 
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["c"]), ObjectId(position["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise CustomException(
+            status_code=400,
+            detail="Invalid pagination cursor",
+            error_type="INVALID_CURSOR"
+        )
+
+
+class AuthService:
+    def _new_token_doc(
+        self, is_admin: bool, description: Optional[str], expires_at: Optional[datetime], created_at: datetime
+    ) -> Dict[str, Any]:
         token_doc = {
-            "token": token_value,
+            "token": secrets.token_urlsafe(32),
             "isAdmin": is_admin,
+            "isActive": True,
             "description": description,
-            "createdAt": datetime.utcnow(),
+            "createdAt": created_at,
             "usageCount": 0,
         }
+        # Only set when given: the TTL index ignores documents without it
+        if expires_at is not None:
+            token_doc["expiresAt"] = to_utc_naive(expires_at)
+        return token_doc
+
+    async def create_token(self, is_admin: bool, description: str = None, expires_at: datetime = None):
+        token_doc = self._new_token_doc(is_admin, description, expires_at, datetime.utcnow())
+        token_value = token_doc["token"]
 
         tokens_collection = get_tokens_collection()
         await tokens_collection.insert_one(token_doc)
+
+        # Drop any negative cache entry for this value
+        token_cache.invalidate(token_value)
         return token_doc
 
-    async def get_all_tokens(self):
+    async def create_tokens(
+        self, count: int, is_admin: bool, description: str = None, expires_at: datetime = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+        """
+        Generate `count` tokens and write them with one unordered insert_many.
+        Returns the token documents and the error message of each index
+        that failed to insert.
+        """
+        created_at = datetime.utcnow()
+        token_docs = [self._new_token_doc(is_admin, description, expires_at, created_at) for _ in range(count)]
+
+        errors: Dict[int, str] = {}
+        try:
+            await get_tokens_collection().insert_many(token_docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+
+        # Drop any negative cache entries for these values
+        token_cache.invalidate_many(token_doc["token"] for token_doc in token_docs)
+        return token_docs, errors
+
+    async def revoke_tokens(self, tokens: List[str]) -> set:
+        """
+        Delete the given tokens with one delete_many.
+        Returns the subset that existed and was revoked.
+        """
+        tokens_collection = get_tokens_collection()
+        existing = set()
+        async for token_doc in tokens_collection.find({"token": {"$in": tokens}}, {"token": 1, "_id": 0}):
+            existing.add(token_doc["token"])
+
+        if existing:
+            await tokens_collection.delete_many({"token": {"$in": list(existing)}})
+
+        token_cache.invalidate_many(tokens)
+        return existing
+
+    def build_token_filter(
+        self,
+        is_admin: Optional[bool] = None,
+        is_active: Optional[bool] = None,
+        last_used_after: Optional[datetime] = None,
+        last_used_before: Optional[datetime] = None,
+        description_prefix: Optional[str] = None
+    ) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if is_admin is not None:
+            query["isAdmin"] = is_admin
+        if is_active is not None:
+            # Tokens created before isActive was stored are active
+            query["isActive"] = {"$ne": False} if is_active else False
+        if last_used_after is not None or last_used_before is not None:
+            query["lastUsed"] = {}
+            if last_used_after is not None:
+                query["lastUsed"]["$gte"] = last_used_after
+            if last_used_before is not None:
+                query["lastUsed"]["$lt"] = last_used_before
+        if description_prefix:
+            # An anchored, case-sensitive regex is answered from the index
+            query["description"] = {"$regex": f"^{re.escape(description_prefix)}"}
+        return query
+
+    async def list_tokens(
+        self, query: Dict[str, Any], limit: int, after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of tokens in (createdAt, _id) order, starting after the
+        `after` cursor. Returns the documents and the cursor of the next
+        page, or None on the last page.
+        """
+        if after:
+            created_at, token_id = decode_cursor(after)
+            query = {
+                **query,
+                "$or": [
+                    {"createdAt": {"$gt": created_at}},
+                    {"createdAt": created_at, "_id": {"$gt": token_id}},
+                ],
+            }
+
+        tokens_collection = get_tokens_collection()
+        # One extra document tells whether there is a next page
+        tokens = await tokens_collection.find(query, TOKEN_INFO_PROJECTION) \
+            .sort(TOKEN_SORT).limit(limit + 1).to_list(length=limit + 1)
+
+        if len(tokens) > limit:
+            tokens = tokens[:limit]
+            return tokens, encode_cursor(tokens[-1])
+        return tokens, None
+
+    async def iter_tokens(self, query: Dict[str, Any], batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every matching token in listing order without holding them in memory."""
+        tokens_collection = get_tokens_collection()
+        cursor = tokens_collection.find(query, TOKEN_INFO_PROJECTION, batch_size=batch_size).sort(TOKEN_SORT)
+        async for token_doc in cursor:
+            yield token_doc
+
+    async def update_token(self, token: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Apply a TokenUpdate (only the fields that were sent) and return the
+        updated document, or None if the token does not exist. An explicit
+        null expires_at removes the expiry.
+
+        Other workers keep serving their cached copy for up to
+        TOKEN_CACHE_TTL seconds, which bounds how long a deactivation takes
+        to apply everywhere.
+        """
+        fields = {"is_active": "isActive", "description": "description", "expires_at": "expiresAt"}
+        update: Dict[str, Dict[str, Any]] = {}
+        for name, value in changes.items():
+            if name == "is_active" and value is None:
+                continue
+            if name == "expires_at" and value is None:
+                update.setdefault("$unset", {})["expiresAt"] = ""
+            else:
+                update.setdefault("$set", {})[fields[name]] = to_utc_naive(value) if name == "expires_at" else value
+
         tokens_collection = get_tokens_collection()
-        return await tokens_collection.find({}, {"token": 0}).to_list(length=100)
+        if update:
+            token_doc = await tokens_collection.find_one_and_update(
+                {"token": token}, update, projection=TOKEN_INFO_PROJECTION, return_document=ReturnDocument.AFTER
+            )
+        else:
+            token_doc = await tokens_collection.find_one({"token": token}, TOKEN_INFO_PROJECTION)
+
+        token_cache.invalidate(token)
+        return token_doc
 
     async def delete_token(self, token: str):
         tokens_collection = get_tokens_collection()
         result = await tokens_collection.delete_one({"token": token})
+        token_cache.invalidate(token)
         return result.deleted_count > 0
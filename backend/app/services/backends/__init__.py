@@ -0,0 +1,54 @@
+import hashlib
+from typing import List
+
+from .base import ModerationBackend
+from .mock import MockBackend
+from .numpy_backend import NumpyBackend
+from .onnx_backend import OnnxBackend
+
+BACKENDS = {
+    "mock": MockBackend,
+    "numpy": NumpyBackend,
+    "onnx": OnnxBackend,
+}
+
+# Backends whose loaded state survives fork(); ONNX Runtime sessions own
+# thread pools that do not, so they are loaded in each worker instead
+FORK_SAFE_BACKENDS = {"mock", "numpy"}
+
+
+def load_backend(
+    name: str, categories: List[str], model_path: str = None, max_frames: int = 1
+) -> ModerationBackend:
+    """Create, load and warm up the named backend. Runs once per inference worker."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown MODERATION_BACKEND: {name}")
+
+    backend = backend_class(categories, model_path=model_path, max_frames=max_frames)
+    backend.load()
+    backend.warmup()
+    return backend
+
+
+def model_identifier(name: str, model_path: str = None) -> str:
+    """
+    Identify the backend and weights verdicts come from: the backend name,
+    plus a SHA-256 prefix of the model file so retrained weights at the same
+    path get a new identifier.
+    """
+    if not model_path:
+        return name
+    digest = hashlib.sha256()
+    try:
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        # load_backend reports the unreadable file; the path still tells models apart
+        return f"{name}:{model_path}"
+    return f"{name}:{digest.hexdigest()[:16]}"
+
+
+__all__ = ["ModerationBackend", "MockBackend", "NumpyBackend", "OnnxBackend", "BACKENDS", "FORK_SAFE_BACKENDS", "load_backend", "model_identifier"]
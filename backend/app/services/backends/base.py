@@ -0,0 +1,30 @@
+# backend/app/services/backends/base.py
+
+from typing import List, Protocol, Sequence
+
+import numpy as np
+
+
+class ModerationBackend(Protocol):
+    """
+    Interface every moderation model backend implements.
+
+    A backend is created once per inference worker: `load` reads the model,
+    `warmup` runs a throwaway prediction so the first request does not pay
+    for lazy initialisation, and `predict_batch` scores encoded images.
+    """
+
+    categories: List[str]
+
+    def load(self) -> None:
+        ...
+
+    def warmup(self) -> None:
+        ...
+
+    def predict_batch(self, images: Sequence[memoryview]) -> np.ndarray:
+        """
+        Return an array of shape (len(images), len(categories)) with
+        confidences in [0, 1]. Rows of images that could not be decoded are NaN.
+        """
+        ...
@@ -0,0 +1,22 @@
+# backend/app/services/backends/mock.py
+
+from typing import List, Sequence
+
+import numpy as np
+
+
+class MockBackend:
+    """Random confidence per category, without looking at the image."""
+
+    def __init__(self, categories: List[str], model_path: str = None, max_frames: int = 1):
+        self.categories = categories
+        self._rng = None
+
+    def load(self):
+        self._rng = np.random.default_rng()
+
+    def warmup(self):
+        pass
+
+    def predict_batch(self, images: Sequence[memoryview]) -> np.ndarray:
+        return self._rng.uniform(0, 1, size=(len(images), len(self.categories)))
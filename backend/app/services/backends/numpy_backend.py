@@ -0,0 +1,117 @@
+# backend/app/services/backends/numpy_backend.py
+
+import logging
+from typing import List, Sequence
+
+import numpy as np
+
+from app.services.preprocessing import preprocess_batch, reduce_frames
+
+logger = logging.getLogger(__name__)
+
+# Edge length images are reduced to before feature extraction
+INPUT_SIZE = 64
+
+# Grayscale histogram bins used as features
+HISTOGRAM_BINS = 8
+
+FEATURE_COUNT = 3 + 3 + 1 + 1 + 1 + 1 + HISTOGRAM_BINS
+HIDDEN_UNITS = 32
+
+
+def extract_features(batch: np.ndarray) -> np.ndarray:
+    """
+    Hand-crafted colour and texture features for a (N, H, W, 3) batch in [0, 1].
+    Every feature is computed for the whole batch at once.
+    """
+    n = batch.shape[0]
+    red, green, blue = batch[..., 0], batch[..., 1], batch[..., 2]
+    high = batch.max(axis=-1)
+    low = batch.min(axis=-1)
+    gray = batch @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    skin = (
+        (red > 0.37) & (green > 0.16) & (blue > 0.08)
+        & (red > green) & (red > blue) & (red - np.minimum(green, blue) > 0.06)
+    )
+    red_dominant = (red > 0.5) & (green < 0.3) & (blue < 0.3)
+    edges = (
+        np.abs(np.diff(gray, axis=1)).mean(axis=(1, 2))
+        + np.abs(np.diff(gray, axis=2)).mean(axis=(1, 2))
+    )
+    bins = np.minimum((gray * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1).reshape(n, -1)
+    # One bincount for the whole batch, each image offset into its own bin range
+    bins += np.arange(n)[:, None] * HISTOGRAM_BINS
+    histogram = np.bincount(bins.ravel(), minlength=n * HISTOGRAM_BINS).reshape(n, HISTOGRAM_BINS)
+    histogram = histogram / (gray.shape[1] * gray.shape[2])
+
+    return np.column_stack([
+        batch.mean(axis=(1, 2)),
+        batch.std(axis=(1, 2)),
+        (high - low).mean(axis=(1, 2)),
+        skin.mean(axis=(1, 2)),
+        red_dominant.mean(axis=(1, 2)),
+        edges,
+        histogram,
+    ]).astype(np.float32)
+
+
+class NumpyBackend:
+    """
+    Small CPU-only classifier: colour/texture features followed by a
+    two-layer perceptron with one sigmoid output per category.
+
+    Weights are read from an .npz file with arrays w1, b1, w2, b2 and
+    optionally feature_mean/feature_std. Without a model file the network
+    is initialised with fixed random weights, which exercises the real
+    decode and inference cost but does not produce meaningful scores.
+    """
+
+    def __init__(self, categories: List[str], model_path: str = None, max_frames: int = 1):
+        self.categories = categories
+        self.model_path = model_path
+        self.max_frames = max_frames
+
+    def load(self):
+        if self.model_path:
+            weights = np.load(self.model_path)
+            self.w1, self.b1 = weights["w1"], weights["b1"]
+            self.w2, self.b2 = weights["w2"], weights["b2"]
+            self.feature_mean = weights["feature_mean"] if "feature_mean" in weights else np.zeros(FEATURE_COUNT)
+            self.feature_std = weights["feature_std"] if "feature_std" in weights else np.ones(FEATURE_COUNT)
+        else:
+            logger.warning("No MODEL_PATH set, numpy backend is using untrained weights")
+            rng = np.random.default_rng(0)
+            self.w1 = rng.normal(0, 0.5, (FEATURE_COUNT, HIDDEN_UNITS))
+            self.b1 = np.zeros(HIDDEN_UNITS)
+            self.w2 = rng.normal(0, 0.5, (HIDDEN_UNITS, len(self.categories)))
+            self.b2 = np.full(len(self.categories), -1.0)
+            self.feature_mean = np.full(FEATURE_COUNT, 0.3)
+            self.feature_std = np.full(FEATURE_COUNT, 0.2)
+
+        if self.w2.shape[1] != len(self.categories):
+            raise ValueError(
+                f"Model has {self.w2.shape[1]} outputs, expected {len(self.categories)} categories"
+            )
+
+        self.w1 = self.w1.astype(np.float32)
+        self.b1 = self.b1.astype(np.float32)
+        self.w2 = self.w2.astype(np.float32)
+        self.b2 = self.b2.astype(np.float32)
+        self.feature_mean = self.feature_mean.astype(np.float32)
+        self.feature_std = self.feature_std.astype(np.float32)
+
+    def warmup(self):
+        self.predict_pixels(np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32))
+
+    def predict_pixels(self, batch: np.ndarray) -> np.ndarray:
+        features = (extract_features(batch) - self.feature_mean) / self.feature_std
+        hidden = np.maximum(features @ self.w1 + self.b1, 0)
+        logits = hidden @ self.w2 + self.b2
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def predict_batch(self, images: Sequence[memoryview]) -> np.ndarray:
+        pixels, offsets, failed = preprocess_batch(images, INPUT_SIZE, self.max_frames)
+        if failed.all():
+            return reduce_frames(np.empty((0, len(self.categories)), dtype=np.float32), offsets, failed)
+        return reduce_frames(self.predict_pixels(pixels), offsets, failed)
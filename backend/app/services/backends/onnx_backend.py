@@ -0,0 +1,65 @@
+# backend/app/services/backends/onnx_backend.py
+
+from typing import List, Sequence
+
+import numpy as np
+
+from app.services.preprocessing import preprocess_batch, reduce_frames
+
+# ImageNet normalisation expected by most exported vision models
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class OnnxBackend:
+    """
+    Runs an ONNX image classifier on CPU with onnxruntime.
+
+    The model takes a float32 NCHW batch and returns one logit per category,
+    in the order of ModerationService.CATEGORIES. onnxruntime is optional
+    and only needed when this backend is selected.
+    """
+
+    def __init__(self, categories: List[str], model_path: str = None, max_frames: int = 1):
+        self.categories = categories
+        self.model_path = model_path
+        self.max_frames = max_frames
+
+    def load(self):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError("The onnx backend requires the onnxruntime package")
+
+        if not self.model_path:
+            raise RuntimeError("The onnx backend requires MODEL_PATH")
+
+        options = onnxruntime.SessionOptions()
+        # One inference thread per worker process; parallelism comes from the pool
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        self._session = onnxruntime.InferenceSession(
+            self.model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        height, width = model_input.shape[2], model_input.shape[3]
+        self.input_size = height if isinstance(height, int) else 224
+        if isinstance(width, int) and width != self.input_size:
+            raise ValueError("The onnx backend expects a square model input")
+
+    def warmup(self):
+        self.predict_tensor(np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32))
+
+    def predict_tensor(self, tensor: np.ndarray) -> np.ndarray:
+        logits = self._session.run(None, {self._input_name: tensor})[0]
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def predict_batch(self, images: Sequence[memoryview]) -> np.ndarray:
+        tensor, offsets, failed = preprocess_batch(
+            images, self.input_size, self.max_frames, mean=_MEAN, std=_STD, channels_first=True
+        )
+        if failed.all():
+            return reduce_frames(np.empty((0, len(self.categories)), dtype=np.float32), offsets, failed)
+        return reduce_frames(self.predict_tensor(tensor), offsets, failed)
@@ -0,0 +1,107 @@
+# backend/app/services/batch_scheduler.py
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.inference_executor import ImageDecodeError, InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatchScheduler:
+    """
+    Groups concurrent scoring requests into batches for the inference
+    executor, so the model scores several images per call.
+
+    A batch is dispatched as soon as it holds `max_batch_size` images, or
+    `max_latency_ms` after its first image arrived, whichever comes first.
+    Each caller awaits a future resolved with its own image's scores; an
+    image that cannot be decoded fails only its own future.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_batch_size: int, max_latency_ms: float):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max_latency_ms / 1000
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+        # Number of dispatched batches per batch size
+        self.batch_sizes: Dict[int, int] = {}
+
+    async def score(self, image_data: bytes) -> Dict[str, float]:
+        """Queue one image for the next batch and wait for its scores."""
+        if self.max_batch_size == 1:
+            self._record(1)
+            return await self.executor.score(image_data)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image_data, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._dispatch)
+
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self._record(len(batch))
+        task = asyncio.create_task(self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[bytes, asyncio.Future]]):
+        try:
+            results = await self.executor.score_batch([image_data for image_data, _ in batch])
+        except Exception as e:
+            logger.error(f"Scoring batch of {len(batch)} images failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), scores in zip(batch, results):
+            # The caller may have gone away (client disconnect)
+            if future.done():
+                continue
+            if scores is None:
+                future.set_exception(ImageDecodeError("Image could not be decoded"))
+            else:
+                future.set_result(scores)
+
+    def _record(self, size: int):
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        batches = sum(self.batch_sizes.values())
+        images = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_latency_ms": self.max_latency * 1000,
+            "pending": len(self._pending),
+            "batches": batches,
+            "images": images,
+            "average_batch_size": round(images / batches, 3) if batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+        }
+
+
+def create_batch_scheduler(executor: InferenceExecutor) -> MicroBatchScheduler:
+    return MicroBatchScheduler(
+        executor,
+        max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+        max_latency_ms=settings.INFERENCE_MAX_BATCH_LATENCY_MS,
+    )
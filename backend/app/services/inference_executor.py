@@ -0,0 +1,285 @@
+# backend/app/services/inference_executor.py
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.backends import load_backend
+
+logger = logging.getLogger(__name__)
+
+# Model backend loaded once per worker process by _init_worker
+_worker_model = None
+
+
+class ImageDecodeError(ValueError):
+    """Raised for an image the model backend could not decode."""
+
+
+def _to_scores(model, confidences) -> List[Optional[Dict[str, float]]]:
+    """Scores per image, None for images the backend could not decode (NaN rows)."""
+    return [
+        None if any(math.isnan(value) for value in row) else dict(zip(model.categories, row))
+        for row in confidences.tolist()
+    ]
+
+
+def _init_worker(model_factory: Callable[[], Any]):
+    global _worker_model
+    _worker_model = model_factory()
+
+
+def _warmup() -> bool:
+    return _worker_model is not None
+
+
+def _score_shared(shm_name: str, sizes: List[int]) -> Tuple[List[Optional[Dict[str, float]]], float]:
+    """
+    Score a batch of images the parent packed back to back into shared
+    memory. Runs in a worker process.
+    """
+    start = time.perf_counter()
+    shm = SharedMemory(name=shm_name)
+    images = []
+    try:
+        offset = 0
+        for size in sizes:
+            images.append(shm.buf[offset:offset + size])
+            offset += size
+        scores = _to_scores(_worker_model, _worker_model.predict_batch(images))
+    finally:
+        for image_data in images:
+            image_data.release()
+        shm.close()
+    return scores, time.perf_counter() - start
+
+
+class InferenceExecutor(ABC):
+    """
+    Runs the moderation model off the event loop.
+
+    At most `workers + queue_size` batches are in flight; further callers
+    wait on a semaphore, so a saturated executor only costs the event loop
+    an await. Tracks queue depth and worker utilisation.
+    """
+
+    def __init__(self, model_factory: Callable[[], Any], workers: int, queue_size: int):
+        self.model_factory = model_factory
+        self.workers = workers
+        self._slots = asyncio.Semaphore(workers + queue_size)
+        self._start_lock = asyncio.Lock()
+        self._started_at = time.monotonic()
+
+        self.in_flight = 0
+        self.completed = 0
+        self.batches = 0
+        self.failed = 0
+        self.busy_time = 0.0
+
+    def preload(self):
+        """
+        Load what can be shared with forked server workers. Called before
+        forking; executors with nothing to share leave it a no-op.
+        """
+
+    @abstractmethod
+    async def start(self):
+        """Load the model, or start the workers holding it, before taking traffic."""
+
+    @abstractmethod
+    async def stop(self):
+        """Release the model or shut down its workers."""
+
+    @abstractmethod
+    async def _run(self, images: List[bytes]) -> Tuple[List[Optional[Dict[str, float]]], float]:
+        """Score a batch, returning the scores and the seconds spent on it."""
+
+    async def score_batch(self, images: List[bytes]) -> List[Optional[Dict[str, float]]]:
+        """
+        Score a batch of images, returning a confidence per category for
+        each, or None for an image that could not be decoded.
+        """
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                scores, busy = await self._run(images)
+            except Exception:
+                self.failed += len(images)
+                raise
+            finally:
+                self.in_flight -= 1
+
+        undecodable = scores.count(None)
+        self.completed += len(images) - undecodable
+        self.failed += undecodable
+        self.batches += 1
+        self.busy_time += busy
+        return scores
+
+    async def score(self, image_data: bytes) -> Dict[str, float]:
+        """Score one image, returning a confidence per category."""
+        scores = (await self.score_batch([image_data]))[0]
+        if scores is None:
+            raise ImageDecodeError("Image could not be decoded")
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started_at
+        return {
+            "executor": type(self).__name__,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "busy_workers": min(self.in_flight, self.workers),
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "utilisation": round(self.busy_time / (elapsed * self.workers), 4) if elapsed > 0 else 0.0,
+            "average_batch_time": round(self.busy_time / self.batches, 6) if self.batches else 0.0,
+        }
+
+
+class ThreadInferenceExecutor(InferenceExecutor):
+    """Runs the model in a thread of this process. For development and tests."""
+
+    def __init__(self, model_factory: Callable[[], Any], workers: int, queue_size: int):
+        super().__init__(model_factory, workers, queue_size)
+        self._model = None
+
+    def preload(self):
+        # Forked server workers inherit the loaded model copy-on-write
+        if self._model is None:
+            self._model = self.model_factory()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._model is None:
+                self._model = await asyncio.to_thread(self.model_factory)
+
+    async def stop(self):
+        self._model = None
+
+    def _predict(self, images: List[bytes]) -> Tuple[List[Optional[Dict[str, float]]], float]:
+        start = time.perf_counter()
+        confidences = self._model.predict_batch([memoryview(image_data) for image_data in images])
+        scores = _to_scores(self._model, confidences)
+        return scores, time.perf_counter() - start
+
+    async def _run(self, images: List[bytes]) -> Tuple[List[Optional[Dict[str, float]]], float]:
+        if self._model is None:
+            await self.start()
+        return await asyncio.to_thread(self._predict, images)
+
+
+class ProcessPoolInferenceExecutor(InferenceExecutor):
+    """
+    Runs the model in a pool of worker processes, each holding a warm copy
+    of the model. A batch's image bytes are handed over in one shared memory
+    block instead of being pickled through the pool's pipe. A worker dying,
+    e.g. OOM-killed or crashed by a hostile image, breaks the whole pool; it
+    is then replaced with a fresh one and the batches in flight fail.
+    """
+
+    def __init__(self, model_factory: Callable[[], Any], workers: int, queue_size: int):
+        super().__init__(model_factory, workers, queue_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.restarts = 0
+
+    async def start(self):
+        async with self._start_lock:
+            if self._pool is not None:
+                return
+
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_factory,),
+            )
+
+            # Start every worker and load its model before taking traffic
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(pool, _warmup) for _ in range(self.workers)
+            ))
+            self._pool = pool
+            self._started_at = time.monotonic()
+            logger.info(f"Inference process pool started with {self.workers} workers")
+
+    async def stop(self):
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+            self._pool = None
+            logger.info("Inference process pool stopped")
+
+    async def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Drop a broken pool so the next batch starts a new one."""
+        async with self._start_lock:
+            if self._pool is not pool:
+                # Another batch on the same pool already replaced it
+                return
+            self._pool = None
+            self.restarts += 1
+        logger.error("Inference worker died, restarting the process pool")
+        await asyncio.to_thread(pool.shutdown, wait=False, cancel_futures=True)
+
+    async def _run(self, images: List[bytes]) -> Tuple[List[Optional[Dict[str, float]]], float]:
+        if self._pool is None:
+            await self.start()
+
+        pool = self._pool
+        sizes = [len(image_data) for image_data in images]
+        shm = SharedMemory(create=True, size=max(sum(sizes), 1))
+        try:
+            offset = 0
+            for image_data, size in zip(images, sizes):
+                shm.buf[offset:offset + size] = image_data
+                offset += size
+            return await asyncio.get_running_loop().run_in_executor(
+                pool, _score_shared, shm.name, sizes
+            )
+        except BrokenProcessPool:
+            # Not retried: the batch may hold the image that killed the worker
+            await self._discard_pool(pool)
+            await self.start()
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "pool_restarts": self.restarts}
+
+
+def create_inference_executor(categories) -> InferenceExecutor:
+    """Build the executor selected by INFERENCE_EXECUTOR, running MODERATION_BACKEND."""
+    model_factory = partial(
+        load_backend,
+        settings.MODERATION_BACKEND,
+        list(categories),
+        settings.MODEL_PATH,
+        settings.MAX_ANIMATION_FRAMES,
+    )
+
+    if settings.INFERENCE_EXECUTOR == "process":
+        executor_class = ProcessPoolInferenceExecutor
+    elif settings.INFERENCE_EXECUTOR == "thread":
+        executor_class = ThreadInferenceExecutor
+    else:
+        raise ValueError(f"Unknown INFERENCE_EXECUTOR: {settings.INFERENCE_EXECUTOR}")
+
+    return executor_class(
+        model_factory,
+        # INFERENCE_WORKERS is shared by all server workers on the host
+        workers=max(1, settings.INFERENCE_WORKERS // max(1, settings.SERVER_WORKERS)),
+        queue_size=settings.INFERENCE_QUEUE_SIZE,
+    )
@@ -0,0 +1,486 @@
+# backend/app/services/job_queue.py
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import status
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.core.database import get_moderation_jobs_collection
+from app.core.exceptions import CustomException
+from app.core.security import hash_token
+from app.models.moderation import ModerationJob
+from app.services.moderation_service import moderation_service
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Webhook delivery states
+PENDING = "pending"
+DELIVERED = "delivered"
+
+
+def job_response(job_doc: Dict[str, Any]) -> ModerationJob:
+    webhook = job_doc.get("webhook") or {}
+    return ModerationJob(
+        job_id=job_doc["_id"],
+        status=job_doc["status"],
+        item_count=job_doc.get("itemCount", 0),
+        created_at=job_doc["createdAt"],
+        updated_at=job_doc["updatedAt"],
+        result=job_doc.get("result"),
+        error=job_doc.get("error"),
+        callback_url=job_doc.get("callbackUrl"),
+        webhook_status=webhook.get("status"),
+        webhook_attempts=webhook.get("attempts", 0),
+    )
+
+
+def sign_payload(body: bytes) -> str:
+    """HMAC-SHA256 of a webhook body, so receivers can check it came from us."""
+    return "sha256=" + hmac.new(settings.SECRET_KEY.encode(), body, hashlib.sha256).hexdigest()
+
+
+async def resolve_callback_host(url: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Resolve the callback host once. Returns the first address that is not
+    public (loopback, private, link-local such as 169.254.169.254,
+    reserved...) or None, and the resolved addresses. Hosts in
+    JOB_WEBHOOK_ALLOWED_HOSTS are not resolved and get (None, []). Raises
+    socket.gaierror when the host does not resolve.
+    """
+    parsed = urlparse(url)
+    if parsed.hostname.lower() in {host.lower() for host in settings.JOB_WEBHOOK_ALLOWED_HOSTS}:
+        return None, []
+
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80), type=socket.SOCK_STREAM
+    )
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return str(address), []
+        addresses.append(str(address))
+    return None, addresses
+
+
+async def non_public_address(url: str) -> Optional[str]:
+    """The first address the callback host resolves to that is not public, or None."""
+    address, _ = await resolve_callback_host(url)
+    return address
+
+
+async def check_callback_url(url: str):
+    """Reject callback URLs that are not http(s) or do not resolve to public addresses."""
+    def invalid(detail: str) -> CustomException:
+        return CustomException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail,
+            error_type="INVALID_CALLBACK_URL"
+        )
+
+    try:
+        parsed = urlparse(url)
+        parsed.port  # Raises for a malformed port
+    except ValueError:
+        raise invalid("callback_url must be an http(s) URL")
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise invalid("callback_url must be an http(s) URL")
+
+    try:
+        address = await non_public_address(url)
+    except (socket.gaierror, UnicodeError):
+        raise invalid("callback_url host does not resolve")
+    if address is not None:
+        raise invalid("callback_url must resolve to a public address")
+
+
+class ModerationJobQueue:
+    """
+    Runs moderation requests in the background and keeps their state in
+    the `moderation_jobs` collection.
+
+    Uploads wait in a bounded in-memory queue served by `workers` tasks;
+    when it holds `max_queue_size` jobs, or the queued and running jobs
+    hold `max_queue_bytes` of uploads, new jobs are refused with a 503
+    instead of piling up.
+    Jobs hold a lease that the owning worker renews on every sweep. A job
+    whose lease runs out (its worker died) is marked failed by whichever
+    worker sweeps next, so clients never poll forever.
+
+    Webhooks are delivered at least once: the delivery state lives in the
+    job document, failed attempts are retried with exponential backoff and
+    jitter, and any worker's delivery loop picks up deliveries that are
+    due, including ones left behind by a restart. Retries run in their own
+    task, at most `webhook_concurrency` at a time, so slow receivers never
+    hold up lease renewal.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        max_queue_bytes: int,
+        workers: int,
+        lease_seconds: float,
+        sweep_interval: float,
+        result_ttl: int,
+        webhook_timeout: float,
+        webhook_max_attempts: int,
+        webhook_backoff_base: float,
+        webhook_backoff_max: float,
+        webhook_concurrency: int,
+    ):
+        self.max_queue_size = max_queue_size
+        self.max_queue_bytes = max_queue_bytes
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.sweep_interval = sweep_interval
+        self.result_ttl = result_ttl
+        self.webhook_timeout = webhook_timeout
+        self.webhook_max_attempts = webhook_max_attempts
+        self.webhook_backoff_base = webhook_backoff_base
+        self.webhook_backoff_max = webhook_backoff_max
+        self.webhook_concurrency = webhook_concurrency
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self._owned: Set[str] = set()
+        # Upload bytes of jobs from submission until their worker is done
+        self._queued_bytes = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.webhooks_delivered = 0
+        self.webhook_failures = 0
+
+    async def submit(
+        self, token: str, items: List[Tuple[str, Optional[bytes]]], callback_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Record a new job and queue its items. Raises a 503 when the queue is full."""
+        size = sum(len(content) for _, content in items if content is not None)
+        if self._queue.full() or self._queued_bytes + size > self.max_queue_bytes:
+            self.rejected += 1
+            raise CustomException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Job queue is full, retry later",
+                error_type="QUEUE_FULL"
+            )
+
+        # Reserved before the insert, so concurrent submissions cannot overshoot
+        self._queued_bytes += size
+        try:
+            job_doc = await self._enqueue(token, items, callback_url, size)
+        except BaseException:
+            self._queued_bytes -= size
+            raise
+        self._owned.add(job_doc["_id"])
+        self.submitted += 1
+        return job_doc
+
+    async def _enqueue(
+        self, token: str, items: List[Tuple[str, Optional[bytes]]], callback_url: Optional[str], size: int
+    ) -> Dict[str, Any]:
+        """Insert the job document and put the job on the in-memory queue."""
+        now = datetime.utcnow()
+        job_doc = {
+            "_id": uuid.uuid4().hex,
+            # Hashed like every other token reference outside the tokens collection
+            "token": hash_token(token),
+            "status": QUEUED,
+            "itemCount": len(items),
+            "createdAt": now,
+            "updatedAt": now,
+            "leaseUntil": now + timedelta(seconds=self.lease_seconds),
+            "expiresAt": now + timedelta(seconds=self.result_ttl),
+            "callbackUrl": callback_url,
+        }
+        if callback_url:
+            job_doc["webhook"] = {"status": PENDING, "attempts": 0}
+        await get_moderation_jobs_collection().insert_one(job_doc)
+
+        try:
+            self._queue.put_nowait((job_doc["_id"], items, size))
+        except asyncio.QueueFull:
+            # Filled up while the job was being recorded
+            self.rejected += 1
+            await get_moderation_jobs_collection().delete_one({"_id": job_doc["_id"]})
+            raise CustomException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Job queue is full, retry later",
+                error_type="QUEUE_FULL"
+            )
+        return job_doc
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await get_moderation_jobs_collection().find_one({"_id": job_id})
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._client = httpx.AsyncClient(timeout=self.webhook_timeout)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep_loop()))
+        self._tasks.append(asyncio.create_task(self._delivery_loop()))
+        logger.info(f"Moderation job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """
+        Stop taking work. Queued jobs are left to expire their lease and be
+        failed by another worker; jobs being processed are cancelled.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _worker(self):
+        while True:
+            job_id, items, size = await self._queue.get()
+            try:
+                await self._process(job_id, items)
+            except Exception as e:
+                logger.error(f"Moderation job {job_id} crashed: {e}")
+            finally:
+                self._owned.discard(job_id)
+                self._queued_bytes -= size
+
+    async def _process(self, job_id: str, items: List[Tuple[str, Optional[bytes]]]):
+        collection = get_moderation_jobs_collection()
+        started = await collection.find_one_and_update(
+            {"_id": job_id, "status": QUEUED},
+            {"$set": {
+                "status": PROCESSING,
+                "updatedAt": datetime.utcnow(),
+                "leaseUntil": datetime.utcnow() + timedelta(seconds=self.lease_seconds),
+            }},
+            projection={"callbackUrl": 1}
+        )
+        if started is None:
+            # Failed by a sweep or expired while waiting in the queue
+            return
+
+        update: Dict[str, Any] = {"updatedAt": datetime.utcnow()}
+        try:
+            result = await moderation_service.analyze_batch(items, concurrency=settings.BATCH_CONCURRENCY)
+            update.update(status=COMPLETED, result=result.model_dump())
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"Moderation job {job_id} failed: {e}")
+            update.update(status=FAILED, error="Failed to process job")
+            self.failed += 1
+
+        if started.get("callbackUrl"):
+            # Keeps the sweep off this delivery while the first attempt runs
+            update["webhook.nextAttemptAt"] = datetime.utcnow() + timedelta(seconds=self.webhook_timeout * 2)
+        job_doc = await collection.find_one_and_update(
+            {"_id": job_id, "status": PROCESSING},
+            {"$set": update},
+            return_document=ReturnDocument.AFTER
+        )
+
+        # First delivery attempt right away; retries go through the delivery loop
+        if job_doc is not None and job_doc.get("callbackUrl"):
+            await self._deliver(job_doc)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Moderation job sweep failed: {e}")
+
+    async def sweep(self):
+        """Renew this worker's leases and fail orphaned jobs."""
+        collection = get_moderation_jobs_collection()
+        now = datetime.utcnow()
+
+        if self._owned:
+            await collection.update_many(
+                {"_id": {"$in": list(self._owned)}, "status": {"$in": [QUEUED, PROCESSING]}},
+                {"$set": {"leaseUntil": now + timedelta(seconds=self.lease_seconds)}}
+            )
+
+        orphaned = await collection.update_many(
+            {"status": {"$in": [QUEUED, PROCESSING]}, "leaseUntil": {"$lt": now}},
+            {"$set": {"status": FAILED, "error": "Job was interrupted, please resubmit", "updatedAt": now}}
+        )
+        if orphaned.modified_count:
+            logger.warning(f"Failed {orphaned.modified_count} orphaned moderation jobs")
+
+    async def _delivery_loop(self):
+        slots = asyncio.Semaphore(self.webhook_concurrency)
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.deliver_due(slots)
+            except Exception as e:
+                logger.error(f"Webhook delivery sweep failed: {e}")
+
+    async def deliver_due(self, slots: asyncio.Semaphore):
+        """Send due webhook retries, claiming one only when a slot is free."""
+        collection = get_moderation_jobs_collection()
+        deliveries: Set[asyncio.Task] = set()
+
+        async def deliver(job_doc: Dict[str, Any]):
+            try:
+                await self._deliver(job_doc)
+            except Exception as e:
+                logger.error(f"Webhook delivery for job {job_doc['_id']} failed: {e}")
+            finally:
+                slots.release()
+
+        try:
+            # Claim due deliveries one at a time so workers never send the same attempt twice
+            while True:
+                await slots.acquire()
+                now = datetime.utcnow()
+                try:
+                    job_doc = await collection.find_one_and_update(
+                        {
+                            "status": {"$in": [COMPLETED, FAILED]},
+                            "webhook.status": PENDING,
+                            # Orphaned jobs never had a first attempt scheduled
+                            "$or": [
+                                {"webhook.nextAttemptAt": {"$lte": now}},
+                                {"webhook.nextAttemptAt": {"$exists": False}},
+                            ],
+                        },
+                        {"$set": {"webhook.nextAttemptAt": now + timedelta(seconds=self.webhook_timeout * 2)}},
+                        return_document=ReturnDocument.AFTER
+                    )
+                except BaseException:
+                    slots.release()
+                    raise
+                if job_doc is None:
+                    slots.release()
+                    break
+                task = asyncio.create_task(deliver(job_doc))
+                deliveries.add(task)
+                task.add_done_callback(deliveries.discard)
+            await asyncio.gather(*deliveries)
+        except BaseException:
+            # Stopping: attempts cut short are retried once their claim runs out
+            for task in deliveries:
+                task.cancel()
+            raise
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.webhook_backoff_max, self.webhook_backoff_base * 2 ** (attempts - 1))
+        # Full jitter spreads retries of jobs that failed together
+        return random.uniform(delay / 2, delay)
+
+    async def _deliver(self, job_doc: Dict[str, Any]):
+        body = job_response(job_doc).model_dump_json(exclude={"callback_url"}).encode()
+        attempts = (job_doc.get("webhook") or {}).get("attempts", 0) + 1
+
+        error = None
+        addresses: List[str] = []
+        try:
+            # Checked again on every attempt, the host may have been repointed
+            # since submission; redirects are not followed
+            address, addresses = await resolve_callback_host(job_doc["callbackUrl"])
+            if address is not None:
+                error = f"Callback host resolves to non-public address {address}"
+                # Not worth retrying
+                attempts = max(attempts, self.webhook_max_attempts)
+        except (socket.gaierror, UnicodeError) as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if error is None:
+            url = httpx.URL(job_doc["callbackUrl"])
+            headers = {
+                "Content-Type": "application/json",
+                "X-Job-Id": job_doc["_id"],
+                "X-Signature": sign_payload(body),
+            }
+            extensions = {}
+            if addresses:
+                # Connect to the address that was just checked; letting httpx
+                # resolve the name again would let a DNS-rebinding host swap
+                # in an internal address. Host and TLS SNI/certificate checks
+                # still use the callback's host name.
+                headers["Host"] = url.netloc.decode("ascii")
+                extensions["sni_hostname"] = url.raw_host.decode("ascii")
+                url = url.copy_with(host=addresses[0])
+            try:
+                response = await self._client.post(url, content=body, headers=headers, extensions=extensions)
+                if not response.is_success:
+                    error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+
+        now = datetime.utcnow()
+        if error is None:
+            self.webhooks_delivered += 1
+            webhook_update = {"webhook.status": DELIVERED, "webhook.deliveredAt": now}
+        elif attempts >= self.webhook_max_attempts:
+            self.webhook_failures += 1
+            logger.warning(f"Giving up webhook for job {job_doc['_id']} after {attempts} attempts: {error}")
+            webhook_update = {"webhook.status": FAILED, "webhook.lastError": error}
+        else:
+            self.webhook_failures += 1
+            webhook_update = {
+                "webhook.lastError": error,
+                "webhook.nextAttemptAt": now + timedelta(seconds=self._backoff(attempts)),
+            }
+
+        webhook_update["webhook.attempts"] = attempts
+        await get_moderation_jobs_collection().update_one({"_id": job_doc["_id"]}, {"$set": webhook_update})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_size": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "queued_bytes": self._queued_bytes,
+            "max_queue_bytes": self.max_queue_bytes,
+            "workers": self.workers,
+            "in_flight": len(self._owned),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "webhooks_delivered": self.webhooks_delivered,
+            "webhook_failures": self.webhook_failures,
+        }
+
+
+# Global moderation job queue instance
+job_queue = ModerationJobQueue(
+    max_queue_size=settings.JOB_QUEUE_MAX_SIZE,
+    max_queue_bytes=settings.JOB_QUEUE_MAX_BYTES,
+    workers=settings.JOB_WORKERS,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    sweep_interval=settings.JOB_SWEEP_INTERVAL,
+    result_ttl=settings.JOB_RESULT_TTL,
+    webhook_timeout=settings.JOB_WEBHOOK_TIMEOUT,
+    webhook_max_attempts=settings.JOB_WEBHOOK_MAX_ATTEMPTS,
+    webhook_backoff_base=settings.JOB_WEBHOOK_BACKOFF_BASE,
+    webhook_backoff_max=settings.JOB_WEBHOOK_BACKOFF_MAX,
+    webhook_concurrency=settings.JOB_WEBHOOK_CONCURRENCY,
+)
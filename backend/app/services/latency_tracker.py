@@ -0,0 +1,161 @@
+# backend/app/services/latency_tracker.py
+
+import asyncio
+import logging
+import os
+import socket
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.core.database import get_latency_snapshots_collection
+from app.core.security import hash_token
+from app.utils.histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    In-process latency histograms per (route, status class) and per token.
+
+    The timing middleware records every request here, which costs one
+    dict update per histogram. Token histograms are kept for the
+    `max_tokens` most recently seen authenticated tokens, keyed by
+    `hash_token` so token values are never stored or reported. Every `snapshot_interval`
+    seconds this worker's histograms are written to `latency_snapshots`
+    under its worker id, so any worker can merge all of them into
+    cluster-wide percentiles.
+    """
+
+    def __init__(self, max_tokens: int, snapshot_interval: float, enabled: bool = True):
+        self.max_tokens = max_tokens
+        self.snapshot_interval = snapshot_interval
+        self.enabled = enabled
+        self.started_at = datetime.utcnow()
+        self._routes: Dict[Tuple[str, str], LatencyHistogram] = defaultdict(LatencyHistogram)
+        self._tokens: "OrderedDict[str, LatencyHistogram]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def worker_id(self) -> str:
+        # Looked up each time so workers forked after import get their own id
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def record(self, route: str, status_code: int, token_hash: Optional[str], seconds: float):
+        """`token_hash` is `hash_token` of an authenticated request's token, None otherwise."""
+        if not self.enabled:
+            return
+
+        self._routes[(route, f"{status_code // 100}xx")].record(seconds)
+
+        if token_hash:
+            histogram = self._tokens.get(token_hash)
+            if histogram is None:
+                histogram = self._tokens[token_hash] = LatencyHistogram()
+                if len(self._tokens) > self.max_tokens:
+                    self._tokens.popitem(last=False)
+            else:
+                self._tokens.move_to_end(token_hash)
+            histogram.record(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "_id": self.worker_id,
+            "startedAt": self.started_at,
+            "updatedAt": datetime.utcnow(),
+            "routes": [
+                {"route": route, "status": status_class, "histogram": histogram.to_document()}
+                for (route, status_class), histogram in self._routes.items()
+            ],
+            "tokens": [
+                {"tokenHash": token_hash, "histogram": histogram.to_document()}
+                for token_hash, histogram in self._tokens.items()
+            ],
+        }
+
+    async def save_snapshot(self):
+        await get_latency_snapshots_collection().replace_one(
+            {"_id": self.worker_id}, self.snapshot(), upsert=True
+        )
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self.started_at = datetime.utcnow()
+            self._task = asyncio.create_task(self._snapshot_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Failed to save final latency snapshot: {e}")
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Failed to save latency snapshot: {e}")
+
+    async def report(self, cluster: bool = True, token: Optional[str] = None, top_tokens: int = 20) -> Dict[str, Any]:
+        """
+        Percentile summaries per route and per token.
+
+        With `cluster` the live histograms of this worker are merged with the
+        latest snapshots of every other worker; otherwise only this worker's
+        are used. Tokens are limited to `token` when given, else to the
+        `top_tokens` busiest ones, and are reported by their hash.
+        """
+        wanted = None if token is None else hash_token(token)
+        routes: Dict[Tuple[str, str], LatencyHistogram] = defaultdict(LatencyHistogram)
+        tokens: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        workers = [self.worker_id]
+
+        for key, histogram in self._routes.items():
+            routes[key].merge(histogram)
+        for key, histogram in self._tokens.items():
+            if wanted is None or key == wanted:
+                tokens[key].merge(histogram)
+
+        if cluster:
+            cursor = get_latency_snapshots_collection(secondary_ok=True).find({"_id": {"$ne": self.worker_id}})
+            async for snapshot in cursor:
+                workers.append(snapshot["_id"])
+                for entry in snapshot.get("routes", []):
+                    routes[(entry["route"], entry["status"])].merge(
+                        LatencyHistogram.from_document(entry["histogram"])
+                    )
+                for entry in snapshot.get("tokens", []):
+                    # Entries without tokenHash predate hashing and are skipped
+                    key = entry.get("tokenHash")
+                    if key is not None and (wanted is None or key == wanted):
+                        tokens[key].merge(LatencyHistogram.from_document(entry["histogram"]))
+
+        busiest = sorted(tokens.items(), key=lambda item: item[1].count, reverse=True)
+        if token is None:
+            busiest = busiest[:top_tokens]
+
+        return {
+            "workers": workers,
+            "routes": [
+                {"route": route, "status": status_class, **histogram.summary()}
+                for (route, status_class), histogram in sorted(routes.items())
+            ],
+            "tokens": [
+                {"token_hash": key, **histogram.summary()}
+                for key, histogram in busiest
+            ],
+        }
+
+
+# Global latency tracker instance
+latency_tracker = LatencyTracker(
+    max_tokens=settings.LATENCY_MAX_TOKENS,
+    snapshot_interval=settings.LATENCY_SNAPSHOT_INTERVAL,
+    enabled=settings.LATENCY_TRACKING_ENABLED,
+)
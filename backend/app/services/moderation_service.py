@@ -1,6 +1,22 @@
-import random
-from typing import Dict
-from app.models.moderation import ModerationResult, CategoryScore
+import asyncio
+import logging
+import mimetypes
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.core.metrics import moderation_stage_seconds
+from app.models.moderation import ModerationResult, CategoryScore, BatchItemResult, BatchModerationResult
+from app.services.batch_scheduler import create_batch_scheduler
+from app.services.inference_executor import create_inference_executor
+from app.services.perceptual_hash import (
+    compute_hash, format_hash, parse_hash, near_duplicate_index, hash_blocklist
+)
+from app.services.result_cache import result_cache
+from app.utils.file_handler import validate_image_bytes, MAX_FILE_SIZE_MB
+
+logger = logging.getLogger(__name__)
 
 
 class ModerationService:
@@ -20,24 +36,133 @@ class ModerationService:
         self, file_content: bytes, filename: str, content_type: str
     ) -> ModerationResult:
         """
-        Simulates image moderation by generating random confidence scores per category.
+        Scores the image on the inference executor, off the event loop,
+        batched with other concurrent requests by the micro-batch scheduler.
+        Verdicts are cached by content hash, and near-duplicates of already
+        moderated images (by perceptual hash) reuse the stored verdict.
+        Images matching the hash blocklist are rejected without scoring.
         """
+        with moderation_stage_seconds.time("cache"):
+            digest = result_cache.digest(file_content)
+            cached = await result_cache.get(digest, len(file_content))
+        if cached is not None:
+            image_hash = parse_hash(cached["phash"]) if cached.get("phash") else None
+            return self._build_result(cached, filename, content_type, image_hash, cached=True)
+
+        image_hash = None
+        if settings.PHASH_ENABLED:
+            # Decoding is CPU-bound, keep it off the event loop
+            with moderation_stage_seconds.time("decode"):
+                image_hash = await asyncio.to_thread(compute_hash, file_content)
+            if image_hash is not None:
+                match = near_duplicate_index.query(image_hash)
+                # Only reuse verdicts of the model that is scoring now
+                if match is not None and match[1].get("model") == result_cache.model:
+                    return self._build_result(match[1], filename, content_type, image_hash, cached=True)
+
+        with moderation_stage_seconds.time("score"):
+            confidences = await batch_scheduler.score(file_content)
         scores: Dict[str, float] = {
-            category: round(random.uniform(0, 1), 2)
-            for category in self.CATEGORIES
+            category: round(confidence, 2)
+            for category, confidence in confidences.items()
         }
 
         # Determine if the image is considered safe
         is_safe = all(confidence < self.CONFIDENCE_THRESHOLD for confidence in scores.values())
 
-        return ModerationResult(
-            is_safe=is_safe,
-            scores=[
-                CategoryScore(
-                    category=category,
-                    confidence=confidence
-                ) for category, confidence in scores.items()
+        verdict = {
+            "is_safe": is_safe,
+            "scores": [
+                {"category": category, "confidence": confidence}
+                for category, confidence in scores.items()
             ],
+            "phash": format_hash(image_hash) if image_hash is not None else None,
+            "model": result_cache.model,
+        }
+
+        result_cache.set(digest, verdict)
+        if image_hash is not None:
+            near_duplicate_index.add(image_hash, verdict)
+
+        return self._build_result(verdict, filename, content_type, image_hash)
+
+    async def analyze_batch(
+        self, items: List[Tuple[str, Optional[bytes]]], concurrency: int
+    ) -> BatchModerationResult:
+        """
+        Analyze (filename, content) items concurrently, at most `concurrency`
+        at a time. Items with no content were too large to read. Items that
+        fail validation or analysis are reported with an error instead of
+        failing the whole batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def analyze_item(filename: str, content: Optional[bytes]) -> BatchItemResult:
+            if content is None:
+                return BatchItemResult(filename=filename, error=f"File exceeds maximum allowed size of {MAX_FILE_SIZE_MB}MB")
+            try:
+                validate_image_bytes(content, filename)
+            except HTTPException as e:
+                return BatchItemResult(filename=filename, error=e.detail)
+
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            try:
+                async with semaphore:
+                    result = await self.analyze_image(
+                        file_content=content,
+                        filename=filename,
+                        content_type=content_type
+                    )
+                return BatchItemResult(filename=filename, result=result)
+            except Exception as e:
+                logger.error(f"Error moderating batch item {filename}: {str(e)}")
+                return BatchItemResult(filename=filename, error="Failed to process image")
+
+        results = await asyncio.gather(*(analyze_item(name, content) for name, content in items))
+        succeeded = sum(1 for item in results if item.result is not None)
+
+        return BatchModerationResult(
+            total=len(results),
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            items=results
+        )
+
+    def _build_result(
+        self,
+        verdict: Dict[str, Any],
+        filename: str,
+        content_type: str,
+        image_hash: Optional[int],
+        cached: bool = False
+    ) -> ModerationResult:
+        """Turn a stored verdict into a response, applying the hash blocklist."""
+        blocked = hash_blocklist.match(image_hash) if image_hash is not None else None
+        if blocked is not None:
+            category, _ = blocked
+            return ModerationResult(
+                is_safe=False,
+                scores=[
+                    CategoryScore(
+                        category=name,
+                        confidence=1.0 if name == category else 0.0
+                    ) for name in self.CATEGORIES
+                ],
+                filename=filename,
+                content_type=content_type,
+                blocklisted=True
+            )
+
+        return ModerationResult(
+            is_safe=verdict["is_safe"],
+            scores=verdict["scores"],
             filename=filename,
-            content_type=content_type
+            content_type=content_type,
+            cached=cached
         )
+
+
+# Global instances; the model is loaded once per worker when the executor starts
+inference_executor = create_inference_executor(ModerationService.CATEGORIES)
+batch_scheduler = create_batch_scheduler(inference_executor)
+moderation_service = ModerationService()
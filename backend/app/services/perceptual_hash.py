@@ -0,0 +1,238 @@
+# backend/app/services/perceptual_hash.py
+
+import asyncio
+import io
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.config import settings
+from app.core.database import get_hash_blocklist_collection
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+_PHASH_SIZE = 32
+_PHASH_LOW_FREQ = 8
+_HASH_PATTERN = re.compile(rf"[0-9a-fA-F]{{{HASH_BITS // 4}}}")
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct2(x) = D @ x @ D.T"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8)).tobytes(), "big")
+
+
+def _load_grayscale(file_content: bytes, size: Tuple[int, int]) -> Image.Image:
+    image = Image.open(io.BytesIO(file_content))
+    # Let the JPEG decoder downscale in the DCT domain when it can
+    image.draft("L", (size[0] * 4, size[1] * 4))
+    return image.convert("L").resize(size, Image.BILINEAR)
+
+
+def dhash(file_content: bytes) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail."""
+    pixels = np.asarray(_load_grayscale(file_content, (9, 8)), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(file_content: bytes) -> int:
+    """64-bit perceptual hash: low-frequency DCT coefficients against their median."""
+    pixels = np.asarray(_load_grayscale(file_content, (_PHASH_SIZE, _PHASH_SIZE)), dtype=np.float32)
+    coefficients = (_DCT @ pixels @ _DCT.T)[:_PHASH_LOW_FREQ, :_PHASH_LOW_FREQ].flatten()
+    # Ignore the DC term when picking the median
+    return _bits_to_int(coefficients > np.median(coefficients[1:]))
+
+
+def compute_hash(file_content: bytes) -> Optional[int]:
+    """Hash an image with the configured algorithm; None if it cannot be decoded."""
+    try:
+        if settings.PHASH_ALGORITHM == "dhash":
+            return dhash(file_content)
+        return phash(file_content)
+    except Exception as e:
+        logger.debug(f"Could not compute perceptual hash: {e}")
+        return None
+
+
+def parse_hash(value: str) -> int:
+    """Parse a 16-digit hex hash string."""
+    # int(value, 16) alone would also take 0x/+/_ forms and surrounding whitespace
+    if not _HASH_PATTERN.fullmatch(value):
+        raise ValueError(f"Expected {HASH_BITS // 4} hex digits")
+    return int(value, 16)
+
+
+def format_hash(value: int) -> str:
+    return f"{value:0{HASH_BITS // 4}x}"
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes.
+
+    Each hash is split into `max_distance + 1` disjoint bit ranges with one
+    lookup table per range. Two hashes within `max_distance` bits of each
+    other must agree exactly on at least one range, so a query only compares
+    against the hashes sharing a bucket with it. Entries are kept in LRU
+    order and the oldest are evicted past `max_entries`.
+    """
+
+    def __init__(self, max_distance: int, max_entries: Optional[int] = None):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        chunks = max_distance + 1
+        bounds = [round(i * HASH_BITS / chunks) for i in range(chunks + 1)]
+        self._ranges = [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(chunks)]
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in self._ranges]
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, value: int):
+        for table, (shift, width) in zip(self._tables, self._ranges):
+            yield table, (value >> shift) & ((1 << width) - 1)
+
+    def add(self, value: int, payload: Any):
+        if value in self._entries:
+            self._entries[value] = payload
+            self._entries.move_to_end(value)
+            return
+
+        self._entries[value] = payload
+        for table, key in self._keys(value):
+            table.setdefault(key, set()).add(value)
+
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._unlink(oldest)
+
+    def remove(self, value: int):
+        if self._entries.pop(value, None) is not None:
+            self._unlink(value)
+
+    def _unlink(self, value: int):
+        for table, key in self._keys(value):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del table[key]
+
+    def clear(self):
+        self._entries.clear()
+        for table in self._tables:
+            table.clear()
+
+    def query(self, value: int) -> Optional[Tuple[int, Any, int]]:
+        """Return (hash, payload, distance) of the closest entry within max_distance."""
+        payload = self._entries.get(value)
+        if payload is not None:
+            self._entries.move_to_end(value)
+            self.hits += 1
+            return value, payload, 0
+
+        best: Optional[Tuple[int, int]] = None
+        for table, key in self._keys(value):
+            for candidate in table.get(key, ()):
+                distance = (candidate ^ value).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (candidate, distance)
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best[0])
+        return best[0], self._entries[best[0]], best[1]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class HashBlocklist:
+    """
+    Known-bad perceptual hashes, loaded from the `hash_blocklist` collection.
+    Lookups run against an in-memory HammingIndex; a background task reloads
+    the collection periodically so every worker sees admin changes.
+    """
+
+    def __init__(self, max_distance: int, refresh_interval: float):
+        self.index = HammingIndex(max_distance=max_distance)
+        self.refresh_interval = refresh_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def match(self, value: int) -> Optional[Tuple[str, int]]:
+        """Return (category, distance) if the hash is near a blocklisted one."""
+        match = self.index.query(value)
+        if match is None:
+            return None
+        _, category, distance = match
+        return category, distance
+
+    async def load(self):
+        """Replace the in-memory blocklist with the contents of the collection."""
+        index = HammingIndex(max_distance=self.index.max_distance)
+        async for doc in get_hash_blocklist_collection().find({}, {"hash": 1, "category": 1}):
+            try:
+                index.add(parse_hash(doc["hash"]), doc["category"])
+            except (KeyError, ValueError):
+                logger.warning(f"Skipping malformed blocklist entry {doc.get('_id')}")
+        self.index = index
+        logger.info(f"Loaded {len(index)} blocklisted image hashes")
+
+    async def start(self):
+        await self.load()
+        if self.refresh_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Failed to refresh hash blocklist: {e}")
+
+
+# Global near-duplicate index and blocklist instances
+near_duplicate_index = HammingIndex(
+    max_distance=settings.PHASH_MAX_DISTANCE,
+    max_entries=settings.PHASH_INDEX_MAX_ENTRIES,
+)
+hash_blocklist = HashBlocklist(
+    max_distance=settings.BLOCKLIST_MAX_DISTANCE,
+    refresh_interval=settings.BLOCKLIST_REFRESH_INTERVAL,
+)
@@ -0,0 +1,117 @@
+# backend/app/services/preprocessing.py
+
+import io
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def _frame_indices(frame_count: int, max_frames: int) -> List[int]:
+    """Evenly spaced frames of an animation, always including the first."""
+    if frame_count <= max_frames:
+        return list(range(frame_count))
+    step = frame_count / max_frames
+    return [int(i * step) for i in range(max_frames)]
+
+
+def _downscale(image: Image.Image, size: int) -> Image.Image:
+    """
+    Shrink a decoded frame to size x size RGB. Large images are first
+    reduced by an integer factor (box filter over whole pixel blocks),
+    which is far cheaper than resampling from full resolution.
+    """
+    if image.mode not in ("RGB", "RGBA", "L"):
+        # reduce() does not handle palette images
+        image = image.convert("RGB")
+    factor = min(image.width // size, image.height // size)
+    if factor >= 2:
+        image = image.reduce(factor)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.resize((size, size), Image.BILINEAR)
+
+
+def decode_frames(image_data: memoryview, size: int, max_frames: int = 1) -> List[Image.Image]:
+    """
+    Decode an encoded image into at most `max_frames` size x size RGB frames.
+
+    JPEGs are decoded with draft(), so libjpeg scales them down by up to 8x
+    in the DCT domain instead of producing full-resolution pixels. Animated
+    GIF/WebP only have the sampled frames decoded.
+    """
+    image = Image.open(io.BytesIO(image_data))
+
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+
+    frame_count = getattr(image, "n_frames", 1)
+    frames = []
+    for index in _frame_indices(frame_count, max_frames):
+        if frame_count > 1:
+            image.seek(index)
+        frames.append(_downscale(image, size))
+    return frames
+
+
+def preprocess_batch(
+    images: Sequence[memoryview],
+    size: int,
+    max_frames: int = 1,
+    mean: Optional[np.ndarray] = None,
+    std: Optional[np.ndarray] = None,
+    channels_first: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode a batch of images into one contiguous float32 array.
+
+    Returns (pixels, offsets, failed): pixels has one row per decoded frame,
+    laid out NHWC (or NCHW with channels_first) with values scaled to [0, 1]
+    and then standardised with mean/std when given. Frames of image i occupy
+    rows offsets[i] to offsets[i + 1]. Images that fail to decode (uploads
+    are only checked by magic bytes) are flagged in the boolean `failed`
+    mask and get no rows, so they do not fail the rest of the batch.
+    """
+    decoded = []
+    failed = np.zeros(len(images), dtype=bool)
+    for index, image_data in enumerate(images):
+        try:
+            decoded.append(decode_frames(image_data, size, max_frames))
+        except Exception:
+            # Truncated or corrupt data: PIL raises OSError, ValueError or
+            # DecompressionBombError depending on where decoding stops
+            decoded.append([])
+            failed[index] = True
+
+    offsets = np.zeros(len(decoded) + 1, dtype=np.int64)
+    np.cumsum([len(frames) for frames in decoded], out=offsets[1:])
+
+    pixels = np.empty((offsets[-1], size, size, 3), dtype=np.float32)
+    row = 0
+    for frames in decoded:
+        for frame in frames:
+            pixels[row] = np.asarray(frame, dtype=np.uint8)
+            row += 1
+
+    pixels *= 1.0 / 255.0
+    if mean is not None:
+        pixels -= mean
+    if std is not None:
+        pixels /= std
+    if channels_first:
+        pixels = np.ascontiguousarray(pixels.transpose(0, 3, 1, 2))
+
+    return pixels, offsets, failed
+
+
+def reduce_frames(confidences: np.ndarray, offsets: np.ndarray, failed: np.ndarray) -> np.ndarray:
+    """
+    Collapse per-frame confidences to per-image ones, keeping the worst
+    frame. Rows of failed images are NaN.
+    """
+    reduced = np.full((len(failed), confidences.shape[1]), np.nan, dtype=np.float32)
+    if not failed.all():
+        # Failed images have no rows, so each decoded image's frames run up
+        # to the start of the next decoded one
+        reduced[~failed] = np.maximum.reduceat(confidences, offsets[:-1][~failed], axis=0)
+    return reduced
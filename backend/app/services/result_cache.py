@@ -0,0 +1,132 @@
+# backend/app/services/result_cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.config import settings
+from app.core.database import get_moderation_results_collection
+from app.services.backends import model_identifier
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead of the key, tuple and dict objects
+_ENTRY_OVERHEAD = 256
+
+
+class ResultCache:
+    """
+    Two-tier cache of moderation verdicts keyed by the model identifier and
+    the SHA-256 digest of the image bytes: an in-process LRU bounded by a
+    memory budget, backed by the `moderation_results` collection whose TTL
+    index expires old verdicts. Switching backend or weights changes the
+    key, so verdicts of the previous model are not served.
+    """
+
+    def __init__(self, memory_budget: int, model: str, enabled: bool = True):
+        self.memory_budget = memory_budget
+        self.model = model
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._memory_used = 0
+        self._pending_writes: Set[asyncio.Task] = set()
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def digest(self, file_content: bytes) -> str:
+        return f"{self.model}:{hashlib.sha256(file_content).hexdigest()}"
+
+    async def get(self, digest: str, content_size: int) -> Optional[Dict[str, Any]]:
+        """Return the cached verdict for a digest, checking memory then MongoDB."""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(digest)
+        if entry is not None:
+            self._entries.move_to_end(digest)
+            self.memory_hits += 1
+            self.bytes_saved += content_size
+            return entry[1]
+
+        try:
+            doc = await get_moderation_results_collection().find_one(
+                {"_id": digest}, {"_id": 0, "is_safe": 1, "scores": 1, "phash": 1}
+            )
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {e}")
+            doc = None
+
+        if doc is None:
+            self.misses += 1
+            return None
+
+        self.db_hits += 1
+        self.bytes_saved += content_size
+        self._remember(digest, doc)
+        return doc
+
+    def set(self, digest: str, verdict: Dict[str, Any]):
+        """Cache a verdict in memory and persist it to MongoDB in the background."""
+        if not self.enabled:
+            return
+
+        self._remember(digest, verdict)
+
+        task = asyncio.create_task(self._persist(digest, verdict))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    def _remember(self, digest: str, verdict: Dict[str, Any]):
+        size = len(json.dumps(verdict)) + len(digest) + _ENTRY_OVERHEAD
+
+        previous = self._entries.pop(digest, None)
+        if previous is not None:
+            self._memory_used -= previous[0]
+
+        self._entries[digest] = (size, verdict)
+        self._memory_used += size
+
+        while self._memory_used > self.memory_budget and self._entries:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self._memory_used -= evicted_size
+
+    async def _persist(self, digest: str, verdict: Dict[str, Any]):
+        try:
+            await get_moderation_results_collection().update_one(
+                {"_id": digest},
+                {"$set": {**verdict, "model": self.model, "createdAt": datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Failed to persist moderation result: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "model": self.model,
+            "entries": len(self._entries),
+            "memory_used": self._memory_used,
+            "memory_budget": self.memory_budget,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+# Global result cache instance
+result_cache = ResultCache(
+    memory_budget=settings.RESULT_CACHE_MEMORY_BYTES,
+    model=model_identifier(settings.MODERATION_BACKEND, settings.MODEL_PATH),
+    enabled=settings.RESULT_CACHE_ENABLED,
+)
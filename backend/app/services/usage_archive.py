@@ -0,0 +1,368 @@
+# backend/app/services/usage_archive.py
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.config import settings
+from app.core.database import get_locks_collection, get_usages_archive_collection
+
+logger = logging.getLogger(__name__)
+
+LOCK_ID = "usage_archiver"
+FILE_NAME = "usages.arrow"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError("The usage archive requires the pyarrow package")
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.string()),
+        ("token", pa.string()),
+        ("endpoint", pa.string()),
+        ("route", pa.string()),
+        ("method", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("ip_address", pa.string()),
+        ("user_agent", pa.string()),
+        ("request_size", pa.int64()),
+        ("response_status", pa.int32()),
+        ("response_time", pa.float64()),
+        # Free-form, kept as JSON text
+        ("metadata", pa.string()),
+    ])
+
+
+def _record_batch(pa, schema, usage_docs: List[Dict[str, Any]]):
+    columns = {name: [] for name in schema.names}
+    for usage_doc in usage_docs:
+        columns["id"].append(str(usage_doc["_id"]))
+        columns["metadata"].append(
+            json.dumps(usage_doc["metadata"], default=str) if usage_doc.get("metadata") else None
+        )
+        for name in schema.names[1:-1]:
+            columns[name].append(usage_doc.get(name))
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def _usage_id(value: str):
+    """The usages _id an archived `id` column value was written from."""
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+
+def _day_query(day: date) -> Dict[str, Any]:
+    start = datetime.combine(day, time.min)
+    return {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}
+
+
+def _copy_batches(pa, path: str, writer):
+    """Write the record batches of an existing archive file to `writer`."""
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            writer.write_batch(reader.get_batch(index))
+
+
+class _ArchiveStats:
+    __slots__ = ("requests", "response_time", "timed", "endpoints", "daily")
+
+    def __init__(self):
+        self.requests = 0
+        self.response_time = 0.0
+        self.timed = 0
+        self.endpoints: Dict[str, int] = defaultdict(int)
+        self.daily: Dict[str, int] = defaultdict(int)
+
+
+class UsageArchiver:
+    """
+    Moves usage records older than `archive_after_days` out of the usages
+    collection into one compressed Arrow IPC file per UTC day, laid out as
+    `<directory>/date=YYYY-MM-DD/usages.arrow`.
+
+    Days are archived oldest first, so every day up to the newest file is
+    in the archive and only later days are read from MongoDB. A day's file
+    is written in record batches to a temporary name and renamed once
+    complete, then the records in the file are deleted by _id; a run
+    interrupted in between finds the file and only repeats the delete.
+    Records that reach a day after its file was written, such as late
+    writer flushes or migrated legacy records, are still in usages after
+    that delete and are added to the day's file on the next run. One
+    worker at a time archives, holding a lease in the `locks` collection.
+
+    Reads memory-map the files, so a scan only pages in the record batches
+    it touches. With `compression` set to None the batches are not
+    decompressed at all and are read in place.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        archive_after_days: int,
+        interval: float,
+        batch_size: int,
+        compression: Optional[str],
+        enabled: bool = False,
+    ):
+        self.directory = directory
+        self.archive_after_days = archive_after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.compression = compression
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._owner = uuid.uuid4().hex
+
+        self.runs = 0
+        self.archived = 0
+        self.deleted = 0
+        self.last_run: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def path(self, day: date) -> str:
+        return os.path.join(self.directory, f"date={day.isoformat()}", FILE_NAME)
+
+    def archived_days(self) -> List[date]:
+        try:
+            entries = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        days = []
+        for entry in entries:
+            if not entry.startswith("date="):
+                continue
+            try:
+                day = date.fromisoformat(entry[len("date="):])
+            except ValueError:
+                continue
+            if os.path.exists(self.path(day)):
+                days.append(day)
+        return sorted(days)
+
+    def hot_since(self) -> Optional[datetime]:
+        """Start of the first day still served from MongoDB, None when nothing is archived."""
+        days = self.archived_days() if self.enabled else []
+        if not days:
+            return None
+        return datetime.combine(days[-1] + timedelta(days=1), time.min)
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        _pyarrow()
+        retention = settings.USAGE_RETENTION_SECONDS
+        if retention and retention <= self.archive_after_days * 24 * 3600:
+            logger.warning(
+                f"USAGE_RETENTION_SECONDS expires usage records before they are {self.archive_after_days} days old, "
+                "nothing will reach the archive"
+            )
+        self._task = asyncio.create_task(self._archive_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _archive_loop(self):
+        while True:
+            try:
+                await self.run()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Usage archiving failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _acquire(self) -> bool:
+        """Take or renew the archiver lease. Returns False if another worker holds it."""
+        now = datetime.utcnow()
+        try:
+            await get_locks_collection().update_one(
+                {"_id": LOCK_ID, "$or": [{"leaseUntil": {"$lt": now}}, {"owner": self._owner}]},
+                {"$set": {"owner": self._owner, "leaseUntil": now + timedelta(seconds=self.interval * 2)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def run(self) -> int:
+        """Archive every whole day before the cutoff. Returns the number of records archived."""
+        if not await self._acquire():
+            return 0
+
+        self.runs += 1
+        self.last_run = datetime.utcnow()
+        cutoff = datetime.combine(
+            datetime.utcnow().date() - timedelta(days=self.archive_after_days), time.min
+        )
+        oldest = await get_usages_archive_collection().find_one(
+            {"timestamp": {"$lt": cutoff}}, projection={"timestamp": 1}, sort=[("timestamp", 1)]
+        )
+        if oldest is None:
+            return 0
+
+        archived = 0
+        day = oldest["timestamp"].date()
+        collection = get_usages_archive_collection()
+        while day < cutoff.date():
+            if await collection.find_one(_day_query(day), projection={"_id": 1}) is not None:
+                # Records already in the day's file go first, whatever is left
+                # was never archived
+                if not os.path.exists(self.path(day)) or await self._delete_archived(day):
+                    written = await self._archive_day(day)
+                    if written:
+                        archived += written
+                        await self._delete_archived(day)
+            day += timedelta(days=1)
+            if not await self._acquire():
+                logger.warning(f"Lost the usage archiver lease, stopping before {day}")
+                break
+
+        self.archived += archived
+        if archived:
+            logger.info(f"Archived {archived} usage records through {day - timedelta(days=1)}")
+        return archived
+
+    async def _archive_day(self, day: date) -> int:
+        """
+        Write the day's records in usages to its file, after the batches
+        already in the file. Returns the number of records added.
+        """
+        pa = _pyarrow()
+        schema = _schema(pa)
+        collection = get_usages_archive_collection()
+        path = self.path(day)
+        if os.path.exists(path) and await collection.find_one(_day_query(day), projection={"_id": 1}) is None:
+            return 0
+        cursor = collection.find(_day_query(day)).batch_size(self.batch_size)
+
+        temp_path = f"{path}.{self._owner}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        writer = await asyncio.to_thread(pa.ipc.new_file, temp_path, schema, options=options)
+
+        written = 0
+        batch: List[Dict[str, Any]] = []
+        try:
+            if os.path.exists(path):
+                await asyncio.to_thread(_copy_batches, pa, path, writer)
+            async for usage_doc in cursor:
+                batch.append(usage_doc)
+                if len(batch) >= self.batch_size:
+                    await asyncio.to_thread(writer.write_batch, _record_batch(pa, schema, batch))
+                    written += len(batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(writer.write_batch, _record_batch(pa, schema, batch))
+                written += len(batch)
+            await asyncio.to_thread(writer.close)
+        except BaseException:
+            writer.close()
+            os.remove(temp_path)
+            raise
+
+        if not written:
+            os.remove(temp_path)
+            return 0
+        os.replace(temp_path, path)
+        return written
+
+    async def _delete_archived(self, day: date) -> bool:
+        """
+        Delete the records in the day's file from usages, one record batch
+        at a time. Returns False when the collection refuses the delete.
+        """
+        pa = _pyarrow()
+        collection = get_usages_archive_collection()
+        with pa.memory_map(self.path(day), "r") as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                batch = await asyncio.to_thread(reader.get_batch, index)
+                ids = [_usage_id(value) for value in batch.column("id").to_pylist()]
+                try:
+                    result = await collection.delete_many({"_id": {"$in": ids}})
+                except OperationFailure as e:
+                    # Time-series collections only take arbitrary deletes from MongoDB 7.0;
+                    # reads skip archived days, and USAGE_RETENTION_SECONDS, if set, removes the records later
+                    logger.warning(f"Could not delete archived usage records for {day}, leaving them to expire: {e}")
+                    return False
+                self.deleted += result.deleted_count
+        return True
+
+    def _scan(self, days: List[date], token: str) -> _ArchiveStats:
+        pa = _pyarrow()
+        stats = _ArchiveStats()
+        for day in days:
+            path = self.path(day)
+            if not os.path.exists(path):
+                continue
+            with pa.memory_map(path, "r") as source:
+                reader = pa.ipc.open_file(source)
+                for index in range(reader.num_record_batches):
+                    batch = reader.get_batch(index)
+                    batch = batch.filter(pa.compute.equal(batch.column("token"), token))
+                    if not batch.num_rows:
+                        continue
+
+                    stats.requests += batch.num_rows
+                    stats.daily[day.isoformat()] += batch.num_rows
+                    response_time = batch.column("response_time")
+                    stats.response_time += pa.compute.sum(response_time).as_py() or 0.0
+                    stats.timed += pa.compute.count(response_time).as_py()
+                    endpoints = pa.compute.coalesce(batch.column("route"), batch.column("endpoint"))
+                    for entry in pa.compute.value_counts(endpoints).to_pylist():
+                        stats.endpoints[entry["values"]] += entry["counts"]
+        return stats
+
+    async def token_stats(self, token: str, since: datetime, until: datetime) -> _ArchiveStats:
+        """Usage of one token in the archived days between `since` and `until`."""
+        days = [day for day in self.archived_days() if since.date() <= day < until.date()]
+        if not days:
+            return _ArchiveStats()
+        return await asyncio.to_thread(self._scan, days, token)
+
+    def stats(self) -> Dict[str, Any]:
+        days = self.archived_days()
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            "archive_after_days": self.archive_after_days,
+            "compression": self.compression,
+            "archived_days": len(days),
+            "oldest_day": days[0].isoformat() if days else None,
+            "newest_day": days[-1].isoformat() if days else None,
+            "runs": self.runs,
+            "archived": self.archived,
+            "deleted": self.deleted,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+# Global usage archiver instance
+usage_archiver = UsageArchiver(
+    directory=settings.USAGE_ARCHIVE_DIR,
+    archive_after_days=settings.USAGE_ARCHIVE_AFTER_DAYS,
+    interval=settings.USAGE_ARCHIVE_INTERVAL,
+    batch_size=settings.USAGE_ARCHIVE_BATCH_SIZE,
+    compression=settings.USAGE_ARCHIVE_COMPRESSION,
+    enabled=settings.USAGE_ARCHIVE_ENABLED,
+)
@@ -0,0 +1,190 @@
+# backend/app/services/usage_rollups.py
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, unquote
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.core.database import get_usage_rollups_collection, get_usages_collection
+from app.models.usage import UsageStats
+from app.services.usage_archive import usage_archiver
+from app.utils.hyperloglog import HyperLogLog, register_update
+
+HOUR = "hour"
+DAY = "day"
+
+
+def encode_key(key: str) -> str:
+    """Make an endpoint usable as a MongoDB field name ('.' and '$' are reserved)."""
+    # quote() leaves '.' alone as an unreserved character
+    return quote(key, safe="/{}-_~").replace(".", "%2E")
+
+
+def decode_key(key: str) -> str:
+    return unquote(key)
+
+
+def _period_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class _Rollup:
+    __slots__ = ("requests", "response_time", "timed", "endpoints", "registers")
+
+    def __init__(self):
+        self.requests = 0
+        self.response_time = 0.0
+        self.timed = 0
+        self.endpoints: Dict[str, int] = defaultdict(int)
+        self.registers: Dict[int, int] = {}
+
+
+def build_rollup_updates(batch: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """
+    Fold a batch of usage records into one upsert per hourly and daily bucket.
+
+    Counters are applied with `$inc` and unique-token HyperLogLog registers
+    with `$max`, so any number of workers can update the same bucket without
+    reading it first.
+    """
+    rollups: Dict[tuple, _Rollup] = defaultdict(_Rollup)
+
+    for usage_doc in batch:
+        register, rank = register_update(usage_doc["token"], settings.USAGE_HLL_PRECISION)
+        endpoint = encode_key(usage_doc.get("route") or usage_doc["endpoint"])
+        response_time = usage_doc.get("response_time")
+
+        for granularity in (HOUR, DAY):
+            rollup = rollups[(granularity, _period_start(usage_doc["timestamp"], granularity))]
+            rollup.requests += 1
+            rollup.endpoints[endpoint] += 1
+            if response_time is not None:
+                rollup.response_time += response_time
+                rollup.timed += 1
+            if rank > rollup.registers.get(register, 0):
+                rollup.registers[register] = rank
+
+    updates = []
+    for (granularity, period), rollup in rollups.items():
+        on_insert = {"granularity": granularity, "period": period}
+        if granularity == HOUR:
+            on_insert["expiresAt"] = period + timedelta(seconds=settings.USAGE_HOURLY_ROLLUP_TTL)
+
+        increments = {
+            "requests": rollup.requests,
+            "responseTimeTotal": rollup.response_time,
+            "responseTimeCount": rollup.timed,
+        }
+        for endpoint, count in rollup.endpoints.items():
+            increments[f"endpoints.{endpoint}"] = count
+
+        updates.append(UpdateOne(
+            {"_id": f"{granularity}:{period.isoformat()}"},
+            {
+                "$setOnInsert": on_insert,
+                "$inc": increments,
+                "$max": {f"hll.{register}": rank for register, rank in rollup.registers.items()},
+            },
+            upsert=True
+        ))
+
+    return updates
+
+
+async def get_usage_stats(days: int = 30, hours: Optional[int] = None) -> UsageStats:
+    """
+    Usage statistics for the last `days` days, or the last `hours` hours when
+    given, read from the rollups. Cost depends on the number of buckets in
+    the range, not on the number of usage records.
+    """
+    now = datetime.utcnow()
+    if hours is not None:
+        granularity = HOUR
+        since = _period_start(now, HOUR) - timedelta(hours=hours - 1)
+    else:
+        granularity = DAY
+        since = _period_start(now, DAY) - timedelta(days=days - 1)
+
+    total_requests = 0
+    response_time = 0.0
+    timed = 0
+    endpoints_usage: Dict[str, int] = defaultdict(int)
+    daily_usage: Dict[str, int] = defaultdict(int)
+    unique_tokens = HyperLogLog(settings.USAGE_HLL_PRECISION)
+
+    cursor = get_usage_rollups_collection(secondary_ok=True).find(
+        {"granularity": granularity, "period": {"$gte": since}}
+    ).sort("period", 1)
+
+    async for rollup in cursor:
+        requests = rollup.get("requests", 0)
+        total_requests += requests
+        response_time += rollup.get("responseTimeTotal", 0.0)
+        timed += rollup.get("responseTimeCount", 0)
+        daily_usage[rollup["period"].date().isoformat()] += requests
+        for endpoint, count in rollup.get("endpoints", {}).items():
+            endpoints_usage[decode_key(endpoint)] += count
+        unique_tokens.merge_registers(rollup.get("hll", {}))
+
+    return UsageStats(
+        total_requests=total_requests,
+        unique_tokens=unique_tokens.count(),
+        endpoints_usage=dict(endpoints_usage),
+        daily_usage=dict(daily_usage),
+        average_response_time=response_time / timed if timed else None
+    )
+
+
+async def get_token_usage_stats(token: str, days: int = 30, hours: Optional[int] = None) -> UsageStats:
+    """
+    Usage statistics for one token. Rollups do not break down by token, so
+    days still in MongoDB are aggregated from the usage records and days
+    already archived are scanned from the archive files.
+    """
+    now = datetime.utcnow()
+    if hours is not None:
+        since = _period_start(now, HOUR) - timedelta(hours=hours - 1)
+    else:
+        since = _period_start(now, DAY) - timedelta(days=days - 1)
+
+    hot_since = max(since, usage_archiver.hot_since() or since)
+    cold = await usage_archiver.token_stats(token, since, hot_since) if hot_since > since else None
+
+    total_requests = cold.requests if cold else 0
+    response_time = cold.response_time if cold else 0.0
+    timed = cold.timed if cold else 0
+    endpoints_usage: Dict[str, int] = defaultdict(int, cold.endpoints if cold else {})
+    daily_usage: Dict[str, int] = defaultdict(int, cold.daily if cold else {})
+
+    pipeline = [
+        {"$match": {"token": token, "timestamp": {"$gte": hot_since}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                "endpoint": {"$ifNull": ["$route", "$endpoint"]},
+            },
+            "requests": {"$sum": 1},
+            "responseTimeTotal": {"$sum": "$response_time"},
+            "responseTimeCount": {"$sum": {"$cond": [{"$isNumber": "$response_time"}, 1, 0]}},
+        }},
+    ]
+    async for group in get_usages_collection(secondary_ok=True).aggregate(pipeline):
+        requests = group["requests"]
+        total_requests += requests
+        response_time += group["responseTimeTotal"]
+        timed += group["responseTimeCount"]
+        daily_usage[group["_id"]["day"]] += requests
+        endpoints_usage[group["_id"]["endpoint"]] += requests
+
+    return UsageStats(
+        total_requests=total_requests,
+        unique_tokens=1 if total_requests else 0,
+        endpoints_usage=dict(endpoints_usage),
+        daily_usage=dict(sorted(daily_usage.items())),
+        average_response_time=response_time / timed if timed else None
+    )
@@ -2,7 +2,9 @@
 
 from app.core.database import get_usages_collection
 from app.models.usage import UsageCreate
+from app.services.usage_writer import usage_writer
 from datetime import datetime
+from typing import Any, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,11 +14,42 @@ class UsageService:
     def collection(self):
         return get_usages_collection()
 
+    def record_usage(
+        self,
+        token: str,
+        endpoint: str,
+        method: str,
+        status_code: int,
+        process_time: float,
+        user_agent: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        route: Optional[str] = None
+    ) -> bool:
+        """
+        Queue a usage record for the background writer.
+        The token's lastUsed/usageCount are updated when the record is flushed.
+        `route` is the matched path template, used to group stats per endpoint.
+        """
+        usage_doc = {
+            "token": token,
+            "endpoint": endpoint,
+            "route": route,
+            "method": method,
+            "timestamp": datetime.utcnow(),
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "response_status": status_code,
+            "response_time": process_time * 1000,  # milliseconds
+            "metadata": metadata or {},
+        }
+        return usage_writer.enqueue(usage_doc)
+
     async def log_usage(self, usage: UsageCreate):
         """Log API usage into MongoDB"""
         try:
             usage_doc = usage.dict()
             usage_doc["timestamp"] = datetime.utcnow()
-            await self.collection.insert_one(usage_doc)
+            usage_writer.enqueue(usage_doc)
         except Exception as e:
             logger.warning(f"Failed to log usage: {e}")
@@ -0,0 +1,186 @@
+# backend/app/services/usage_writer.py
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.core.database import get_token_counters_collection, get_usages_collection, get_usage_rollups_collection
+from app.services.usage_rollups import build_rollup_updates
+
+logger = logging.getLogger(__name__)
+
+# Queue marker telling the flusher to drain and exit
+_STOP = object()
+
+
+class UsageWriter:
+    """
+    Buffers usage records in memory and writes them to MongoDB from a
+    background task, so usage tracking never waits on the database.
+
+    A batch is flushed when it reaches `batch_size` records or when
+    `flush_interval` seconds have passed since its first record. Each flush
+    does one `insert_many` for the records, one `bulk_write` carrying a
+    single lastUsed/usageCount update per token, and one `bulk_write` of
+    hourly/daily rollup upserts for the stats endpoint. When the queue is full new
+    records are dropped and counted rather than slowing down requests.
+    """
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def enqueue(self, usage_doc: Dict[str, Any]) -> bool:
+        """Queue a usage record without blocking. Returns False if it was dropped."""
+        try:
+            self._queue.put_nowait(usage_doc)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self.enqueued += 1
+        return True
+
+    async def start(self):
+        """Start the background flusher."""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Usage writer started")
+
+    async def stop(self, timeout: float = None):
+        """Flush everything still queued and stop the background flusher."""
+        if not self.running:
+            return
+
+        async def drain():
+            # A full queue behind a stuck flusher blocks the put, so it
+            # counts against the timeout too
+            await self._queue.put(_STOP)
+            await self._task
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Usage writer did not drain within {timeout}s, "
+                           f"{self._queue.qsize()} records lost")
+            self._task.cancel()
+        self._task = None
+        logger.info("Usage writer stopped")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Drain whatever was queued behind the stop marker
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        """Write one batch of usage records and the matching token updates."""
+        self.flushes += 1
+
+        try:
+            await get_usages_collection().insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} usage records: {e}")
+
+        counts: Dict[str, int] = defaultdict(int)
+        try:
+            # Roll per-request updates into one update per token
+            last_used: Dict[str, Any] = {}
+            for usage_doc in batch:
+                token = usage_doc["token"]
+                counts[token] += 1
+                timestamp = usage_doc["timestamp"]
+                if token not in last_used or timestamp > last_used[token]:
+                    last_used[token] = timestamp
+
+            await get_token_counters_collection().bulk_write(
+                [
+                    UpdateOne(
+                        {"token": token},
+                        {"$set": {"lastUsed": last_used[token]}, "$inc": {"usageCount": count}}
+                    )
+                    for token, count in counts.items()
+                ],
+                ordered=False
+            )
+        except Exception as e:
+            logger.error(f"Failed to update token usage for {len(counts)} tokens: {e}")
+
+        try:
+            await get_usage_rollups_collection().bulk_write(build_rollup_updates(batch), ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to update usage rollups for {len(batch)} records: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_size": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+
+# Global usage writer instance
+usage_writer = UsageWriter(
+    max_queue_size=settings.USAGE_QUEUE_MAX_SIZE,
+    batch_size=settings.USAGE_FLUSH_BATCH_SIZE,
+    flush_interval=settings.USAGE_FLUSH_INTERVAL,
+)
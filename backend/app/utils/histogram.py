@@ -0,0 +1,128 @@
+# backend/app/utils/histogram.py
+
+from typing import Dict, Iterable, Optional
+
+# 2^5 sub-buckets per power of two bound the relative error at about 3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+
+def bucket_index(value: int) -> int:
+    """
+    Log-linear bucket for a non-negative integer value, as in HDR histograms:
+    values below SUB_BUCKET_COUNT get exact buckets, larger ones share a
+    power-of-two range split into SUB_BUCKET_COUNT equal sub-buckets.
+    """
+    if value < SUB_BUCKET_COUNT:
+        return value
+    exponent = value.bit_length() - 1
+    shift = exponent - SUB_BUCKET_BITS
+    return (shift + 1) * SUB_BUCKET_COUNT + (value >> shift) - SUB_BUCKET_COUNT
+
+
+def bucket_value(index: int) -> float:
+    """Midpoint of the range covered by a bucket."""
+    if index < SUB_BUCKET_COUNT:
+        return float(index)
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    lower = (SUB_BUCKET_COUNT + (index & (SUB_BUCKET_COUNT - 1))) << shift
+    return lower + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """
+    Sparse log-linear histogram of durations in microseconds.
+
+    Recording is one dict increment; memory grows with the number of
+    distinct buckets hit (a few hundred at most), not with the number of
+    samples. Histograms merge by adding bucket counts, so per-worker
+    snapshots combine into exact cluster-wide percentiles within the
+    bucket resolution.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, Optional[float]]:
+        """Values in microseconds at each quantile, computed in one pass."""
+        qs = sorted(qs)
+        if not self.count:
+            return {q: None for q in qs}
+
+        results = {}
+        targets = iter(qs)
+        q = next(targets)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while q is not None and seen >= q * self.count:
+                # Clamp to the observed range, bucket midpoints can overshoot it
+                results[q] = min(max(bucket_value(index), self.min), self.max)
+                q = next(targets, None)
+            if q is None:
+                break
+        while q is not None:
+            results[q] = float(self.max)
+            q = next(targets, None)
+        return results
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Count plus mean, p50/p95/p99 and max in milliseconds."""
+        p50, p95, p99 = (
+            None if value is None else value / 1000
+            for value in self.quantiles((0.5, 0.95, 0.99)).values()
+        )
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count / 1000 if self.count else None,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": self.max / 1000 if self.max is not None else None,
+        }
+
+    def to_document(self) -> Dict:
+        return {
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_document(cls, doc: Dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in doc.get("counts", {}).items()}
+        histogram.count = doc.get("count", 0)
+        histogram.total = doc.get("total", 0)
+        histogram.min = doc.get("min")
+        histogram.max = doc.get("max")
+        return histogram
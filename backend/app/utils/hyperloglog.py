@@ -0,0 +1,69 @@
+# backend/app/utils/hyperloglog.py
+
+import hashlib
+import math
+from typing import Dict, Optional, Tuple
+
+# 2^10 registers give a standard error of about 3.3%
+DEFAULT_PRECISION = 10
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def register_update(value: str, precision: int = DEFAULT_PRECISION) -> Tuple[int, int]:
+    """
+    Return (register index, rank) for a value: the index comes from the top
+    `precision` bits of its hash, the rank is the position of the first set
+    bit in the rest. A sketch only ever keeps the max rank per register, so
+    updates can be applied with MongoDB `$max` from any number of writers.
+    """
+    hashed = _hash64(value)
+    index = hashed >> (64 - precision)
+    remainder = hashed & ((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - remainder.bit_length() + 1
+    return index, rank
+
+
+class HyperLogLog:
+    """
+    Cardinality sketch with a fixed memory footprint of 2^precision registers.
+    Sketches merge by taking the register-wise max.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[Dict[int, int]] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        if registers:
+            self.merge_registers(registers)
+
+    def add(self, value: str):
+        index, rank = register_update(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge_registers(self, registers: Dict[int, int]):
+        """Merge sparse registers, e.g. the `hll` sub-document of a rollup."""
+        for index, rank in registers.items():
+            index = int(index)
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
@@ -0,0 +1,283 @@
+"""
+Load test: the full app in-process against an in-memory MongoDB stand-in.
+
+Runs app.main.app through its real startup and shutdown (usage writer,
+latency tracker, inference executor, job queue, ...) with
+benchmarks.fake_mongo installed in place of the Motor client, then drives
+POST /moderate, GET /moderate/categories and GET /auth/tokens through httpx
+at a fixed concurrency. Each scenario reports requests/sec, latency
+percentiles and Python heap allocated per request, and the whole run is
+written as one JSON artifact tagged with the git commit, so runs on the
+same machine can be compared with --compare.
+
+Rate limiting and near-duplicate matching by perceptual hash are disabled
+(set PHASH_ENABLED=true to measure the latter), and the moderation result
+cache is off unless --result-cache is given, so every /moderate request is
+decoded and scored.
+
+Usage (from backend/):
+    python -m benchmarks.bench_api --requests 1000 --concurrency 16 \\
+        --image-sizes 128 512 1024 --image-weights 6 3 1 --output bench.json
+    python -m benchmarks.bench_api --compare bench.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+# Settings are read at import time
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# The few distinct images would all be near-duplicates after the warmup
+os.environ.setdefault("PHASH_ENABLED", "false")
+
+import httpx
+import numpy as np
+from PIL import Image
+
+import app.main
+from app.core.database import create_indexes
+from app.services.auth_service import AuthService
+from app.services.result_cache import result_cache
+from benchmarks import fake_mongo
+
+SCENARIOS = ("moderate", "categories", "tokens")
+
+
+def make_images(sizes: List[int], variants: int, seed: int) -> Dict[int, List[bytes]]:
+    """`variants` distinct noisy PNGs per edge length."""
+    rng = np.random.default_rng(seed)
+    images = {}
+    for size in sizes:
+        images[size] = []
+        for _ in range(variants):
+            pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+            buffer = io.BytesIO()
+            Image.fromarray(pixels).save(buffer, format="PNG")
+            images[size].append(buffer.getvalue())
+    return images
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def max_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def drive(
+    client: httpx.AsyncClient, send: Callable[[httpx.AsyncClient, int], Any], total: int, concurrency: int
+) -> List[float]:
+    """Send `total` requests with `concurrency` in flight, returning each latency in seconds."""
+    latencies: List[float] = []
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            start = time.perf_counter()
+            response = await send(client, index)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def measure_memory(
+    client: httpx.AsyncClient, send: Callable[[httpx.AsyncClient, int], Any], total: int, concurrency: int
+) -> Dict[str, float]:
+    """
+    Python heap allocated per request, traced in a separate pass because
+    tracemalloc slows allocation-heavy code several times over.
+    """
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    await drive(client, send, total, concurrency)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "peak_kib_per_inflight_request": round((peak - baseline) / concurrency / 1024, 1),
+        "retained_bytes_per_request": round((current - baseline) / total, 1),
+    }
+
+
+def summarise(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99)) * 1000
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def build_senders(args, user_token: str, admin_token: str) -> Dict[str, Callable]:
+    images = make_images(args.image_sizes, args.image_variants, args.seed)
+    rng = random.Random(args.seed)
+    # The image mix is drawn up front so every run sends the same sequence
+    mix = [
+        rng.choices(args.image_sizes, weights=args.image_weights)[0]
+        for _ in range(args.requests + args.warmup)
+    ]
+    user = {"Authorization": f"Bearer {user_token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+
+    async def moderate(client: httpx.AsyncClient, index: int):
+        size = mix[index % len(mix)]
+        image = images[size][index % args.image_variants]
+        return await client.post("/moderate", headers=user, files={"file": ("bench.png", image, "image/png")})
+
+    async def categories(client: httpx.AsyncClient, index: int):
+        return await client.get("/moderate/categories", headers=user)
+
+    async def tokens(client: httpx.AsyncClient, index: int):
+        return await client.get("/auth/tokens", headers=admin, params={"limit": args.page_size})
+
+    return {"moderate": moderate, "categories": categories, "tokens": tokens}
+
+
+async def run(args) -> Dict[str, Any]:
+    database = None
+
+    async def connect():
+        nonlocal database
+        database = fake_mongo.install(latency=args.db_latency_ms / 1000)
+        await create_indexes()
+
+    async def close():
+        pass
+
+    # Startup and shutdown look these up as module globals
+    app.main.connect_to_mongo = connect
+    app.main.close_mongo_connection = close
+    result_cache.enabled = args.result_cache
+
+    await app.main.app.router.startup()
+    try:
+        auth_service = AuthService()
+        admin_docs, _ = await auth_service.create_tokens(1, True, "benchmark admin")
+        user_docs, _ = await auth_service.create_tokens(args.seed_tokens, False, "benchmark user")
+        senders = build_senders(args, user_docs[0]["token"], admin_docs[0]["token"])
+
+        results = {}
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in args.scenarios:
+                send = senders[name]
+                # Warm up imports, route compilation, token cache and model
+                await drive(client, send, args.warmup, args.concurrency)
+
+                operations = sum(database.operation_counts().values())
+                start = time.perf_counter()
+                latencies = await drive(client, send, args.requests, args.concurrency)
+                elapsed = time.perf_counter() - start
+
+                results[name] = summarise(latencies, elapsed)
+                results[name]["db_operations_per_request"] = round(
+                    (sum(database.operation_counts().values()) - operations) / args.requests, 2
+                )
+                if args.memory_requests:
+                    results[name]["memory"] = await measure_memory(
+                        client, send, args.memory_requests, args.concurrency
+                    )
+    finally:
+        await app.main.app.router.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "image_sizes": args.image_sizes,
+            "image_weights": args.image_weights,
+            "image_variants": args.image_variants,
+            "result_cache": args.result_cache,
+            "db_latency_ms": args.db_latency_ms,
+            "seed_tokens": args.seed_tokens,
+            "page_size": args.page_size,
+            "seed": args.seed,
+        },
+        "max_rss_mib": round(max_rss_mib(), 1),
+        "scenarios": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Ratios of current to baseline; above 1 is better for RPS, worse for latency."""
+    if baseline.get("config") != current.get("config"):
+        print("warning: runs used different configurations", file=sys.stderr)
+    changes = {}
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes[name] = {
+            key: round(result[key] / before[key], 3)
+            for key in ("requests_per_second", "p50_ms", "p99_ms")
+            if before.get(key)
+        }
+    return {"baseline": baseline.get("commit"), "current": current["commit"], "ratios": changes}
+
+
+def main(args):
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print(json.dumps(compare(json.load(f), report), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="untimed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--image-sizes", type=int, nargs="+", default=[128, 512, 1024], help="PNG edge lengths")
+    parser.add_argument("--image-weights", type=float, nargs="+", default=None, help="relative frequency per size")
+    parser.add_argument("--image-variants", type=int, default=8, help="distinct images per size")
+    parser.add_argument("--result-cache", action="store_true", help="keep the moderation result cache on")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated round trip per database call")
+    parser.add_argument("--seed-tokens", type=int, default=1000, help="tokens in the fake tokens collection")
+    parser.add_argument("--page-size", type=int, default=50, help="limit for GET /auth/tokens")
+    parser.add_argument("--memory-requests", type=int, default=200, help="requests in the traced memory pass, 0 to skip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON artifact here")
+    parser.add_argument("--compare", help="baseline artifact to compare against")
+    args = parser.parse_args()
+
+    if args.image_weights is None:
+        args.image_weights = [1.0] * len(args.image_sizes)
+    elif len(args.image_weights) != len(args.image_sizes):
+        parser.error("--image-weights needs one weight per --image-sizes entry")
+    main(args)
@@ -0,0 +1,138 @@
+"""
+Micro-benchmark: BaseHTTPMiddleware stack vs. raw ASGI UsageTrackingMiddleware.
+
+Runs the /health and /moderate routes in-process through httpx and reports
+requests/sec for the previous middleware stack (BaseHTTPMiddleware usage
+tracking plus an @app.middleware("http") timing wrapper) and for the current
+single ASGI middleware. MongoDB is not needed: the benchmark token is seeded
+into the in-process token cache and the usage writer is left stopped, so
+usage records are only queued.
+
+Usage (from backend/):
+    python -m benchmarks.bench_middleware --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from PIL import Image
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.api import moderation
+from app.api.middleware import UsageTrackingMiddleware
+from app.core.token_cache import token_cache
+from app.main import health_check
+from app.services.usage_services import UsageService
+
+BENCH_TOKEN = "benchmark-token"
+
+
+class LegacyUsageTrackingMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation UsageTrackingMiddleware replaced."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.usage_service = UsageService()
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        auth_header = request.headers.get("authorization")
+        token = auth_header.split(" ")[1] if auth_header and auth_header.startswith("Bearer ") else None
+
+        response = await call_next(request)
+
+        process_time = time.time() - start_time
+        if token and response.status_code < 400:
+            self.usage_service.record_usage(
+                token=token,
+                endpoint=str(request.url.path),
+                method=request.method,
+                status_code=response.status_code,
+                process_time=process_time,
+                user_agent=request.headers.get("user-agent"),
+                ip_address=request.client.host if request.client else "unknown"
+            )
+        return response
+
+
+async def legacy_process_time_header(request: Request, call_next):
+    start_time = time.time()
+    response = await call_next(request)
+    response.headers["X-Process-Time"] = str(time.time() - start_time)
+    return response
+
+
+def build_app(legacy: bool) -> FastAPI:
+    bench_app = FastAPI()
+    bench_app.add_api_route("/health", health_check, methods=["GET"])
+    bench_app.include_router(moderation.router)
+
+    if legacy:
+        bench_app.add_middleware(LegacyUsageTrackingMiddleware)
+        bench_app.middleware("http")(legacy_process_time_header)
+    else:
+        bench_app.add_middleware(UsageTrackingMiddleware)
+
+    return bench_app
+
+
+def make_image(size: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (120, 30, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def run(bench_app: FastAPI, route: str, total: int, concurrency: int, image: bytes) -> float:
+    """Send `total` requests with `concurrency` in flight and return requests/sec."""
+    transport = httpx.ASGITransport(app=bench_app)
+    headers = {"Authorization": f"Bearer {BENCH_TOKEN}"}
+    remaining = total
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                if route == "/moderate":
+                    response = await client.post(
+                        route, headers=headers, files={"file": ("bench.png", image, "image/png")}
+                    )
+                else:
+                    response = await client.get(route, headers=headers)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    token_cache.set(BENCH_TOKEN, {"token": BENCH_TOKEN, "isAdmin": False})
+    image = make_image(args.image_size)
+    results = {}
+
+    for route in ("/health", "/moderate"):
+        results[route] = {}
+        for name, legacy in (("before", True), ("after", False)):
+            bench_app = build_app(legacy)
+            # Warm up imports, route compilation and caches
+            await run(bench_app, route, min(100, args.requests), args.concurrency, image)
+            results[route][name] = round(
+                await run(bench_app, route, args.requests, args.concurrency, image), 1
+            )
+        results[route]["speedup"] = round(results[route]["after"] / results[route]["before"], 3)
+
+    print(json.dumps({"requests_per_second": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route and stack")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--image-size", type=int, default=256, help="edge length of the test PNG")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Benchmark: image decode + resize cost per format and size.
+
+Compares a naive pipeline (full-resolution decode, convert to RGB, resize)
+with app.services.preprocessing.decode_frames, which uses JPEG draft()
+DCT-domain scaling, integer reduce() before resampling and samples only a
+few frames of animations. Reports milliseconds per image as JSON.
+
+Usage (from backend/):
+    python -m benchmarks.bench_preprocessing --sizes 512 1024 2048 4096 --repeat 10
+"""
+
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.services.preprocessing import decode_frames
+
+TARGET_SIZE = 64
+FORMATS = ("JPEG", "PNG", "WEBP", "GIF")
+ANIMATION_FRAMES = 10
+
+
+def make_image(fmt: str, size: int) -> bytes:
+    """Encode a noisy gradient test image; GIFs are animated."""
+    rng = np.random.default_rng(size)
+    gradient = np.linspace(0, 255, size, dtype=np.float32)
+    base = np.stack([
+        np.add.outer(gradient, gradient) / 2,
+        np.tile(gradient, (size, 1)),
+        np.tile(gradient[:, None], (1, size)),
+    ], axis=-1)
+
+    def frame(seed_offset: int) -> Image.Image:
+        noise = rng.normal(0, 12, base.shape) + seed_offset
+        return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+    buffer = io.BytesIO()
+    if fmt == "GIF":
+        frames = [frame(i * 5) for i in range(ANIMATION_FRAMES)]
+        frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=50)
+    else:
+        frame(0).save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+
+def naive_decode(image_data: bytes, size: int):
+    """Full decode of every frame, as a straightforward implementation would."""
+    image = Image.open(io.BytesIO(image_data))
+    frames = []
+    for index in range(getattr(image, "n_frames", 1)):
+        image.seek(index)
+        frames.append(image.convert("RGB").resize((size, size), Image.BILINEAR))
+    return frames
+
+
+def time_per_image(func, image_data: bytes, repeat: int) -> float:
+    func(image_data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(image_data)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(args):
+    results = []
+    for fmt in FORMATS:
+        for size in args.sizes:
+            if fmt == "WEBP" and size > 16383:
+                continue
+            image_data = make_image(fmt, size)
+            naive = time_per_image(lambda data: naive_decode(data, TARGET_SIZE), image_data, args.repeat)
+            optimised = time_per_image(
+                lambda data: decode_frames(memoryview(data), TARGET_SIZE, args.max_frames),
+                image_data,
+                args.repeat,
+            )
+            results.append({
+                "format": fmt,
+                "size": size,
+                "encoded_bytes": len(image_data),
+                "naive_ms": round(naive, 3),
+                "optimised_ms": round(optimised, 3),
+                "speedup": round(naive / optimised, 2),
+            })
+
+    print(json.dumps({"target_size": TARGET_SIZE, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048, 4096])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-frames", type=int, default=3, help="frames sampled from animations")
+    main(parser.parse_args())
@@ -0,0 +1,407 @@
+"""
+In-memory stand-in for the parts of the Motor API the app uses.
+
+Installing it points `db_instance.database` at a FakeDatabase, so every
+`get_*_collection()` getter in app.core.database returns an in-memory
+collection and the services run unchanged. It covers the query and update
+operators the app issues ($in, $ne, $gt/$gte/$lt/$lte, $exists, $regex,
+$type date, $or; $set, $unset, $inc, $max, $setOnInsert) without indexes or
+transactions, and every operation yields to the event loop once, plus an
+optional simulated round trip, like a real driver call would.
+"""
+
+import asyncio
+import copy
+import re
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import CollectionInvalid
+
+from app.core.database import db_instance
+
+_MISSING = object()
+
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc: Dict[str, Any], path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$type" and operand == "date":
+        return isinstance(value, datetime)
+    if op == "$regex":
+        return isinstance(value, str) and re.search(operand, value) is not None
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        # MongoDB never matches across BSON types
+        return False
+    raise NotImplementedError(f"Unsupported query operator {op}")
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        else:
+            value = _get(doc, key)
+            if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+                if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                    return False
+            elif (None if value is _MISSING else value) != condition:
+                return False
+    return True
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Copy of a document limited to a top-level projection, as if decoded from BSON."""
+    if not projection:
+        return copy.deepcopy(doc)
+    include_id = projection.get("_id", 1)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(fields.values()):
+        result = {key: copy.deepcopy(doc[key]) for key in fields if key in doc}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    doc = copy.deepcopy(doc)
+    for key in fields:
+        doc.pop(key, None)
+    if not include_id:
+        doc.pop("_id", None)
+    return doc
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            current = _get(doc, path)
+            if op == "$set":
+                _set(doc, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op == "$inc":
+                _set(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$max":
+                if current is _MISSING or value > current:
+                    _set(doc, path, value)
+            elif op == "$min":
+                if current is _MISSING or value < current:
+                    _set(doc, path, value)
+            else:
+                raise NotImplementedError(f"Unsupported update operator {op}")
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # Missing and null sort first, as in MongoDB
+    return (0, 0) if value is _MISSING or value is None else (1, value)
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query: Dict[str, Any], projection: Optional[Dict[str, Any]]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[Iterator[Dict[str, Any]]] = None
+
+    def sort(self, key, direction: int = 1) -> "FakeCursor":
+        self._sort = list(key) if isinstance(key, (list, tuple)) else [(key, direction)]
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "FakeCursor":
+        return self
+
+    def _execute(self) -> List[Dict[str, Any]]:
+        docs = [doc for doc in self._collection.docs if matches(doc, self._query)]
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda doc: _sort_key(_get(doc, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        await self._collection.round_trip()
+        docs = self._execute()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._results is None:
+            await self._collection.round_trip()
+            self._results = iter(self._execute())
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, name: str, latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.docs: List[Dict[str, Any]] = []
+        self.indexes: List[Any] = []
+        self.options: Dict[str, Any] = {}
+        self.operations = 0
+
+    async def round_trip(self):
+        self.operations += 1
+        await asyncio.sleep(self.latency)
+
+    def _first(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for doc in self.docs:
+            if matches(doc, query):
+                return doc
+        return None
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        doc = {
+            key: value for key, value in query.items()
+            if not key.startswith("$") and not (isinstance(value, dict) and any(op.startswith("$") for op in value))
+        }
+        doc.setdefault("_id", ObjectId())
+        apply_update(doc, update, inserting=True)
+        self.docs.append(doc)
+        return doc
+
+    async def create_index(self, keys, **kwargs) -> str:
+        self.indexes.append((keys, kwargs))
+        return str(keys)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs) -> FakeCursor:
+        return FakeCursor(self, query or {}, projection)
+
+    async def find_one(
+        self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, sort=None
+    ):
+        if sort:
+            docs = await FakeCursor(self, query or {}, projection).sort(sort).limit(1).to_list()
+            return docs[0] if docs else None
+        await self.round_trip()
+        doc = self._first(query or {})
+        return None if doc is None else project(doc, projection)
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        await self.round_trip()
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc["_id"], acknowledged=True)
+
+    async def insert_many(self, docs: Iterable[Dict[str, Any]], ordered: bool = True):
+        await self.round_trip()
+        ids = []
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            self.docs.append(copy.deepcopy(doc))
+            ids.append(doc["_id"])
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        await self.round_trip()
+        return self._update(query, update, upsert, many=False)
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        await self.round_trip()
+        return self._update(query, update, upsert, many=True)
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool, many: bool):
+        matched = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                apply_update(doc, update)
+                matched += 1
+                if not many:
+                    break
+        upserted_id = None
+        if not matched and upsert:
+            upserted_id = self._upsert(query, update)["_id"]
+        return SimpleNamespace(matched_count=matched, modified_count=matched, upserted_id=upserted_id)
+
+    async def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False):
+        await self.round_trip()
+        for index, doc in enumerate(self.docs):
+            if matches(doc, query):
+                replacement = copy.deepcopy(replacement)
+                replacement.setdefault("_id", doc["_id"])
+                self.docs[index] = replacement
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            replacement = copy.deepcopy(replacement)
+            replacement.setdefault("_id", query.get("_id", ObjectId()))
+            self.docs.append(replacement)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=replacement["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def find_one_and_update(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        **kwargs
+    ):
+        await self.round_trip()
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        before = project(doc, projection)
+        apply_update(doc, update)
+        return project(doc, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def delete_one(self, query: Dict[str, Any]):
+        await self.round_trip()
+        for index, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[index]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def delete_many(self, query: Dict[str, Any]):
+        await self.round_trip()
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        await self.round_trip()
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True):
+        await self.round_trip()
+        matched = upserted = 0
+        for request in requests:
+            # pymongo's UpdateOne keeps its arguments in private attributes
+            result = self._update(request._filter, request._doc, request._upsert, many=False)
+            matched += result.matched_count
+            upserted += result.upserted_id is not None
+        return SimpleNamespace(matched_count=matched, modified_count=matched, upserted_count=upserted)
+
+
+class FakeDatabase:
+    """Creates collections on first access, like a Motor database."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, self.latency)
+        return self._collections[name]
+
+    async def list_collections(self, filter: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        listing = FakeCollection("$cmd.listCollections")
+        listing.docs = [
+            {
+                "name": name,
+                "type": "timeseries" if "timeseries" in collection.options else "collection",
+                "options": dict(collection.options),
+            }
+            for name, collection in self._collections.items()
+        ]
+        return listing.find(filter)
+
+    async def create_collection(self, name: str, **options) -> FakeCollection:
+        if name in self._collections:
+            raise CollectionInvalid(f"collection {name} already exists")
+        collection = self[name]
+        collection.options = options
+        return collection
+
+    async def command(self, command: str, value: Any = 1, **kwargs) -> Dict[str, Any]:
+        if command != "collMod":
+            raise NotImplementedError(f"Unsupported command {command}")
+        for key, option in kwargs.items():
+            if option == "off":
+                self[value].options.pop(key, None)
+            else:
+                self[value].options[key] = option
+        return {"ok": 1}
+
+    def get_collection(self, name: str, **options) -> FakeCollection:
+        # Write concerns and read preferences have no meaning in memory
+        return self[name]
+
+    def operation_counts(self) -> Dict[str, int]:
+        return {name: collection.operations for name, collection in self._collections.items()}
+
+
+def install(latency: float = 0.0) -> FakeDatabase:
+    """Point the app's database handle at a fresh in-memory database."""
+    database = FakeDatabase(latency)
+    db_instance.client = None
+    db_instance.database = database
+    return database
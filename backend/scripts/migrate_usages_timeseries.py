@@ -0,0 +1,192 @@
+"""
+Convert a plain usages collection into the time-series collection that
+create_indexes provisions for new deployments.
+
+The plain collection is renamed to usages_legacy_<timestamp> and usages is
+recreated as a time-series collection straight away, so running API
+workers keep writing new records while the old ones are copied. Legacy
+records still inside USAGE_RETENTION_SECONDS are then copied over in _id
+order; documents keep the UsageModel layout, token becomes the metaField.
+
+Progress is checkpointed in the migrations collection, so an interrupted
+run resumes where it stopped. Time-series collections do not enforce a
+unique _id, so records of the first batch after a checkpoint that already
+made it into usages are skipped. Records whose timestamp is not a date
+cannot be stored in a time-series collection; they are counted and left
+in the legacy collection. Legacy collections are kept unless --drop-legacy
+is given.
+
+Usage (from backend/):
+    python -m scripts.migrate_usages_timeseries --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.core.database import create_client, create_indexes, db_instance, ensure_usages_collection
+
+logger = logging.getLogger("migrate_usages_timeseries")
+
+MIGRATION_ID = "usages_timeseries"
+
+
+async def usages_exists(database) -> bool:
+    return "usages" in await database.list_collection_names(filter={"name": "usages"})
+
+
+async def detach_plain_usages(database, state: Dict[str, Any]):
+    """
+    Rename plain usages collections out of the way until usages is
+    time-series. A worker writing between the rename and the create
+    recreates a plain usages collection; it is renamed and copied as well.
+    """
+    for _ in range(5):
+        if await ensure_usages_collection(database):
+            return
+        if not await usages_exists(database):
+            raise SystemExit("The server could not create a time-series collection (MongoDB 5.0+ is required)")
+
+        name = state["legacy_prefix"] if not state["sources"] else f"{state['legacy_prefix']}_{len(state['sources'])}"
+        # Recorded first, so a crash after the rename still copies it on resume
+        state["sources"].append(name)
+        await database.migrations.update_one(
+            {"_id": MIGRATION_ID}, {"$set": {"sources": state["sources"]}}
+        )
+        await database.usages.rename(name)
+        logger.info(f"Renamed usages to {name}")
+
+    raise SystemExit("usages keeps being recreated as a plain collection, stop the API workers and retry")
+
+
+async def copy_source(database, state: Dict[str, Any], source: str, batch_size: int, cutoff: Optional[datetime]) -> int:
+    """Copy one legacy collection into usages from its checkpoint on. Returns records copied."""
+    query: Dict[str, Any] = {"timestamp": {"$type": "date"}}
+    if cutoff is not None:
+        # Older records would expire from usages right away
+        query["timestamp"]["$gte"] = cutoff
+    last_id = state["copied"].get(source)
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+
+    copied = state["counts"].get(source, 0)
+    batch: List[Dict[str, Any]] = []
+    # Only the batch in flight when a previous run stopped can be in usages already
+    first = True
+
+    async def flush():
+        nonlocal copied, first
+        records = batch
+        if first:
+            records = await skip_copied(database, batch)
+            if len(records) < len(batch):
+                logger.info(f"Skipped {len(batch) - len(records)} records of {source} copied before the restart")
+            first = False
+        if records:
+            try:
+                await database.usages.insert_many(records, ordered=False)
+                copied += len(records)
+            except BulkWriteError as e:
+                failed = len(e.details.get("writeErrors", []))
+                copied += len(records) - failed
+                logger.warning(
+                    f"{failed} records from {source} could not be copied: {e.details['writeErrors'][0]['errmsg']}"
+                )
+        await database.migrations.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {f"copied.{source}": batch[-1]["_id"], f"counts.{source}": copied}}
+        )
+        state["copied"][source] = batch[-1]["_id"]
+        batch.clear()
+
+    cursor = database[source].find(query).sort("_id", 1).batch_size(batch_size)
+    async for usage_doc in cursor:
+        batch.append(usage_doc)
+        if len(batch) >= batch_size:
+            await flush()
+            logger.info(f"Copied {copied} records from {source}")
+    if batch:
+        await flush()
+
+    state["counts"][source] = copied
+
+    undated = await database[source].count_documents({"timestamp": {"$not": {"$type": "date"}}})
+    if undated:
+        logger.warning(f"{undated} records of {source} have no date timestamp and were not copied")
+    return copied
+
+
+async def skip_copied(database, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The records of batch whose _id is not in usages yet."""
+    ids = [usage_doc["_id"] for usage_doc in batch]
+    timestamps = [usage_doc["timestamp"] for usage_doc in batch]
+    # The timestamp range lets the server skip buckets outside the batch
+    existing = set(await database.usages.distinct("_id", {
+        "_id": {"$in": ids},
+        "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)},
+    }))
+    return [usage_doc for usage_doc in batch if usage_doc["_id"] not in existing]
+
+
+async def migrate(args):
+    if not settings.USAGE_TIMESERIES:
+        raise SystemExit("USAGE_TIMESERIES is disabled, nothing to migrate to")
+
+    client = create_client(1, 1)
+    database = client[settings.database_name]
+    try:
+        state = await database.migrations.find_one({"_id": MIGRATION_ID})
+        if state is not None and state.get("completedAt"):
+            logger.info(f"usages was already migrated on {state['completedAt']:%Y-%m-%d %H:%M}")
+            return
+
+        if state is None:
+            state = {
+                "_id": MIGRATION_ID,
+                "legacy_prefix": f"usages_legacy_{datetime.utcnow():%Y%m%d%H%M%S}",
+                "sources": [],
+                "copied": {},
+                "counts": {},
+                "startedAt": datetime.utcnow(),
+            }
+            await database.migrations.insert_one(state)
+        else:
+            logger.info(f"Resuming migration started on {state['startedAt']:%Y-%m-%d %H:%M}")
+
+        await detach_plain_usages(database, state)
+        if not state["sources"]:
+            logger.info("usages is already a time-series collection")
+
+        cutoff = None
+        if settings.USAGE_RETENTION_SECONDS:
+            cutoff = datetime.utcnow() - timedelta(seconds=settings.USAGE_RETENTION_SECONDS)
+        for source in state["sources"]:
+            copied = await copy_source(database, state, source, args.batch_size, cutoff)
+            logger.info(f"Copied {copied} records from {source}")
+
+        # Secondary indexes of the new collection
+        db_instance.database = database
+        await create_indexes()
+
+        await database.migrations.update_one({"_id": MIGRATION_ID}, {"$set": {"completedAt": datetime.utcnow()}})
+        if args.drop_legacy:
+            for source in state["sources"]:
+                await database.drop_collection(source)
+                logger.info(f"Dropped {source}")
+        elif state["sources"]:
+            logger.info(f"Kept {', '.join(state['sources'])}; drop them once the new collection is verified")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=5000, help="records per insert and checkpoint")
+    parser.add_argument("--drop-legacy", action="store_true", help="drop the legacy collections after copying")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate(parser.parse_args()))
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from app.utils.histogram import LatencyHistogram, SUB_BUCKET_COUNT, bucket_index, bucket_value
+
+
+def histogram_of(microseconds) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    for value in microseconds:
+        histogram.record(value / 1_000_000)
+    return histogram
+
+
+def test_values_below_sub_bucket_count_get_exact_buckets():
+    for value in (0, 1, 31):
+        assert bucket_index(value) == value
+        assert bucket_value(value) == value
+
+
+@pytest.mark.parametrize("value, index, midpoint", [
+    (31, 31, 31.0),
+    (32, 32, 32.0),
+    (63, 63, 63.0),
+    (64, 64, 64.5),
+    (65, 64, 64.5),
+    (127, 95, 126.5),
+    (128, 96, 129.5),
+])
+def test_bucket_boundaries(value, index, midpoint):
+    assert bucket_index(value) == index
+    assert bucket_value(index) == midpoint
+
+
+def test_buckets_are_contiguous_and_within_relative_error():
+    previous = bucket_index(0)
+    for value in range(1, 1 << 18):
+        index = bucket_index(value)
+        assert index - previous in (0, 1)
+        # Half a sub-bucket of a power-of-two range
+        assert abs(bucket_value(index) - value) <= value / (2 * SUB_BUCKET_COUNT)
+        previous = index
+
+
+def test_empty_histogram_has_no_quantiles():
+    histogram = LatencyHistogram()
+
+    assert histogram.quantiles((0.5, 0.99)) == {0.5: None, 0.99: None}
+    assert histogram.summary()["p50_ms"] is None
+
+
+def test_constant_samples_report_the_sample():
+    histogram = histogram_of([1234] * 100)
+
+    assert histogram.quantiles((0.0, 0.5, 1.0)) == {0.0: 1234, 0.5: 1234, 1.0: 1234}
+
+
+def test_quantiles_of_uniform_distribution():
+    histogram = histogram_of(range(1, 100_001))
+
+    quantiles = histogram.quantiles((0.5, 0.95, 0.99))
+
+    for q, value in quantiles.items():
+        assert value == pytest.approx(q * 100_000, rel=1 / SUB_BUCKET_COUNT)
+    assert histogram.quantiles((1.0,))[1.0] == pytest.approx(100_000, rel=1 / SUB_BUCKET_COUNT)
+
+
+def test_quantiles_of_bimodal_distribution():
+    # 90% fast requests at 1ms, 10% slow ones at 250ms
+    histogram = histogram_of([1000] * 900 + [250_000] * 100)
+
+    quantiles = histogram.quantiles((0.5, 0.9, 0.95, 0.99))
+
+    assert quantiles[0.5] == pytest.approx(1000, rel=1 / SUB_BUCKET_COUNT)
+    assert quantiles[0.9] == pytest.approx(1000, rel=1 / SUB_BUCKET_COUNT)
+    assert quantiles[0.95] == pytest.approx(250_000, rel=1 / SUB_BUCKET_COUNT)
+    assert quantiles[0.99] == pytest.approx(250_000, rel=1 / SUB_BUCKET_COUNT)
+
+
+def test_merged_snapshots_match_one_histogram_of_all_samples():
+    rng = random.Random(0)
+    samples = [int(rng.lognormvariate(9, 1)) for _ in range(10_000)]
+    workers = [histogram_of(samples[start::3]) for start in range(3)]
+
+    merged = LatencyHistogram()
+    for histogram in workers:
+        # Workers share their histograms as snapshot documents
+        merged.merge(LatencyHistogram.from_document(histogram.to_document()))
+    expected = histogram_of(samples)
+
+    assert merged.counts == expected.counts
+    assert (merged.count, merged.total, merged.min, merged.max) == (
+        expected.count, expected.total, expected.min, expected.max
+    )
+    assert merged.summary() == expected.summary()
+
+
+def test_merge_into_empty_histogram_keeps_range():
+    merged = LatencyHistogram()
+    merged.merge(LatencyHistogram())
+    merged.merge(histogram_of([10, 5000]))
+
+    assert (merged.min, merged.max, merged.count) == (10, 5000, 2)
@@ -0,0 +1,59 @@
+import pytest
+
+from app.utils.hyperloglog import DEFAULT_PRECISION, HyperLogLog, register_update
+
+
+def sketch_of(values, precision: int = DEFAULT_PRECISION) -> HyperLogLog:
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def test_register_update_stays_in_range():
+    for n in range(1000):
+        index, rank = register_update(f"token-{n}", precision=10)
+        assert 0 <= index < 1 << 10
+        assert 1 <= rank <= 64 - 10 + 1
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+
+
+@pytest.mark.parametrize("cardinality", [10, 1000, 50_000])
+def test_count_is_within_error_bound(cardinality):
+    sketch = sketch_of(f"token-{n}" for n in range(cardinality))
+
+    # Three standard errors of 1.04 / sqrt(2^10)
+    assert sketch.count() == pytest.approx(cardinality, rel=0.1)
+
+
+def test_repeated_values_are_counted_once():
+    sketch = sketch_of(f"token-{n % 100}" for n in range(10_000))
+
+    assert sketch.count() == pytest.approx(100, rel=0.1)
+
+
+def test_merge_equals_sketch_of_union():
+    first = sketch_of(f"token-{n}" for n in range(0, 6000))
+    second = sketch_of(f"token-{n}" for n in range(4000, 10_000))
+
+    first.merge(second)
+
+    assert first.registers == sketch_of(f"token-{n}" for n in range(10_000)).registers
+
+
+def test_merge_registers_from_rollup_document():
+    sketch = sketch_of(f"token-{n}" for n in range(500))
+    # Rollups store registers sparsely under string keys
+    document = {str(index): rank for index, rank in enumerate(sketch.registers) if rank}
+
+    restored = HyperLogLog(registers=document)
+
+    assert restored.registers == sketch.registers
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
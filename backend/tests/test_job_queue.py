@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import hmac
+import socket
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.core.exceptions import CustomException
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import (
+    DELIVERED, FAILED, ModerationJobQueue, check_callback_url, resolve_callback_host, sign_payload
+)
+
+
+@pytest.fixture
+def dns(monkeypatch):
+    """Answer getaddrinfo from a {host: [addresses]} table; unknown hosts do not resolve."""
+    table = {}
+
+    async def getaddrinfo(loop, host, port, *args, **kwargs):
+        if host not in table:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [
+            (socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))
+            for address in table[host]
+        ]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    monkeypatch.setattr(settings, "JOB_WEBHOOK_ALLOWED_HOSTS", [])
+    return table
+
+
+class FakeJobsCollection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+def make_queue(**overrides) -> ModerationJobQueue:
+    options = dict(
+        max_queue_size=10,
+        max_queue_bytes=1024 * 1024,
+        workers=1,
+        lease_seconds=60.0,
+        sweep_interval=10.0,
+        result_ttl=3600,
+        webhook_timeout=5.0,
+        webhook_max_attempts=3,
+        webhook_backoff_base=2.0,
+        webhook_backoff_max=60.0,
+        webhook_concurrency=2,
+    )
+    options.update(overrides)
+    return ModerationJobQueue(**options)
+
+
+@pytest.mark.asyncio
+async def test_public_host_resolves_to_its_addresses(dns):
+    dns["hooks.example.com"] = ["93.184.216.34", "2606:2800:220:1:248:1893:25c8:1946"]
+
+    assert await resolve_callback_host("https://hooks.example.com/cb") == (
+        None, ["93.184.216.34", "2606:2800:220:1:248:1893:25c8:1946"]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("address, reported", [
+    ("127.0.0.1", "127.0.0.1"),
+    ("10.1.2.3", "10.1.2.3"),
+    ("192.168.0.10", "192.168.0.10"),
+    ("169.254.169.254", "169.254.169.254"),
+    ("::1", "::1"),
+    ("fe80::1%eth0", "fe80::1"),
+    ("::ffff:127.0.0.1", "127.0.0.1"),
+    ("::ffff:169.254.169.254", "169.254.169.254"),
+])
+async def test_non_public_addresses_are_reported(dns, address, reported):
+    # One bad address among public ones is enough to refuse the host
+    dns["hooks.example.com"] = ["93.184.216.34", address]
+
+    assert await resolve_callback_host("http://hooks.example.com/cb") == (reported, [])
+    with pytest.raises(CustomException) as error:
+        await check_callback_url("http://hooks.example.com/cb")
+    assert error.value.status_code == 400
+    assert error.value.error_type == "INVALID_CALLBACK_URL"
+
+
+@pytest.mark.asyncio
+async def test_allowed_hosts_are_not_resolved(dns, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_WEBHOOK_ALLOWED_HOSTS", ["Internal.Example"])
+
+    assert await resolve_callback_host("http://internal.example:8080/cb") == (None, [])
+    await check_callback_url("http://internal.example:8080/cb")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", [
+    "ftp://hooks.example.com/cb",
+    "http:///cb",
+    "not a url",
+    "http://hooks.example.com:99999/cb",
+    "http://hooks.example.com:port/cb",
+    "http://unknown.example/cb",
+])
+async def test_invalid_callback_urls_are_rejected(dns, url):
+    dns["hooks.example.com"] = ["93.184.216.34"]
+
+    with pytest.raises(CustomException) as error:
+        await check_callback_url(url)
+    assert error.value.error_type == "INVALID_CALLBACK_URL"
+
+
+@pytest.mark.asyncio
+async def test_public_callback_url_is_accepted(dns):
+    dns["hooks.example.com"] = ["93.184.216.34"]
+
+    await check_callback_url("https://hooks.example.com/cb")
+
+
+def test_sign_payload_is_hmac_sha256_of_body():
+    body = b'{"job_id": "abc"}'
+
+    expected = hmac.new(settings.SECRET_KEY.encode(), body, hashlib.sha256).hexdigest()
+
+    assert sign_payload(body) == f"sha256={expected}"
+
+
+@pytest.mark.parametrize("attempts, low, high", [
+    (1, 1.0, 2.0),
+    (2, 2.0, 4.0),
+    (4, 8.0, 16.0),
+    (10, 30.0, 60.0),
+])
+def test_backoff_doubles_with_full_jitter_up_to_the_cap(attempts, low, high):
+    queue = make_queue()
+
+    for _ in range(50):
+        assert low <= queue._backoff(attempts) <= high
+
+
+def job_doc(callback_url: str):
+    now = datetime.utcnow()
+    return {
+        "_id": "job1",
+        "status": "completed",
+        "itemCount": 1,
+        "createdAt": now,
+        "updatedAt": now,
+        "callbackUrl": callback_url,
+        "webhook": {"status": "pending", "attempts": 0},
+    }
+
+
+@pytest.fixture
+def delivery(monkeypatch):
+    """A queue whose webhook client records requests instead of sending them."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(204)
+
+    collection = FakeJobsCollection()
+    monkeypatch.setattr(job_queue_module, "get_moderation_jobs_collection", lambda: collection)
+    queue = make_queue()
+    queue._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return queue, requests, collection
+
+
+@pytest.mark.asyncio
+async def test_delivery_connects_to_the_checked_address(dns, delivery):
+    queue, requests, collection = delivery
+    dns["hooks.example.com"] = ["93.184.216.34"]
+
+    await queue._deliver(job_doc("https://hooks.example.com:8443/cb?x=1"))
+
+    request, = requests
+    assert request.url.host == "93.184.216.34"
+    assert request.url.port == 8443
+    assert request.url.raw_path == b"/cb?x=1"
+    assert request.headers["Host"] == "hooks.example.com:8443"
+    assert request.extensions["sni_hostname"] == "hooks.example.com"
+    assert request.headers["X-Signature"] == sign_payload(request.content)
+    assert collection.updates[0][1]["$set"]["webhook.status"] == DELIVERED
+
+
+@pytest.mark.asyncio
+async def test_delivery_refuses_a_host_rebound_to_a_private_address(dns, delivery):
+    queue, requests, collection = delivery
+    # Public when the job was submitted, repointed before delivery
+    dns["hooks.example.com"] = ["169.254.169.254"]
+
+    await queue._deliver(job_doc("https://hooks.example.com/cb"))
+
+    assert requests == []
+    update = collection.updates[0][1]["$set"]
+    assert update["webhook.status"] == FAILED
+    assert "169.254.169.254" in update["webhook.lastError"]
+
+
+@pytest.mark.asyncio
+async def test_delivery_to_allowed_host_goes_by_name(dns, delivery, monkeypatch):
+    queue, requests, _ = delivery
+    monkeypatch.setattr(settings, "JOB_WEBHOOK_ALLOWED_HOSTS", ["hooks.internal"])
+
+    await queue._deliver(job_doc("http://hooks.internal/cb"))
+
+    request, = requests
+    assert request.url.host == "hooks.internal"
+    assert "sni_hostname" not in request.extensions
+
+
+@pytest.mark.asyncio
+async def test_unresolvable_host_is_retried_later(dns, delivery):
+    queue, requests, collection = delivery
+
+    await queue._deliver(job_doc("https://gone.example/cb"))
+
+    assert requests == []
+    update = collection.updates[0][1]["$set"]
+    assert "webhook.status" not in update
+    assert update["webhook.attempts"] == 1
+    assert "webhook.nextAttemptAt" in update
@@ -0,0 +1,25 @@
+import pytest
+
+from app.services.perceptual_hash import format_hash, parse_hash
+
+
+def test_parse_hash_round_trips():
+    for value in (0, 1, 0x123456789ABCDEF0, (1 << 64) - 1):
+        assert parse_hash(format_hash(value)) == value
+    assert parse_hash("123456789ABCDEF0") == 0x123456789ABCDEF0
+
+
+@pytest.mark.parametrize("value", [
+    "0x123456789abcde",
+    "+123456789abcdef",
+    "-123456789abcdef",
+    "1_23456789abcdef",
+    " 123456789abcdef",
+    "123456789abcdef\n",
+    "123456789abcdeg0",
+    "123456789abcdef",
+    "123456789abcdef00",
+])
+def test_parse_hash_rejects_anything_but_16_hex_digits(value):
+    with pytest.raises(ValueError):
+        parse_hash(value)
@@ -0,0 +1,143 @@
+import pytest
+
+from app.config import settings
+from app.core import pool_tuner as pool_tuner_module
+from app.core.database import db_instance
+from app.core.pool_tuner import MongoPoolTuner
+from app.utils.histogram import LatencyHistogram
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    # Pool sizes between 2 and 20 unless the tuner has its own max_size
+    monkeypatch.setattr(settings, "MONGO_POOL_BUDGET", 20)
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 1)
+    monkeypatch.setattr(settings, "MONGO_MIN_POOL_SIZE", 2)
+
+
+def make_tuner(**overrides) -> MongoPoolTuner:
+    options = dict(
+        interval=30.0,
+        grow_wait_ms=5.0,
+        shrink_wait_ms=0.5,
+        min_checkouts=100,
+        close_delay=60.0,
+        enabled=True,
+    )
+    options.update(overrides)
+    return MongoPoolTuner(**options)
+
+
+@pytest.mark.parametrize("size, p95_wait_ms, checkouts, failures, peak_in_use, expected", [
+    # Slow check-outs grow the pool by half, at least by one
+    (8, 10.0, 200, 0, 8, 12),
+    (3, 5.0, 200, 0, 3, 5),
+    (2, 10.0, 200, 0, 2, 3),
+    # Failed check-outs grow it even in a quiet interval
+    (8, None, 0, 1, 0, 12),
+    (8, 0.1, 200, 2, 1, 12),
+    # Fast check-outs with at most half the pool in use shrink it by a quarter
+    (8, 0.1, 200, 0, 4, 6),
+    (3, 0.1, 200, 0, 1, 2),
+    (8, 0.1, 200, 0, 5, 8),
+    # Between the thresholds, or too few check-outs to judge, it stays
+    (8, 2.0, 200, 0, 1, 8),
+    (8, 10.0, 99, 0, 8, 8),
+    (8, 0.1, 99, 0, 1, 8),
+    (8, None, 200, 0, 0, 8),
+    # Within the worker's share of the budget
+    (16, 10.0, 200, 0, 16, 20),
+    (2, 0.1, 200, 0, 0, 2),
+    (30, 2.0, 200, 0, 30, 20),
+])
+def test_decide(size, p95_wait_ms, checkouts, failures, peak_in_use, expected):
+    tuner = make_tuner()
+
+    assert tuner.decide(size, p95_wait_ms, checkouts, failures, peak_in_use) == expected
+
+
+def test_decide_caps_at_configured_max_size():
+    tuner = make_tuner(max_size=10)
+
+    assert tuner.limits == (2, 10)
+    assert tuner.decide(8, 10.0, 200, 0, 8) == 10
+
+
+class FakePoolMetrics:
+    def __init__(self, wait_seconds, failures=0, peak_in_use=0):
+        self.waits = LatencyHistogram()
+        for wait in wait_seconds:
+            self.waits.record(wait)
+        self.failures = failures
+        self.peak_in_use = peak_in_use
+
+    def take_window(self):
+        return self.waits, self.failures, self.peak_in_use
+
+
+@pytest.fixture
+def resizes(monkeypatch):
+    """Record resize_pool calls instead of connecting new clients."""
+    calls = []
+
+    async def resize_pool(max_pool_size, close_delay):
+        calls.append((max_pool_size, close_delay))
+
+    monkeypatch.setattr(pool_tuner_module, "resize_pool", resize_pool)
+    monkeypatch.setattr(db_instance, "options", {"maxPoolSize": 8})
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_tune_resizes_to_decided_size(monkeypatch, resizes):
+    metrics = FakePoolMetrics([0.010] * 200, peak_in_use=8)
+    monkeypatch.setattr(pool_tuner_module, "mongo_pool_metrics", metrics)
+    tuner = make_tuner()
+
+    await tuner.tune()
+
+    assert resizes == [(12, 60.0)]
+    assert tuner.last_decision["size"] == 8
+    assert tuner.last_decision["target"] == 12
+    assert tuner.last_decision["checkouts"] == 200
+    assert tuner.last_decision["p95_wait_ms"] == pytest.approx(10.0, rel=0.05)
+    assert [(resize["from"], resize["to"]) for resize in tuner.resizes] == [(8, 12)]
+
+
+@pytest.mark.asyncio
+async def test_tune_keeps_pool_when_size_is_right(monkeypatch, resizes):
+    metrics = FakePoolMetrics([0.002] * 200, peak_in_use=6)
+    monkeypatch.setattr(pool_tuner_module, "mongo_pool_metrics", metrics)
+    tuner = make_tuner()
+
+    await tuner.tune()
+
+    assert resizes == []
+    assert tuner.last_decision["target"] == 8
+    assert tuner.resizes == []
+
+
+@pytest.mark.asyncio
+async def test_tune_waits_for_a_client(monkeypatch, resizes):
+    monkeypatch.setattr(pool_tuner_module, "mongo_pool_metrics", FakePoolMetrics([], failures=3))
+    monkeypatch.setattr(db_instance, "options", {})
+    tuner = make_tuner()
+
+    await tuner.tune()
+
+    assert resizes == []
+    assert tuner.last_decision is None
+
+
+@pytest.mark.asyncio
+async def test_tune_keeps_the_last_twenty_resizes(monkeypatch, resizes):
+    monkeypatch.setattr(pool_tuner_module, "mongo_pool_metrics", FakePoolMetrics([], failures=1))
+    tuner = make_tuner()
+
+    for _ in range(25):
+        # Alternate so every interval resizes
+        db_instance.options["maxPoolSize"] = 2 if db_instance.options["maxPoolSize"] != 2 else 8
+        await tuner.tune()
+
+    assert len(resizes) == 25
+    assert len(tuner.resizes) == 20
@@ -0,0 +1,213 @@
+import time
+
+import pytest
+
+from app.api import middleware
+from app.api.middleware import RateLimitMiddleware
+from app.core.rate_limit import MemoryRateLimitStore, RateLimiter
+from app.core.security import hash_token
+
+WINDOW = 3600
+
+# Start of the current window, so counters are not pruned as stale by sync()
+BASE = (int(time.time()) // WINDOW) * WINDOW
+
+
+def make_limiter(limit=10, store=None) -> RateLimiter:
+    return RateLimiter(limit=limit, window=WINDOW, store=store or MemoryRateLimitStore(), sync_interval=1.0)
+
+
+def test_hit_allows_up_to_limit_then_rejects():
+    limiter = make_limiter(limit=3)
+
+    results = [limiter.hit("key", now=BASE + 10) for _ in range(4)]
+
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+    assert [remaining for _, remaining, _ in results] == [2, 1, 0, 0]
+    assert results[-1][2] == WINDOW - 10
+    assert limiter.allowed == 3
+    assert limiter.rejected == 1
+
+
+def test_keys_are_counted_separately():
+    limiter = make_limiter(limit=1)
+
+    assert limiter.hit("a", now=BASE)[0]
+    assert limiter.hit("b", now=BASE)[0]
+    assert not limiter.hit("a", now=BASE)[0]
+
+
+def test_previous_window_is_weighted_by_overlap():
+    limiter = make_limiter(limit=10)
+    for _ in range(10):
+        limiter.hit("key", now=BASE + 100)
+
+    # Halfway into the next window half of the previous count still applies
+    now = BASE + WINDOW + WINDOW // 2
+    allowed = [limiter.hit("key", now=now)[0] for _ in range(6)]
+
+    assert allowed == [True] * 5 + [False]
+
+
+def test_previous_window_no_longer_counts_once_it_has_slid_out():
+    limiter = make_limiter(limit=10)
+    for _ in range(10):
+        limiter.hit("key", now=BASE)
+
+    assert not limiter.hit("key", now=BASE + WINDOW)[0]
+    assert limiter.hit("key", now=BASE + 2 * WINDOW - 1)[0]
+
+
+def test_rollover_past_an_empty_window_forgets_old_counts():
+    limiter = make_limiter(limit=10)
+    for _ in range(10):
+        limiter.hit("key", now=BASE + WINDOW - 1)
+
+    # Two windows later the count is no longer the previous window's
+    allowed, remaining, _ = limiter.hit("key", now=BASE + 2 * WINDOW)
+
+    assert allowed
+    assert remaining == 9
+
+
+@pytest.mark.asyncio
+async def test_sync_combines_counts_of_workers():
+    store = MemoryRateLimitStore()
+    first, second = make_limiter(limit=10, store=store), make_limiter(limit=10, store=store)
+
+    for _ in range(3):
+        first.hit("key", now=BASE)
+    for _ in range(4):
+        second.hit("key", now=BASE)
+    await first.sync()
+    await second.sync()
+
+    assert second.hit("key", now=BASE) == (True, 2, WINDOW)
+    await second.sync()
+    first.hit("key", now=BASE)
+    await first.sync()
+
+    # 3 + 4 + 1 + 1 across both workers
+    assert first.hit("key", now=BASE) == (True, 0, WINDOW)
+    assert not first.hit("key", now=BASE)[0]
+
+
+@pytest.mark.asyncio
+async def test_sync_keeps_hits_counted_while_it_waits_on_the_store():
+    class SlowStore(MemoryRateLimitStore):
+        async def incrby(self, deltas, ttl):
+            # A request arrives while the sync is in flight
+            limiter.hit("key", now=BASE)
+            return await super().incrby(deltas, ttl)
+
+    limiter = make_limiter(limit=10, store=SlowStore())
+    limiter.hit("key", now=BASE)
+
+    await limiter.sync()
+
+    assert limiter._counters["key"].count == 2
+    assert limiter._unsynced == {("key", BASE // WINDOW): 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_keeps_hits_for_the_next_one():
+    class FlakyStore(MemoryRateLimitStore):
+        fail = True
+
+        async def incrby(self, deltas, ttl):
+            if self.fail:
+                self.fail = False
+                # A request arrives while the sync is in flight
+                limiter.hit("key", now=BASE)
+                raise ConnectionError("store unavailable")
+            return await super().incrby(deltas, ttl)
+
+    store = FlakyStore()
+    limiter = make_limiter(limit=10, store=store)
+    for _ in range(3):
+        limiter.hit("key", now=BASE)
+
+    with pytest.raises(ConnectionError):
+        await limiter.sync()
+    assert limiter._unsynced == {("key", BASE // WINDOW): 4}
+
+    await limiter.sync()
+
+    assert limiter._unsynced == {}
+    assert store._counts[f"key:{BASE // WINDOW}"][0] == 4
+
+
+@pytest.mark.asyncio
+async def test_sync_after_rollover_updates_previous_window():
+    store = MemoryRateLimitStore()
+    first, second = make_limiter(limit=10, store=store), make_limiter(limit=10, store=store)
+
+    for _ in range(5):
+        second.hit("key", now=BASE)
+    await second.sync()
+    for _ in range(2):
+        first.hit("key", now=BASE)
+    first.hit("key", now=BASE + WINDOW)
+
+    await first.sync()
+
+    counter = first._counters["key"]
+    assert counter.window == BASE // WINDOW + 1
+    assert counter.previous == 7
+    assert counter.count == 1
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _request(app, token: str, client: str = "203.0.113.7"):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/moderate/categories",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": (client, 50000),
+    }
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_keys_known_tokens_by_hash(monkeypatch):
+    async def get_token_document(token):
+        return {"token": token} if token == "known" else None
+
+    monkeypatch.setattr(middleware, "get_token_document", get_token_document)
+    limiter = make_limiter(limit=1)
+    app = RateLimitMiddleware(_ok_app, limiter)
+
+    assert await _request(app, "known") == 200
+    assert await _request(app, "known") == 429
+    assert list(limiter._counters) == [hash_token("known")]
+
+
+@pytest.mark.asyncio
+async def test_middleware_shares_one_counter_per_address_for_unknown_tokens(monkeypatch):
+    async def get_token_document(token):
+        return None
+
+    monkeypatch.setattr(middleware, "get_token_document", get_token_document)
+    limiter = make_limiter(limit=2)
+    app = RateLimitMiddleware(_ok_app, limiter)
+
+    statuses = [await _request(app, f"made-up-{n}") for n in range(3)]
+    other_client = await _request(app, "made-up-4", client="198.51.100.1")
+
+    assert statuses == [200, 200, 429]
+    assert other_client == 200
+    assert set(limiter._counters) == {"ip:203.0.113.7", "ip:198.51.100.1"}
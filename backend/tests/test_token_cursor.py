@@ -0,0 +1,40 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.core.exceptions import CustomException
+from app.services.auth_service import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips_position():
+    token_doc = {"_id": ObjectId(), "createdAt": datetime(2024, 5, 1, 12, 30, 15, 123000)}
+
+    created_at, token_id = decode_cursor(encode_cursor(token_doc))
+
+    assert created_at == token_doc["createdAt"]
+    assert token_id == token_doc["_id"]
+
+
+def test_cursor_is_url_safe():
+    token_doc = {"_id": ObjectId(), "createdAt": datetime(2024, 5, 1)}
+
+    cursor = encode_cursor(token_doc)
+
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"[]").decode(),
+    base64.urlsafe_b64encode(b'{"c": "2024-05-01T00:00:00"}').decode(),
+    base64.urlsafe_b64encode(b'{"c": "yesterday", "i": "65f0c0ffee0000000000beef"}').decode(),
+    base64.urlsafe_b64encode(b'{"c": "2024-05-01T00:00:00", "i": "nope"}').decode(),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(CustomException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 400
+    assert error.value.error_type == "INVALID_CURSOR"
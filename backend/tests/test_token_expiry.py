@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import check_token_usable
+from app.services.auth_service import to_utc_naive
+
+
+def in_seconds(seconds: float) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=seconds)
+
+
+@pytest.mark.parametrize("token_doc, detail", [
+    (None, "Invalid token"),
+    ({}, "Invalid token"),
+    ({"token": "t", "isActive": False}, "Token is inactive"),
+    # Deactivation is reported before expiry
+    ({"token": "t", "isActive": False, "expiresAt": in_seconds(-60)}, "Token is inactive"),
+    ({"token": "t", "isActive": True, "expiresAt": in_seconds(-60)}, "Token has expired"),
+    ({"token": "t", "expiresAt": in_seconds(-1)}, "Token has expired"),
+])
+def test_unusable_tokens_are_rejected(token_doc, detail):
+    with pytest.raises(HTTPException) as error:
+        check_token_usable(token_doc)
+
+    assert error.value.status_code == 401
+    assert error.value.detail == detail
+
+
+@pytest.mark.parametrize("token_doc", [
+    {"token": "t", "isActive": True},
+    # Documents from before isActive and expiresAt existed
+    {"token": "t"},
+    {"token": "t", "isActive": True, "expiresAt": None},
+    {"token": "t", "isActive": True, "expiresAt": in_seconds(3600)},
+])
+def test_usable_tokens_pass(token_doc):
+    check_token_usable(token_doc)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    (datetime(2024, 5, 1, 12, 0), datetime(2024, 5, 1, 12, 0)),
+    (datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc), datetime(2024, 5, 1, 12, 0)),
+    (datetime(2024, 5, 1, 14, 30, tzinfo=timezone(timedelta(hours=2, minutes=30))), datetime(2024, 5, 1, 12, 0)),
+    (datetime(2024, 5, 1, 1, 0, tzinfo=timezone(timedelta(hours=-5))), datetime(2024, 5, 1, 6, 0)),
+    # Crossing midnight backwards
+    (datetime(2024, 5, 1, 3, 0, tzinfo=timezone(timedelta(hours=9))), datetime(2024, 4, 30, 18, 0)),
+])
+def test_to_utc_naive(value, expected):
+    result = to_utc_naive(value)
+
+    assert result == expected
+    assert result is None or result.tzinfo is None
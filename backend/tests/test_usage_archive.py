@@ -0,0 +1,147 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("pyarrow.ipc")
+
+from app.services.usage_archive import UsageArchiver, _record_batch, _schema, _usage_id  # noqa: E402
+
+DAY = date(2024, 5, 1)
+
+
+def usage(token="tok1", day=DAY, **fields):
+    usage_doc = {
+        "_id": ObjectId(),
+        "token": token,
+        "endpoint": "/moderate",
+        "route": "/moderate",
+        "method": "POST",
+        "timestamp": datetime.combine(day, datetime.min.time()) + timedelta(hours=12),
+        "ip_address": "203.0.113.7",
+        "user_agent": "pytest",
+        "request_size": 1024,
+        "response_status": 200,
+        "response_time": 0.25,
+    }
+    usage_doc.update(fields)
+    return usage_doc
+
+
+def make_archiver(directory, compression="zstd") -> UsageArchiver:
+    return UsageArchiver(
+        directory=str(directory),
+        archive_after_days=30,
+        interval=3600.0,
+        batch_size=2,
+        compression=compression,
+        enabled=True,
+    )
+
+
+def write_day(archiver: UsageArchiver, day: date, usage_docs, batch_size=2):
+    """Write a day's file the way the archiver does, `batch_size` records per batch."""
+    schema = _schema(pa)
+    path = archiver.path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    options = pa.ipc.IpcWriteOptions(compression=archiver.compression)
+    with pa.ipc.new_file(path, schema, options=options) as writer:
+        for start in range(0, len(usage_docs), batch_size):
+            writer.write_batch(_record_batch(pa, schema, usage_docs[start:start + batch_size]))
+
+
+def test_record_batch_columns():
+    first = usage(metadata={"file_size": 12, "at": datetime(2024, 5, 1)})
+    second = usage(_id="legacy-1", route=None, response_time=None, request_size=None)
+    schema = _schema(pa)
+
+    batch = _record_batch(pa, schema, [first, second])
+
+    assert batch.schema == schema
+    rows = batch.to_pylist()
+    assert rows[0]["id"] == str(first["_id"])
+    assert json.loads(rows[0]["metadata"]) == {"file_size": 12, "at": "2024-05-01 00:00:00"}
+    assert rows[0]["timestamp"] == first["timestamp"]
+    assert rows[0]["response_status"] == 200
+    assert rows[1]["id"] == "legacy-1"
+    assert rows[1]["metadata"] is None
+    assert (rows[1]["route"], rows[1]["response_time"], rows[1]["request_size"]) == (None, None, None)
+
+
+def test_record_batch_ignores_fields_outside_the_schema():
+    batch = _record_batch(pa, _schema(pa), [usage(extra="ignored")])
+
+    assert "extra" not in batch.schema.names
+    assert batch.num_rows == 1
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("65f0c0ffee0000000000beef", ObjectId("65f0c0ffee0000000000beef")),
+    ("legacy-1", "legacy-1"),
+])
+def test_usage_id_restores_object_ids(value, expected):
+    assert _usage_id(value) == expected
+
+
+@pytest.mark.parametrize("compression", ["zstd", "lz4", None])
+def test_scan_counts_one_token(tmp_path, compression):
+    archiver = make_archiver(tmp_path, compression=compression)
+    write_day(archiver, DAY, [
+        usage(),
+        usage(token="tok2"),
+        usage(route=None, endpoint="/moderate/batch", response_time=None),
+        usage(route="/auth/tokens/{token_id}", endpoint="/auth/tokens/abc", response_time=0.75),
+        usage(token="tok2"),
+    ])
+
+    stats = archiver._scan([DAY], "tok1")
+
+    assert stats.requests == 3
+    assert stats.daily == {"2024-05-01": 3}
+    assert stats.timed == 2
+    assert stats.response_time == pytest.approx(1.0)
+    # route when recorded, the raw endpoint otherwise
+    assert stats.endpoints == {"/moderate": 1, "/moderate/batch": 1, "/auth/tokens/{token_id}": 1}
+
+
+def test_scan_spans_days_and_skips_missing_files(tmp_path):
+    archiver = make_archiver(tmp_path)
+    next_day = DAY + timedelta(days=1)
+    write_day(archiver, DAY, [usage(), usage()])
+    write_day(archiver, next_day, [usage(day=next_day)])
+
+    stats = archiver._scan([DAY, next_day, DAY + timedelta(days=2)], "tok1")
+
+    assert stats.requests == 3
+    assert stats.daily == {"2024-05-01": 2, "2024-05-02": 1}
+
+
+def test_scan_of_unknown_token_is_empty(tmp_path):
+    archiver = make_archiver(tmp_path)
+    write_day(archiver, DAY, [usage(), usage()])
+
+    stats = archiver._scan([DAY], "nobody")
+
+    assert (stats.requests, stats.timed, stats.response_time) == (0, 0, 0.0)
+    assert stats.endpoints == {}
+    assert stats.daily == {}
+
+
+@pytest.mark.asyncio
+async def test_token_stats_reads_archived_days_in_range(tmp_path):
+    archiver = make_archiver(tmp_path)
+    for offset in range(3):
+        day = DAY + timedelta(days=offset)
+        write_day(archiver, day, [usage(day=day)])
+    (tmp_path / "date=not-a-day").mkdir()
+
+    stats = await archiver.token_stats(
+        "tok1", datetime(2024, 5, 2, 8), datetime(2024, 5, 3, 23)
+    )
+
+    assert archiver.archived_days() == [DAY, DAY + timedelta(days=1), DAY + timedelta(days=2)]
+    assert stats.daily == {"2024-05-02": 1}
+    assert archiver.hot_since() == datetime(2024, 5, 4)
@@ -0,0 +1,24 @@
+import pytest
+
+from app.config import settings
+from app.core.database import worker_pool_size
+
+
+@pytest.mark.parametrize("budget, workers, min_pool_size, expected", [
+    (10, 1, 5, (10, 5)),
+    (10, 2, 5, (5, 5)),
+    (10, 3, 5, (3, 3)),
+    (10, 4, 1, (2, 1)),
+    # Every worker gets at least one connection, even past the budget
+    (2, 4, 5, (1, 1)),
+    (0, 1, 5, (1, 1)),
+    # A worker count of 0 is treated as 1
+    (10, 0, 5, (10, 5)),
+    (100, 8, 0, (12, 0)),
+])
+def test_pool_budget_is_split_across_workers(monkeypatch, budget, workers, min_pool_size, expected):
+    monkeypatch.setattr(settings, "MONGO_POOL_BUDGET", budget)
+    monkeypatch.setattr(settings, "SERVER_WORKERS", workers)
+    monkeypatch.setattr(settings, "MONGO_MIN_POOL_SIZE", min_pool_size)
+
+    assert worker_pool_size() == expected